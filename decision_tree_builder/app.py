@@ -1,36 +1,86 @@
 from __future__ import annotations
 
+import atexit
+import copy
 import json
 import os
 import re
-import shutil
-import stat
+import uuid
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
+
+import click
 
 from flask import (
     Flask,
     Response,
+    abort,
     flash,
     jsonify,
+    make_response,
     redirect,
     render_template,
     request,
     url_for,
 )
 
-from utils.validator import validate_flow
+from utils.fileio import lock_path
+from utils.fingerprint import content_hash
+from utils.flow_metrics import flow_metrics
+from utils.history import COMPACT_THRESHOLD_BYTES, HISTORY_SEGMENTS
+from utils.json_patch import JsonPatchError, apply_patch
+from utils.mandatory_questions import mandatory_questions
+from utils.manifest import flow_entries
+from utils.paths import FlowGraph
+from utils.bulk_import import ImportSource, convert_sources, read_archive, read_directory
+from utils.catalog import FileCatalog
+from utils.closure import CLOSURE_NODE_LIMIT, ClosureError, flow_closure
+from utils.project_archive import iter_project_archive
+from utils.project_validation import ProjectRevalidator, ProjectValidation
+from utils.repository import FileSystemRepository, copy_repository, create_repository
+from utils.trash import TRASH_RETENTION_SECONDS, TrashError, TrashPurger
+from utils.validation_rules import DEFAULT_RULES, RuleSet
+from utils.validation_session import ValidationSessionError, ValidationSessions
+from utils.validation_cache import CACHE_MAX_BYTES, CACHE_MAX_ENTRIES
+from utils.validator import PATH_LIMIT, validate_flow, validation_cache
 from utils.yaml_export import flow_to_yaml, write_yaml_file
+from utils.yaml_writer import YamlWriteBehind
 from utils.yaml_import import yaml_to_flow, YamlImportError
 
 BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR / "data"
-PROJECT_INDEX_FILE = DATA_DIR / "proyectos.json"
+STORAGE_BACKEND = os.environ.get("DTB_STORAGE", "filesystem")
+SQLITE_DATABASE = Path(os.environ.get("DTB_SQLITE_PATH", DATA_DIR / "flows.sqlite3"))
+HISTORY_COMPACT_BYTES = int(os.environ.get("DTB_HISTORY_COMPACT_BYTES", COMPACT_THRESHOLD_BYTES))
+HISTORY_KEEP_SEGMENTS = int(os.environ.get("DTB_HISTORY_SEGMENTS", HISTORY_SEGMENTS))
+TRASH_RETENTION = float(os.environ.get("DTB_TRASH_RETENTION", TRASH_RETENTION_SECONDS))
+VALIDATION_PATH_LIMIT = int(os.environ.get("DTB_PATH_LIMIT", PATH_LIMIT))
+VALIDATION_CACHE_ENTRIES = int(os.environ.get("DTB_VALIDATION_CACHE_ENTRIES", CACHE_MAX_ENTRIES))
+VALIDATION_CACHE_BYTES = int(os.environ.get("DTB_VALIDATION_CACHE_BYTES", CACHE_MAX_BYTES))
+CLOSURE_LIMIT = int(os.environ.get("DTB_CLOSURE_NODE_LIMIT", CLOSURE_NODE_LIMIT))
+# Part of every page ETag so a restart with new templates invalidates cached pages.
+_BOOT_ID = uuid.uuid4().hex
 
 app = Flask(__name__)
 app.secret_key = "decision-tree-builder"
 
+repository = create_repository(
+    STORAGE_BACKEND, DATA_DIR, SQLITE_DATABASE, HISTORY_COMPACT_BYTES, TRASH_RETENTION, HISTORY_KEEP_SEGMENTS
+)
+atexit.register(repository.compactor.shutdown)
+trash_purger = TrashPurger(repository.trash)
+trash_purger.start()
+atexit.register(trash_purger.shutdown)
+yaml_writer = YamlWriteBehind(repository)
+atexit.register(yaml_writer.shutdown)
+validation_sessions = ValidationSessions()
+validation_summaries = FileCatalog()
+validation_cache.configure(VALIDATION_CACHE_ENTRIES, VALIDATION_CACHE_BYTES)
+project_revalidator = ProjectRevalidator(lambda project_id: refresh_project_validation(project_id))
+atexit.register(project_revalidator.shutdown)
+
 
 # ---------------------------------------------------------------------------
 # Response helpers
@@ -39,17 +89,51 @@ app.secret_key = "decision-tree-builder"
 
 @app.after_request
 def disable_caching(response: Response) -> Response:
-    """Ensure dynamic content is always fetched from the server."""
+    """Ensure dynamic content is always fetched or revalidated with the server."""
 
     if request.path.startswith("/static/"):
         return response
 
     mimetype = response.mimetype or ""
     if "text/html" in mimetype or "application/json" in mimetype:
-        response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate"
-        response.headers["Pragma"] = "no-cache"
-        response.headers["Expires"] = "0"
+        if response.headers.get("ETag"):
+            response.headers["Cache-Control"] = "no-cache"
+        else:
+            response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate"
+            response.headers["Pragma"] = "no-cache"
+            response.headers["Expires"] = "0"
+
+    return response
+
+
+def not_modified(etag: str) -> Optional[Response]:
+    """Return a 304 response when the client already holds ``etag``."""
 
+    if not request.if_none_match.contains(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+
+def _stale_flow_response() -> tuple[Response, int]:
+    message = "El flujo fue modificado por otra sesión. Recarga antes de guardar."
+    return jsonify({"success": False, "message": message}), 412
+
+
+def _saved_flow_response(project_id: str, flow_id: str, changed: bool) -> Response:
+    stored = stored_flow_entry(project_id, flow_id)
+    etag = flow_etag(stored) if stored else None
+    response = jsonify(
+        {
+            "success": True,
+            "changed": changed,
+            "etag": etag,
+            "yaml_status": yaml_writer.status(project_id, flow_id),
+        }
+    )
+    if etag:
+        response.set_etag(etag)
     return response
 
 
@@ -59,21 +143,18 @@ def disable_caching(response: Response) -> Response:
 
 def ensure_data_structure() -> None:
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    if not PROJECT_INDEX_FILE.exists():
-        PROJECT_INDEX_FILE.write_text(json.dumps({"projects": []}, indent=2, ensure_ascii=False))
+    repository.ensure_storage()
 
 
 def load_projects() -> List[Dict]:
     ensure_data_structure()
-    data = json.loads(PROJECT_INDEX_FILE.read_text(encoding="utf-8"))
-    return data.get("projects", [])
+    return repository.load_projects()
 
 
-def save_projects(projects: List[Dict]) -> None:
+def update_projects(updater: Callable[[List[Dict]], None]) -> List[Dict]:
+    """Apply ``updater`` to the project index while holding its write lock."""
     ensure_data_structure()
-    PROJECT_INDEX_FILE.write_text(
-        json.dumps({"projects": projects}, indent=2, ensure_ascii=False), encoding="utf-8"
-    )
+    return repository.update_projects(updater)
 
 
 def slugify(value: str, prefix: str = "item") -> str:
@@ -100,21 +181,10 @@ def get_flow_dir(project_id: str) -> Path:
     return get_project_dir(project_id) / "flows"
 
 
-def _handle_remove_readonly(func, path, exc_info):
-    """Retry a failed removal after clearing the read-only bit on Windows."""
-
-    exc = exc_info[1]
-    if isinstance(exc, PermissionError):
-        os.chmod(path, stat.S_IWRITE)
-        func(path)
-    else:
-        raise exc
-
-
 def load_project_metadata(project_id: str) -> Dict:
-    metadata_path = get_project_dir(project_id) / "metadata.json"
-    if metadata_path.exists():
-        return json.loads(metadata_path.read_text(encoding="utf-8"))
+    metadata = repository.load_project_metadata(project_id)
+    if metadata is not None:
+        return metadata
     return {
         "id": project_id,
         "name": project_id,
@@ -125,87 +195,155 @@ def load_project_metadata(project_id: str) -> Dict:
 
 
 def save_project_metadata(project_id: str, metadata: Dict) -> None:
-    metadata_path = get_project_dir(project_id) / "metadata.json"
-    metadata_path.parent.mkdir(parents=True, exist_ok=True)
-    metadata_path.write_text(json.dumps(metadata, indent=2, ensure_ascii=False), encoding="utf-8")
+    repository.save_project_metadata(project_id, metadata)
 
 
-def list_flows(project_id: str) -> List[Dict]:
-    flow_dir = get_flow_dir(project_id)
-    if not flow_dir.exists():
-        return []
-    flows: Dict[str, Dict] = {}
-    for path in sorted(flow_dir.glob("*.json")):
-        if not path.is_file():
-            continue
-        try:
-            flow = json.loads(path.read_text(encoding="utf-8"))
-        except json.JSONDecodeError:
-            continue
-        flow_id = path.stem
-        dedupe_key = str(flow.get("id") or flow_id)
-        entry = {
-            "id": dedupe_key,
-            "name": flow.get("name", flow_id),
-            "description": flow.get("description", ""),
-            "filename": path.name,
-        }
+def register_project(name: str, description: str) -> Dict:
+    """Reserve a slug for a new project in the index and return its metadata."""
+    now = datetime.utcnow().isoformat()
+    metadata = {
+        "id": "",
+        "name": name,
+        "description": description,
+        "created_at": now,
+        "updated_at": now,
+    }
 
-        existing = flows.get(dedupe_key)
-        if existing is None:
-            flows[dedupe_key] = entry
-            continue
+    def register(projects: List[Dict]) -> None:
+        existing = {project["id"] for project in projects}
+        metadata["id"] = unique_slug(slugify(name, prefix="proyecto"), sorted(existing))
+        projects.append(dict(metadata))
+
+    # The slug is reserved under the index lock so concurrent workers never pick the same one.
+    update_projects(register)
+    return metadata
 
-        canonical_filename = f"{dedupe_key}.json"
-        if existing["filename"] != canonical_filename and path.name == canonical_filename:
-            flows[dedupe_key] = entry
 
-    return list(flows.values())
+def list_flows(project_id: str) -> List[Dict]:
+    return flow_entries(repository.flow_index(project_id))
 
 
 def load_flow_data(project_id: str, flow_id: str) -> Dict:
-    path = get_flow_dir(project_id) / f"{flow_id}.json"
-    if not path.exists():
-        return {
-            "id": flow_id,
-            "name": flow_id,
-            "description": "",
-            "nodes": [],
-            "edges": [],
-        }
-    try:
-        return json.loads(path.read_text(encoding="utf-8"))
-    except json.JSONDecodeError:
-        return {
-            "id": flow_id,
-            "name": flow_id,
-            "description": "",
-            "nodes": [],
-            "edges": [],
-        }
+    flow = repository.load_flow(project_id, flow_id)
+    if flow is not None:
+        return flow
+    return {
+        "id": flow_id,
+        "name": flow_id,
+        "description": "",
+        "nodes": [],
+        "edges": [],
+    }
 
 
-def save_flow_data(project_id: str, flow_id: str, data: Dict) -> None:
-    flow_dir = get_flow_dir(project_id)
-    flow_dir.mkdir(parents=True, exist_ok=True)
-    path = flow_dir / f"{flow_id}.json"
-    path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
-    yaml_content, _ = flow_to_yaml(data)
-    write_yaml_file(project_id, flow_id, yaml_content)
+def stored_flow_entry(project_id: str, flow_id: str) -> Optional[Dict]:
+    """Return the index entry of a flow if it still describes the stored document."""
+    return repository.flow_entry(project_id, flow_id)
+
+
+def flow_etag(entry: Dict) -> str:
+    """Return the strong entity tag of a flow from its manifest entry."""
+    return f"{entry['revision']}-{entry['hash'][:16]}"
+
+
+def save_flow_data(
+    project_id: str, flow_id: str, data: Dict, patch: Optional[List[Dict]] = None
+) -> bool:
+    """Persist a flow and return False when its content was already stored.
+
+    ``patch`` is the JSON Patch from the stored flow to ``data`` when the
+    caller already has it; it becomes the revision's history entry. Without
+    it the revision is recorded as a snapshot.
+    """
+    digest = content_hash(data)
+    stored = stored_flow_entry(project_id, flow_id)
+    if stored is not None and stored.get("hash") == digest:
+        if not (get_flow_dir(project_id) / f"{flow_id}.yaml").exists():
+            yaml_writer.submit(project_id, flow_id, data)
+        return False
+
+    repository.save_flow(project_id, flow_id, data, digest, patch=patch)
+    yaml_writer.submit(project_id, flow_id, data)
+    return True
 
 
 def rename_flow_file(project_id: str, old_flow_id: str, new_flow_id: str) -> None:
+    # Exports of the old id are skipped once the flow is renamed, so let them finish first.
+    yaml_writer.wait(project_id, old_flow_id)
+    repository.rename_flow(project_id, old_flow_id, new_flow_id)
     flow_dir = get_flow_dir(project_id)
-    old_path = flow_dir / f"{old_flow_id}.json"
-    new_path = flow_dir / f"{new_flow_id}.json"
-    if old_path.exists():
-        new_path.write_text(old_path.read_text(encoding="utf-8"), encoding="utf-8")
-        old_path.unlink()
     yaml_old = flow_dir / f"{old_flow_id}.yaml"
-    yaml_new = flow_dir / f"{new_flow_id}.yaml"
     if yaml_old.exists():
-        yaml_new.write_text(yaml_old.read_text(encoding="utf-8"), encoding="utf-8")
-        yaml_old.unlink()
+        os.replace(yaml_old, flow_dir / f"{new_flow_id}.yaml")
+
+
+def import_flow_sources(
+    project_id: str, sources: List[ImportSource], overwrite: bool = False, max_workers: Optional[int] = None
+) -> List[Dict]:
+    """Convert YAML sources in parallel and store the results in one batch.
+
+    Flow ids come from the YAML metadata (or the file name). Ids already used
+    in the project get a numeric suffix unless ``overwrite`` is set. Returns
+    one report per source, in input order.
+    """
+    reports = convert_sources(sources, max_workers)
+    stored = {flow["id"]: flow for flow in list_flows(project_id)}
+    taken = set() if overwrite else set(stored)
+    batch: Dict[str, Dict] = {}
+    for report in reports:
+        flow = report.pop("flow", None)
+        if flow is None:
+            continue
+        base = slugify(flow.get("id") or Path(report["file"]).stem, prefix="flujo")
+        flow_id = unique_slug(base, sorted(taken | set(batch)))
+        flow["id"] = flow_id
+        flow["name"] = flow.get("name") or flow_id
+        report["flow_id"] = flow_id
+        previous = stored.get(flow_id)
+        if previous is not None and previous.get("hash") == content_hash(flow):
+            report["unchanged"] = True
+            continue
+        batch[flow_id] = flow
+
+    if batch:
+        repository.save_flows(project_id, batch)
+        for flow_id, flow in batch.items():
+            yaml_writer.submit(project_id, flow_id, flow)
+    return reports
+
+
+def project_rules(project_id: str) -> RuleSet:
+    """Return the built-in validation rules plus those listed in the project metadata."""
+    return RuleSet.from_config(load_project_metadata(project_id).get("validation_rules"))
+
+
+def project_validation(project_id: str) -> ProjectValidation:
+    return ProjectValidation(
+        get_project_dir(project_id),
+        lock_path(DATA_DIR, project_id, "validation"),
+        project_rules(project_id),
+        validation_summaries,
+    )
+
+
+def refresh_project_validation(project_id: str, max_workers: Optional[int] = None) -> Dict[str, Optional[Dict]]:
+    """Validate the flows of a project that changed since their last validation."""
+    return project_validation(project_id).refresh(
+        list_flows(project_id), lambda entry: repository.load_flow(project_id, Path(entry["filename"]).stem), max_workers
+    )
+
+
+def flows_with_validation(project_id: str) -> List[Dict]:
+    """Return the flows of a project with their cached ``validation`` summary (``None`` if pending).
+
+    Pending flows are validated in the background.
+    """
+    flows = list_flows(project_id)
+    validation = project_validation(project_id)
+    summaries = validation.current(validation.read(), flows)
+    if any(summary is None for summary in summaries.values()):
+        project_revalidator.schedule(project_id)
+    return [{**flow, "validation": summaries[flow["id"]]} for flow in flows]
 
 
 def build_project_overview() -> List[Dict]:
@@ -220,7 +358,7 @@ def build_project_overview() -> List[Dict]:
                 "description": metadata.get("description", project.get("description", "")),
                 "created_at": metadata.get("created_at"),
                 "updated_at": metadata.get("updated_at"),
-                "flows": list_flows(project_id),
+                "flows": flows_with_validation(project_id),
             }
         )
     return overview
@@ -231,33 +369,50 @@ def build_project_overview() -> List[Dict]:
 # ---------------------------------------------------------------------------
 
 @app.route("/")
-def index() -> str:
+def index() -> Response:
     projects = build_project_overview()
+    trash_entries = repository.trash_entries()
     active_project_id = request.args.get("project")
     active_flow_id = request.args.get("flow")
     active_project = None
     active_flow = None
-    flow_payload = "{}"
+    active_entry = None
 
     if active_project_id and active_flow_id:
         active_project = next((entry for entry in projects if entry["id"] == active_project_id), None)
         if active_project:
             active_flow = next((flow for flow in active_project.get("flows", []) if flow["id"] == active_flow_id), None)
             if active_flow:
-                flow_payload = json.dumps(
-                    load_flow_data(active_project_id, active_flow_id), ensure_ascii=False
-                )
+                active_entry = stored_flow_entry(active_project_id, active_flow_id)
             else:
                 active_project = None
                 active_flow = None
 
-    return render_template(
-        "index.html",
-        projects=projects,
-        active_project=active_project,
-        active_flow=active_flow,
-        flow_data=flow_payload,
+    etag = None
+    if not active_flow or active_entry:
+        etag = content_hash([_BOOT_ID, projects, trash_entries, active_project_id, active_flow_id, active_entry])
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+
+    flow_payload = "{}"
+    if active_flow:
+        flow_payload = json.dumps(load_flow_data(active_project_id, active_flow_id), ensure_ascii=False)
+
+    response = make_response(
+        render_template(
+            "index.html",
+            projects=projects,
+            trash_entries=trash_entries,
+            active_project=active_project,
+            active_flow=active_flow,
+            flow_data=flow_payload,
+            flow_etag=flow_etag(active_entry) if active_entry else None,
+        )
     )
+    if etag:
+        response.set_etag(etag)
+    return response
 
 
 @app.post("/project/create")
@@ -268,28 +423,14 @@ def create_project() -> Response:
         flash("El nombre del proyecto es obligatorio", "error")
         return redirect(url_for("index"))
 
-    slug = slugify(name, prefix="proyecto")
-    existing = {project["id"] for project in load_projects()}
-    slug = unique_slug(slug, sorted(existing))
+    metadata = register_project(name, description)
+    slug = metadata["id"]
 
     project_dir = get_project_dir(slug)
     project_dir.mkdir(parents=True, exist_ok=True)
     (project_dir / "flows").mkdir(exist_ok=True)
-
-    now = datetime.utcnow().isoformat()
-    metadata = {
-        "id": slug,
-        "name": name,
-        "description": description,
-        "created_at": now,
-        "updated_at": now,
-    }
     save_project_metadata(slug, metadata)
 
-    projects = load_projects()
-    projects.append({"id": slug, "name": name, "description": description, "created_at": now, "updated_at": now})
-    save_projects(projects)
-
     flash("Proyecto creado correctamente", "success")
     return redirect(url_for("index", project=slug))
 
@@ -312,18 +453,19 @@ def rename_project(project_id: str) -> Response:
     )
     save_project_metadata(project_id, metadata)
 
-    projects = load_projects()
-    for project in projects:
-        if project["id"] == project_id:
-            project.update(
-                {
-                    "name": new_name,
-                    "description": description,
-                    "updated_at": metadata["updated_at"],
-                }
-            )
-            break
-    save_projects(projects)
+    def rename(projects: List[Dict]) -> None:
+        for project in projects:
+            if project["id"] == project_id:
+                project.update(
+                    {
+                        "name": new_name,
+                        "description": description,
+                        "updated_at": metadata["updated_at"],
+                    }
+                )
+                break
+
+    update_projects(rename)
 
     flash("Proyecto actualizado", "success")
     return redirect(url_for("index", project=project_id))
@@ -331,17 +473,54 @@ def rename_project(project_id: str) -> Response:
 
 @app.post("/project/<project_id>/delete")
 def delete_project(project_id: str) -> Response:
-    project_dir = get_project_dir(project_id)
-    if project_dir.exists():
-        shutil.rmtree(project_dir, onerror=_handle_remove_readonly)
+    yaml_writer.discard(project_id)
+    repository.delete_project(project_id)
+
+    def remove(projects: List[Dict]) -> None:
+        projects[:] = [project for project in projects if project["id"] != project_id]
 
-    projects = [project for project in load_projects() if project["id"] != project_id]
-    save_projects(projects)
+    update_projects(remove)
 
-    flash("Proyecto eliminado", "success")
+    flash("Proyecto eliminado. Puedes restaurarlo desde la papelera.", "success")
     return redirect(url_for("index"))
 
 
+@app.post("/project/<project_id>/duplicate")
+def duplicate_project(project_id: str) -> Response:
+    if project_id not in {project["id"] for project in load_projects()}:
+        abort(404)
+
+    source = load_project_metadata(project_id)
+    name = request.form.get("project_name", "").strip() or f"{source['name']} (copia)"
+    description = request.form.get("project_description", source.get("description", "")).strip()
+    metadata = register_project(name, description)
+    slug = metadata["id"]
+
+    # Flush pending YAML exports so the duplicate links up-to-date files.
+    yaml_writer.flush(timeout=5)
+    repository.duplicate_project(project_id, slug)
+    save_project_metadata(slug, metadata)
+
+    flash("Proyecto duplicado", "success")
+    return redirect(url_for("index", project=slug))
+
+
+@app.get("/project/<project_id>/export.zip")
+def export_project_archive(project_id: str) -> Response:
+    if project_id not in {project["id"] for project in load_projects()}:
+        abort(404)
+
+    archive = iter_project_archive(
+        project_id,
+        repository.flow_index(project_id),
+        lambda flow_id: repository.load_flow(project_id, flow_id),
+        repository.load_project_metadata(project_id),
+    )
+    response = Response(archive, mimetype="application/zip")
+    response.headers["Content-Disposition"] = f'attachment; filename="{project_id}.zip"'
+    return response
+
+
 @app.post("/project/<project_id>/flow/create")
 def create_flow(project_id: str) -> Response:
     name = request.form.get("flow_name", "").strip() or "Nuevo flujo"
@@ -385,17 +564,40 @@ def rename_flow(project_id: str, flow_id: str) -> Response:
 
 @app.post("/project/<project_id>/flow/<flow_id>/delete")
 def delete_flow(project_id: str, flow_id: str) -> Response:
-    flow_dir = get_flow_dir(project_id)
-    json_path = flow_dir / f"{flow_id}.json"
-    yaml_path = flow_dir / f"{flow_id}.yaml"
-    if json_path.exists():
-        json_path.unlink()
-    if yaml_path.exists():
-        yaml_path.unlink()
-    flash("Flujo eliminado", "success")
+    yaml_writer.discard(project_id, flow_id)
+    repository.delete_flow(project_id, flow_id)
+    flash("Flujo eliminado. Puedes restaurarlo desde la papelera.", "success")
     return redirect(url_for("index", project=project_id))
 
 
+@app.get("/api/trash")
+def list_trash() -> Response:
+    return jsonify({"success": True, "entries": repository.trash_entries()})
+
+
+@app.post("/trash/<entry_id>/restore")
+def restore_trash_entry(entry_id: str) -> Response:
+    try:
+        info = repository.restore_trash_entry(entry_id)
+    except TrashError as error:
+        flash(str(error), "error")
+        return redirect(url_for("index"))
+
+    if info["kind"] == "project":
+        entry = dict(info["metadata"])
+
+        def restore(projects: List[Dict]) -> None:
+            if all(project["id"] != entry["id"] for project in projects):
+                projects.append(entry)
+
+        update_projects(restore)
+        flash("Proyecto restaurado", "success")
+        return redirect(url_for("index", project=info["project_id"]))
+
+    flash("Flujo restaurado", "success")
+    return redirect(url_for("index", project=info["project_id"], flow=info["flow_id"]))
+
+
 @app.get("/project/<project_id>/flow/<flow_id>")
 def open_flow_editor(project_id: str, flow_id: str) -> str:
     return redirect(url_for("index", project=project_id, flow=flow_id))
@@ -404,14 +606,53 @@ def open_flow_editor(project_id: str, flow_id: str) -> str:
 @app.get("/project/<project_id>/validate")
 def validate_flow_view(project_id: str):
     project_metadata = load_project_metadata(project_id)
-    flows = list_flows(project_id)
+    summaries = refresh_project_validation(project_id)
+    flows = [{**flow, "validation": summaries.get(flow["id"])} for flow in list_flows(project_id)]
     return render_template("validate.html", project=project_metadata, flows=flows)
 
 
+@app.get("/api/project/<project_id>/validation")
+def api_project_validation(project_id: str) -> Response:
+    flows = flows_with_validation(project_id)
+    return jsonify(
+        {
+            "flows": {flow["id"]: flow["validation"] for flow in flows},
+            "pending": [flow["id"] for flow in flows if flow["validation"] is None],
+        }
+    )
+
+
+@app.get("/api/project/<project_id>/metrics")
+def api_project_metrics(project_id: str) -> Response:
+    """Return the cached complexity metrics of every flow of a project (``None`` while pending)."""
+    flows = flows_with_validation(project_id)
+    return jsonify(
+        {
+            "flows": {flow["id"]: (flow["validation"] or {}).get("metrics") for flow in flows},
+            "pending": [flow["id"] for flow in flows if flow["validation"] is None],
+        }
+    )
+
+
+@app.post("/api/project/<project_id>/validate")
+def api_validate_project(project_id: str) -> Response:
+    summaries = refresh_project_validation(project_id)
+    return jsonify({"flows": summaries, "pending": [flow_id for flow_id, summary in summaries.items() if summary is None]})
+
+
 @app.get("/api/flow/<project_id>/<flow_id>")
 def api_load_flow(project_id: str, flow_id: str) -> Response:
-    flow_data = load_flow_data(project_id, flow_id)
-    return jsonify(flow_data)
+    stored = stored_flow_entry(project_id, flow_id)
+    if stored is None:
+        return jsonify(load_flow_data(project_id, flow_id))
+
+    etag = flow_etag(stored)
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    response = jsonify(load_flow_data(project_id, flow_id))
+    response.set_etag(etag)
+    return response
 
 
 @app.post("/api/flow/<project_id>/<flow_id>/save")
@@ -425,8 +666,197 @@ def api_save_flow(project_id: str, flow_id: str) -> Response:
     flow_data.setdefault("name", flow_id)
     flow_data.setdefault("description", "")
 
-    save_flow_data(project_id, flow_id, flow_data)
-    return jsonify({"success": True})
+    with repository.flow_lock(project_id, flow_id):
+        if request.if_match:
+            stored = stored_flow_entry(project_id, flow_id)
+            if stored is None or not request.if_match.contains(flow_etag(stored)):
+                return _stale_flow_response()
+        changed = save_flow_data(project_id, flow_id, flow_data)
+
+    return _saved_flow_response(project_id, flow_id, changed)
+
+
+@app.post("/api/flow/<project_id>/<flow_id>/patch")
+def api_patch_flow(project_id: str, flow_id: str) -> Response:
+    payload = request.get_json(force=True, silent=True) or {}
+    base = payload.get("base")
+    operations = payload.get("patch")
+    if not isinstance(base, str) or not isinstance(operations, list):
+        return jsonify({"success": False, "message": "Parche inválido"}), 400
+
+    with repository.flow_lock(project_id, flow_id):
+        stored = stored_flow_entry(project_id, flow_id)
+        if stored is None or flow_etag(stored) != base.strip('"'):
+            return _stale_flow_response()
+        try:
+            # Applied to a copy: values inserted by the patch may be modified by later operations.
+            flow_data = apply_patch(load_flow_data(project_id, flow_id), copy.deepcopy(operations))
+        except JsonPatchError as error:
+            return jsonify({"success": False, "message": str(error)}), 400
+        if not isinstance(flow_data.get("nodes"), list) or not isinstance(flow_data.get("edges"), list):
+            return jsonify({"success": False, "message": "Datos de flujo inválidos"}), 400
+
+        for key, default in (("id", flow_id), ("name", flow_id), ("description", "")):
+            if key not in flow_data:
+                flow_data[key] = default
+                operations.append({"op": "add", "path": f"/{key}", "value": default})
+        changed = save_flow_data(project_id, flow_id, flow_data, patch=operations)
+
+    return _saved_flow_response(project_id, flow_id, changed)
+
+
+@app.get("/api/flow/<project_id>/<flow_id>/revisions")
+def api_flow_revisions(project_id: str, flow_id: str) -> Response:
+    stored = stored_flow_entry(project_id, flow_id)
+    return jsonify(
+        {
+            "success": True,
+            "current": stored["revision"] if stored else None,
+            "revisions": repository.flow_revisions(project_id, flow_id),
+        }
+    )
+
+
+@app.get("/api/flow/<project_id>/<flow_id>/revisions/<int:revision>")
+def api_flow_revision(project_id: str, flow_id: str, revision: int) -> Response:
+    flow_data = repository.load_flow_revision(project_id, flow_id, revision)
+    if flow_data is None:
+        return jsonify({"success": False, "message": "Revisión no disponible"}), 404
+
+    # A recorded revision never changes, so its tag can be derived from the content alone.
+    etag = f"{revision}-{content_hash(flow_data)[:16]}"
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    response = jsonify(flow_data)
+    response.set_etag(etag)
+    return response
+
+
+@app.get("/api/flow/<project_id>/<flow_id>/paths")
+def api_flow_paths(project_id: str, flow_id: str) -> Response:
+    """Stream the root → terminal paths of a stored flow as NDJSON.
+
+    Query parameters: ``offset``, ``limit``, ``terminal`` (paths ending at a
+    node) and ``through`` (paths visiting a node). Each line is
+    ``{"index": n, "path": [...]}``; ``X-Path-Count`` holds the number of
+    matching paths and ``X-Next-Offset`` the start of the next page.
+    """
+    flow_data = repository.load_flow(project_id, flow_id)
+    if flow_data is None:
+        return jsonify({"success": False, "message": "Flujo no encontrado"}), 404
+
+    offset = request.args.get("offset", 0, type=int)
+    limit = request.args.get("limit", type=int)
+    if offset < 0 or (limit is not None and limit < 0):
+        return jsonify({"success": False, "message": "Parámetros de paginación inválidos"}), 400
+    terminal = request.args.get("terminal") or None
+    through = request.args.get("through") or None
+
+    graph = FlowGraph.from_flow(flow_data)
+    for node_id in (terminal, through):
+        if node_id is not None and node_id not in graph:
+            return jsonify({"success": False, "message": f"Nodo desconocido: {node_id}"}), 400
+    try:
+        total, paths = graph.select_paths(offset, terminal, through)
+    except ValueError:
+        return jsonify({"success": False, "message": "El flujo contiene un ciclo; no se pueden enumerar sus caminos."}), 409
+
+    def generate():
+        lines = []
+        for index, path in enumerate(islice(paths, limit), start=offset):
+            lines.append(json.dumps({"index": index, "path": path}, ensure_ascii=False) + "\n")
+            if len(lines) == 256:
+                yield "".join(lines)
+                lines.clear()
+        if lines:
+            yield "".join(lines)
+
+    response = Response(generate(), mimetype="application/x-ndjson")
+    response.headers["X-Path-Count"] = str(total)
+    end = total if limit is None else min(total, offset + limit)
+    if end < total:
+        response.headers["X-Next-Offset"] = str(end)
+    return response
+
+
+@app.get("/api/flow/<project_id>/<flow_id>/closure")
+def api_flow_closure(project_id: str, flow_id: str) -> Response:
+    """Return the ancestors and descendants of every node of a stored flow.
+
+    See :func:`utils.closure.flow_closure` for the format; the response is
+    tagged with the flow revision.
+    """
+    stored = stored_flow_entry(project_id, flow_id)
+    etag = flow_etag(stored) if stored is not None else None
+    if etag is not None:
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+    flow_data = repository.load_flow(project_id, flow_id)
+    if flow_data is None:
+        return jsonify({"success": False, "message": "Flujo no encontrado"}), 404
+
+    try:
+        response = jsonify(flow_closure(flow_data, CLOSURE_LIMIT))
+    except ClosureError as error:
+        return jsonify({"success": False, "message": str(error)}), 409
+    if etag is not None:
+        response.set_etag(etag)
+    return response
+
+
+@app.get("/api/flow/<project_id>/<flow_id>/metrics")
+def api_flow_metrics(project_id: str, flow_id: str) -> Response:
+    """Return the complexity metrics of a stored flow, tagged with its revision."""
+    stored = stored_flow_entry(project_id, flow_id)
+    etag = flow_etag(stored) if stored is not None else None
+    if etag is not None:
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+    flow_data = repository.load_flow(project_id, flow_id)
+    if flow_data is None:
+        return jsonify({"success": False, "message": "Flujo no encontrado"}), 404
+
+    response = jsonify(flow_metrics(flow_data))
+    if etag is not None:
+        response.set_etag(etag)
+    return response
+
+
+@app.get("/api/flow/<project_id>/<flow_id>/mandatory-questions")
+def api_flow_mandatory_questions(project_id: str, flow_id: str) -> Response:
+    """Return the questions on every path of a stored flow, tagged with its revision.
+
+    See :func:`utils.mandatory_questions.mandatory_questions` for the format.
+    """
+    stored = stored_flow_entry(project_id, flow_id)
+    etag = flow_etag(stored) if stored is not None else None
+    if etag is not None:
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+    flow_data = repository.load_flow(project_id, flow_id)
+    if flow_data is None:
+        return jsonify({"success": False, "message": "Flujo no encontrado"}), 404
+
+    response = jsonify(mandatory_questions(flow_data))
+    if etag is not None:
+        response.set_etag(etag)
+    return response
+
+
+@app.get("/api/flow/<project_id>/<flow_id>/yaml")
+def api_flow_yaml(project_id: str, flow_id: str) -> Response:
+    wait = request.args.get("wait", type=float)
+    if wait is not None:
+        yaml_writer.wait(project_id, flow_id, timeout=max(wait, 0.0))
+    status = yaml_writer.status(project_id, flow_id)
+    yaml_path = get_flow_dir(project_id) / f"{flow_id}.yaml"
+    if not yaml_path.exists():
+        return jsonify({"success": False, "message": "El flujo no tiene YAML generado", "yaml_status": status}), 404
+    return jsonify({"success": True, "yaml": yaml_path.read_text(encoding="utf-8"), "yaml_status": status})
 
 
 @app.post("/api/flow/validate")
@@ -436,10 +866,98 @@ def api_validate_flow() -> Response:
     if not isinstance(flow_data, dict):
         return jsonify({"success": False, "message": "Datos de flujo inválidos"}), 400
 
-    result = validate_flow(flow_data)
+    project_id = payload.get("project_id")
+    rules = project_rules(project_id) if isinstance(project_id, str) and project_id else DEFAULT_RULES
+    result = validate_flow(flow_data, VALIDATION_PATH_LIMIT, rules=rules)
     return jsonify(result)
 
 
+@app.post("/api/flow/closure")
+def api_closure() -> Response:
+    payload = request.get_json(force=True, silent=True) or {}
+    flow_data = payload.get("flow_data")
+    if not isinstance(flow_data, dict):
+        return jsonify({"success": False, "message": "Datos de flujo inválidos"}), 400
+
+    try:
+        return jsonify(flow_closure(flow_data, CLOSURE_LIMIT))
+    except ClosureError as error:
+        return jsonify({"success": False, "message": str(error)}), 409
+
+
+@app.post("/api/flow/mandatory-questions")
+def api_mandatory_questions() -> Response:
+    payload = request.get_json(force=True, silent=True) or {}
+    flow_data = payload.get("flow_data")
+    if not isinstance(flow_data, dict):
+        return jsonify({"success": False, "message": "Datos de flujo inválidos"}), 400
+
+    return jsonify(mandatory_questions(flow_data))
+
+
+@app.get("/api/validation-cache")
+def api_validation_cache_stats() -> Response:
+    return jsonify(validation_cache.stats())
+
+
+@app.post("/api/validation-sessions")
+def api_open_validation_session() -> Response:
+    payload = request.get_json(force=True, silent=True) or {}
+    flow_data = payload.get("flow_data")
+    if not isinstance(flow_data, dict):
+        return jsonify({"success": False, "message": "Datos de flujo inválidos"}), 400
+
+    project_id = payload.get("project_id")
+    rules = project_rules(project_id) if isinstance(project_id, str) and project_id else DEFAULT_RULES
+    session_id, report = validation_sessions.open(flow_data, rules)
+    return jsonify({"session": session_id, **report}), 201
+
+
+@app.post("/api/validation-sessions/<session_id>/edits")
+def api_edit_validation_session(session_id: str) -> Response:
+    payload = request.get_json(force=True, silent=True) or {}
+    edits = payload.get("edits")
+    if not isinstance(edits, list):
+        return jsonify({"success": False, "message": "Operaciones de validación inválidas"}), 400
+
+    try:
+        report = validation_sessions.apply(session_id, edits)
+    except ValidationSessionError as error:
+        return jsonify({"success": False, "message": str(error)}), 409
+    if report is None:
+        return jsonify({"success": False, "message": "La sesión de validación ha expirado"}), 404
+    return jsonify({"session": session_id, **report})
+
+
+@app.delete("/api/validation-sessions/<session_id>")
+def api_close_validation_session(session_id: str) -> Response:
+    validation_sessions.close(session_id)
+    return Response(status=204)
+
+
+@app.post("/project/<project_id>/import")
+def import_project_flows(project_id: str) -> Response:
+    if project_id not in {project["id"] for project in load_projects()}:
+        return jsonify({"success": False, "message": "Proyecto no encontrado"}), 404
+
+    sources: List[ImportSource] = []
+    try:
+        for upload in request.files.getlist("files"):
+            filename = upload.filename or ""
+            if filename.lower().endswith(".zip"):
+                sources.extend(read_archive(upload.stream))
+            else:
+                sources.append((filename, upload.read()))
+    except YamlImportError as error:
+        return jsonify({"success": False, "message": str(error)}), 400
+    if not sources:
+        return jsonify({"success": False, "message": "Debes adjuntar ficheros YAML o un ZIP."}), 400
+
+    reports = import_flow_sources(project_id, sources, overwrite=request.form.get("overwrite") == "1")
+    imported = sum(1 for report in reports if report["success"])
+    return jsonify({"success": imported == len(reports), "imported": imported, "results": reports})
+
+
 @app.post("/import_yaml")
 def import_yaml() -> Response:
     payload = request.get_json(force=True, silent=True) or {}
@@ -466,12 +984,75 @@ def export_yaml() -> Response:
     if not all([project_id, flow_id, isinstance(flow_data, dict)]):
         return jsonify({"success": False, "message": "Datos incompletos"}), 400
 
+    stored = stored_flow_entry(project_id, flow_id)
+    unchanged = stored is not None and stored.get("hash") == content_hash(flow_data)
+    if unchanged:
+        yaml_writer.wait(project_id, flow_id)
+    else:
+        yaml_writer.discard(project_id, flow_id)
     yaml_content, yaml_dict = flow_to_yaml(flow_data)
-    write_yaml_file(project_id, flow_id, yaml_content)
+    if not unchanged or not (get_flow_dir(project_id) / f"{flow_id}.yaml").exists():
+        write_yaml_file(project_id, flow_id, yaml_content)
 
     return jsonify({"success": True, "yaml": yaml_content, "structure": yaml_dict})
 
 
+@app.cli.command("rebuild-manifest")
+@click.argument("project_id", required=False)
+@click.option("--force", is_flag=True, help="Regenerar aunque el manifiesto parezca actualizado.")
+def rebuild_manifest_command(project_id: Optional[str], force: bool) -> None:
+    """Regenerate missing or stale flow manifests from the stored flows."""
+    project_ids = [project_id] if project_id else [project["id"] for project in load_projects()]
+    for current in project_ids:
+        if not force and not repository.flow_index_is_stale(current):
+            click.echo(f"{current}: manifiesto al día ({len(repository.flow_index(current))} flujos).")
+            continue
+        flows = repository.rebuild_flow_index(current)
+        click.echo(f"{current}: manifiesto regenerado ({len(flows)} flujos).")
+
+
+@app.cli.command("import-yaml")
+@click.argument("project_id")
+@click.argument("source", type=click.Path(exists=True, path_type=Path))
+@click.option("--overwrite", is_flag=True, help="Reemplazar los flujos con el mismo identificador.")
+@click.option("--workers", type=int, default=None, help="Número de procesos de conversión.")
+def import_yaml_command(project_id: str, source: Path, overwrite: bool, workers: Optional[int]) -> None:
+    """Import every YAML file of a directory or ZIP archive into a project."""
+    if project_id not in {project["id"] for project in load_projects()}:
+        raise click.ClickException(f"El proyecto '{project_id}' no existe.")
+    try:
+        sources = read_directory(source) if source.is_dir() else read_archive(source)
+    except YamlImportError as error:
+        raise click.ClickException(str(error)) from error
+
+    reports = import_flow_sources(project_id, sources, overwrite=overwrite, max_workers=workers)
+    yaml_writer.flush()
+    for report in reports:
+        if not report["success"]:
+            click.echo(f"✗ {report['file']}: {report['error']}")
+            continue
+        status = "sin cambios" if report.get("unchanged") else "importado"
+        notes = "" if report["valid"] else f" ({len(report['errors'])} errores de validación)"
+        click.echo(f"✓ {report['file']} → {report['flow_id']}: {status}{notes}")
+    imported = sum(1 for report in reports if report["success"])
+    click.echo(f"{imported} de {len(reports)} ficheros importados.")
+
+
+@app.cli.command("migrate-sqlite")
+@click.option(
+    "--database",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Ruta de la base de datos SQLite de destino.",
+)
+def migrate_sqlite_command(database: Optional[Path]) -> None:
+    """Copy every project and flow stored under data/ into a SQLite database."""
+    source = FileSystemRepository(DATA_DIR)
+    target = create_repository("sqlite", DATA_DIR, database or SQLITE_DATABASE)
+    copied = copy_repository(source, target)
+    click.echo(f"Migrados {copied['projects']} proyectos y {copied['flows']} flujos.")
+
+
 @app.errorhandler(404)
 def not_found(_: Exception) -> tuple[str, int]:
     return "Recurso no encontrado", 404
@@ -0,0 +1,240 @@
+"""Memory and speed of the CSR graph core against the graphs it replaced.
+
+Builds the same synthetic flows (see ``validator_scaling.py``) as
+
+* ``networkx``: :func:`utils.paths.build_graph`, a ``DiGraph`` carrying a copy
+  of every node and edge dictionary, analysed with networkx algorithms;
+* ``dict``: the previous ``FlowGraph`` (adjacency lists in dictionaries keyed
+  by node id), kept verbatim below;
+* ``csr``: the current :class:`utils.paths.FlowGraph`.
+
+For each it reports the build time, the time to compute roots, terminals,
+topological order, cycle and per-terminal path counts, and the memory the
+graph keeps alive (measured with :mod:`tracemalloc` in a separate pass, so it
+does not slow down the timings). All three must agree. It also times a bare
+``import`` of networkx and of :mod:`utils.paths` in fresh interpreters.
+
+Usage (from ``decision_tree_builder/``)::
+
+    python benchmarks/graph_core.py [--sizes 10000 50000 100000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.validator_scaling import synthetic_flow  # noqa: E402
+from utils.paths import FlowGraph, build_graph, roots, terminals  # noqa: E402
+
+VARIANTS = ("valid", "cycle")
+
+
+@dataclass
+class DictFlowGraph:
+    """The dictionary-based graph core this benchmark compares against."""
+
+    nodes: List[str] = field(default_factory=list)
+    successors: Dict[str, List[str]] = field(default_factory=dict)
+    in_degree: Dict[str, int] = field(default_factory=dict)
+    _edges: Set[Tuple[str, str]] = field(default_factory=set, repr=False)
+
+    @classmethod
+    def from_flow(cls, flow_data: Dict) -> "DictFlowGraph":
+        graph = cls()
+        for node in flow_data.get("nodes", []):
+            node_id = node.get("id") if isinstance(node, dict) else None
+            if node_id:
+                graph.add_node(node_id)
+        for edge in flow_data.get("edges", []):
+            if isinstance(edge, dict) and edge.get("source") and edge.get("target"):
+                graph.add_edge(edge["source"], edge["target"])
+        return graph
+
+    def add_node(self, node_id: str) -> None:
+        if node_id not in self.successors:
+            self.nodes.append(node_id)
+            self.successors[node_id] = []
+            self.in_degree[node_id] = 0
+
+    def add_edge(self, source: str, target: str) -> None:
+        self.add_node(source)
+        self.add_node(target)
+        if (source, target) in self._edges:
+            return
+        self._edges.add((source, target))
+        self.successors[source].append(target)
+        self.in_degree[target] += 1
+
+    def roots(self) -> List[str]:
+        return [node for node in self.nodes if not self.in_degree[node]]
+
+    def terminals(self) -> List[str]:
+        return [node for node in self.nodes if not self.successors[node]]
+
+    def topological_order(self) -> Optional[List[str]]:
+        remaining = dict(self.in_degree)
+        queue = deque(node for node in self.nodes if not remaining[node])
+        order: List[str] = []
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for child in self.successors[node]:
+                remaining[child] -= 1
+                if not remaining[child]:
+                    queue.append(child)
+        return order if len(order) == len(self.nodes) else None
+
+    def find_cycle(self) -> Optional[List[str]]:
+        state: Dict[str, bool] = {}
+        for start in self.nodes:
+            if start in state:
+                continue
+            state[start] = True
+            path = [start]
+            stack = [iter(self.successors[start])]
+            while stack:
+                for child in stack[-1]:
+                    on_path = state.get(child)
+                    if on_path:
+                        return path[path.index(child):] + [child]
+                    if on_path is None:
+                        state[child] = True
+                        path.append(child)
+                        stack.append(iter(self.successors[child]))
+                        break
+                else:
+                    state[path.pop()] = False
+                    stack.pop()
+        return None
+
+    def path_counts(self) -> Optional[Dict[str, int]]:
+        order = self.topological_order()
+        if order is None:
+            return None
+        counts = dict.fromkeys(self.nodes, 0)
+        for node in order:
+            if not self.in_degree[node]:
+                counts[node] = 1
+            for child in self.successors[node]:
+                counts[child] += counts[node]
+        return {node: counts[node] for node in self.nodes if not self.successors[node]}
+
+
+def analyse(graph) -> Dict[str, object]:
+    order = graph.topological_order()
+    return {
+        "roots": graph.roots(),
+        "terminals": graph.terminals(),
+        "acyclic": order is not None,
+        "cycle": graph.find_cycle() if order is None else None,
+        "path_counts": graph.path_counts(),
+    }
+
+
+def analyse_networkx(graph) -> Dict[str, object]:
+    import networkx as nx
+
+    try:
+        order = list(nx.topological_sort(graph))
+    except nx.NetworkXUnfeasible:
+        order = None
+    cycle = None
+    if order is None:
+        edges = nx.find_cycle(graph, orientation="original")
+        cycle = [edge[0] for edge in edges] + [edges[0][0]]
+    counts = None
+    if order is not None:
+        below = dict.fromkeys(graph.nodes, 0)
+        for node in order:
+            if not graph.in_degree(node):
+                below[node] = 1
+            for child in graph.successors(node):
+                below[child] += below[node]
+        counts = {node: below[node] for node in terminals(graph)}
+    return {
+        "roots": roots(graph),
+        "terminals": terminals(graph),
+        "acyclic": order is not None,
+        "cycle": cycle,
+        "path_counts": counts,
+    }
+
+
+def build_csr(flow: Dict) -> FlowGraph:
+    graph = FlowGraph.from_flow(flow)
+    graph.roots()  # compresses the adjacency
+    return graph
+
+
+CORES: Dict[str, Tuple[Callable[[Dict], object], Callable[[object], Dict]]] = {
+    "networkx": (build_graph, analyse_networkx),
+    "dict": (DictFlowGraph.from_flow, analyse),
+    "csr": (build_csr, analyse),
+}
+
+
+def retained_bytes(build: Callable[[Dict], object], flow: Dict) -> int:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    graph = build(flow)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del graph
+    return size
+
+
+def import_seconds(module: str) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True, cwd=Path(__file__).resolve().parents[1])
+    return time.perf_counter() - started
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 100_000])
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=VARIANTS)
+    args = parser.parse_args()
+
+    baseline = import_seconds("sys")
+    print(f"import networkx   {import_seconds('networkx') - baseline:.3f} s")
+    print(f"import utils.paths {import_seconds('utils.paths') - baseline:.3f} s\n")
+
+    mismatches = 0
+    print(f"{'nodes':>8} {'variant':<8} {'core':<9} {'build s':>8} {'analyse s':>10} {'memory MB':>10}  same")
+    for size in args.sizes:
+        for variant in args.variants:
+            flow = synthetic_flow(size, variant)
+            expected = None
+            for name, (build, run) in CORES.items():
+                started = time.perf_counter()
+                graph = build(flow)
+                built = time.perf_counter()
+                result = run(graph)
+                finished = time.perf_counter()
+                del graph
+                memory = retained_bytes(build, flow) / 1e6
+                expected = expected or result
+                same = result == expected
+                mismatches += not same
+                print(
+                    f"{len(flow['nodes']):>8} {variant:<8} {name:<9} {built - started:>8.3f}"
+                    f" {finished - built:>10.3f} {memory:>10.1f}  {'yes' if same else 'NO'}"
+                )
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
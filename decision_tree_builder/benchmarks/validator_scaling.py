@@ -0,0 +1,297 @@
+"""Scaling benchmark for :func:`utils.validator.validate_flow`.
+
+Generates synthetic decision trees of 10k–100k nodes (valid ones and ones
+seeded with every kind of error), checks that the linear validator returns
+exactly what the previous networkx-based implementation returned (the same
+paths, listed depth first rather than grouped by terminal) and times both. The reference is quadratic, so it only runs up to ``--reference-limit``
+nodes, and its path enumeration (one ``all_simple_paths`` walk per terminal)
+only up to ``--paths-limit``; above that errors and warnings are compared
+and the row is marked ``yes*``.
+
+Usage (from ``decision_tree_builder/``)::
+
+    python benchmarks/validator_scaling.py [--sizes 10000 50000 100000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import networkx as nx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.paths import build_graph, roots, terminals  # noqa: E402
+from utils.validation_rules import _extract_expected_labels  # noqa: E402
+from utils.validator import validate_flow  # noqa: E402
+
+VARIANTS = ("valid", "duplicates", "cycle", "dangling", "labels")
+
+
+def synthetic_flow(size: int, variant: str = "valid", seed: int = 7) -> Dict:
+    """Return a binary question tree with ``size`` nodes, broken according to ``variant``."""
+    rng = random.Random(seed)
+    nodes: List[Dict] = [{"id": "start", "type": "start", "title": "Start"}]
+    edges: List[Dict] = []
+    questions = ["q0"]
+    nodes.append({"id": "q0", "type": "question", "expected_answers": ["Sí", "No"]})
+    edges.append({"id": "e0", "source": "start", "target": "q0", "label": "start"})
+    frontier = ["q0"]
+    counter = 1
+    while frontier and len(nodes) < size:
+        parent = frontier.pop(0)
+        for answer in ("Sí", "No"):
+            node_id = f"n{counter}"
+            counter += 1
+            if len(nodes) + 2 * len(frontier) + 4 < size:
+                nodes.append({"id": node_id, "type": "question", "expected_answers": ["Sí", "No"]})
+                questions.append(node_id)
+                frontier.append(node_id)
+            else:
+                nodes.append({"id": node_id, "type": "message", "message": f"Fin {node_id}"})
+            edges.append({"id": f"e{counter}", "source": parent, "target": node_id, "label": f"{answer}: {node_id}"})
+    for parent in frontier:
+        # Questions left without children still need an exit.
+        node_id = f"n{counter}"
+        counter += 1
+        nodes.append({"id": node_id, "type": "message"})
+        edges.append({"id": f"e{counter}", "source": parent, "target": node_id, "label": "Sí"})
+
+    picks = rng.sample(range(2, len(nodes)), min(20, len(nodes) - 2))
+    if variant == "duplicates":
+        for index in picks:
+            nodes.append(dict(nodes[index]))
+    elif variant == "cycle":
+        deep = questions[-1]
+        edges.append({"id": "back", "source": deep, "target": questions[len(questions) // 3], "label": "Sí"})
+        edges.append({"id": "loop", "source": questions[-2], "target": questions[-2], "label": "No"})
+    elif variant == "dangling":
+        for index in picks[:10]:
+            edges.append({"id": f"x{index}", "source": nodes[index]["id"], "target": f"ghost{index}"})
+        edges.append({"id": "half", "source": "q0"})
+        edges.append("not-an-edge")
+        nodes.append({"type": "message"})
+    elif variant == "labels":
+        for edge in rng.sample(edges[1:], min(20, len(edges) - 1)):
+            edge["label"] = "Quizás"
+        nodes.append({"id": "orphan", "type": "message"})
+    return {"id": f"synthetic-{variant}", "name": variant, "nodes": nodes, "edges": edges}
+
+
+def _collect_node_ids(nodes: List[Dict]) -> Tuple[List[str], List[str]]:
+    """Return node identifiers and the list of nodes without identifiers."""
+    ids: List[str] = []
+    missing: List[str] = []
+    for node in nodes:
+        node_id = node.get("id") if isinstance(node, dict) else None
+        if not node_id:
+            missing.append(str(node))
+            continue
+        ids.append(node_id)
+    return ids, missing
+
+
+def reference_validate_flow(flow_data: Dict, with_paths: bool = True) -> Dict[str, object]:
+    """The networkx-based validator this module replaced, kept verbatim for comparison.
+
+    Only the reachability warnings, added later, come from :func:`reference_reachability`.
+    """
+    errors: List[str] = []
+    warnings: List[str] = []
+
+    nodes = flow_data.get("nodes", []) if isinstance(flow_data, dict) else []
+    edges = flow_data.get("edges", []) if isinstance(flow_data, dict) else []
+
+    node_ids, missing_nodes = _collect_node_ids(nodes)
+    if missing_nodes:
+        errors.append("Hay nodos sin identificador definido.")
+
+    duplicates = {node_id for node_id in node_ids if node_ids.count(node_id) > 1}
+    if duplicates:
+        errors.append(f"IDs duplicados detectados: {', '.join(sorted(duplicates))}.")
+
+    node_lookup = {node.get("id"): node for node in nodes if node.get("id")}
+
+    edges_by_source: Dict[str, List[Dict]] = {}
+    edges_by_target: Dict[str, List[Dict]] = {}
+    for edge in edges:
+        if not isinstance(edge, dict):
+            warnings.append("Se ignoró una arista con formato inválido.")
+            continue
+        source = edge.get("source")
+        target = edge.get("target")
+        label = edge.get("label")
+        if not source or not target:
+            errors.append("Una conexión carece de origen o destino.")
+            continue
+        if source not in node_lookup:
+            errors.append(f"La conexión hace referencia a un nodo inexistente: {source}.")
+        if target not in node_lookup:
+            errors.append(f"La conexión hace referencia a un nodo inexistente: {target}.")
+        if not label:
+            warnings.append(f"La conexión {source} → {target} no tiene etiqueta definida.")
+        edges_by_source.setdefault(source, []).append(edge)
+        edges_by_target.setdefault(target, []).append(edge)
+
+    start_nodes = [node for node in nodes if node.get("type") == "start"]
+    start_id = None
+    if not start_nodes:
+        errors.append("Debe existir un nodo de inicio (Start).")
+    else:
+        if len(start_nodes) > 1:
+            errors.append("Solo puede existir un nodo de inicio (Start).")
+        start_node = start_nodes[0]
+        start_id = start_node.get("id")
+        if not start_id:
+            errors.append("El nodo de inicio debe tener un identificador definido.")
+        elif str(start_id).lower() != "start":
+            errors.append("El identificador del nodo de inicio debe ser 'start'.")
+        incoming = edges_by_target.get(start_id or "", [])
+        if incoming:
+            errors.append("El nodo de inicio no puede tener conexiones entrantes.")
+        outgoing = edges_by_source.get(start_id or "", [])
+        if len(outgoing or []) > 1:
+            errors.append("El nodo de inicio solo puede tener una conexión saliente.")
+        if not outgoing:
+            warnings.append("El nodo de inicio no tiene conexiones salientes.")
+
+    graph = build_graph(flow_data)
+
+    if graph.number_of_nodes() == 0:
+        errors.append("El flujo no contiene nodos.")
+        return {"valid": False, "errors": errors, "warnings": warnings, "paths": []}
+
+    start_nodes = roots(graph)
+    if not start_nodes:
+        errors.append("No se encontraron nodos raíz (sin entradas).")
+    elif start_id and any(node != start_id for node in start_nodes):
+        remaining = [node for node in start_nodes if node != start_id]
+        if remaining:
+            errors.append(
+                "Todos los nodos raíz deben estar conectados desde Start. Sin entradas: "
+                + ", ".join(sorted(remaining))
+                + "."
+            )
+
+    end_nodes = terminals(graph)
+    if not end_nodes:
+        errors.append("No se encontraron nodos terminales.")
+
+    try:
+        cycle = nx.find_cycle(graph, orientation="original")
+    except nx.NetworkXNoCycle:
+        cycle = None
+    if cycle:
+        formatted = " → ".join(edge[0] for edge in cycle + [cycle[0]])
+        errors.append(f"Se detectó un ciclo en el flujo: {formatted}.")
+
+    for node in nodes:
+        node_id = node.get("id")
+        node_type = node.get("type")
+        outgoing = edges_by_source.get(node_id, [])
+        if node_type == "message" and outgoing:
+            errors.append(f"El nodo terminal '{node_id}' no debe tener conexiones salientes.")
+        if node_type == "question":
+            expected_labels = _extract_expected_labels(node.get("expected_answers"))
+            if expected_labels:
+                expected_set = {label for label in expected_labels}
+                for edge in outgoing:
+                    label = (edge.get("label") or "").split(":", 1)[0].strip()
+                    if label and label not in expected_set:
+                        errors.append(
+                            f"La etiqueta '{label}' desde '{node_id}' no coincide con expected_answers."
+                        )
+                missing_labels = expected_set.difference(
+                    {(edge.get("label") or "").split(":", 1)[0].strip() for edge in outgoing}
+                )
+                if missing_labels:
+                    warnings.append(
+                        f"La pregunta '{node_id}' tiene respuestas esperadas sin conexión: {', '.join(sorted(missing_labels))}."
+                    )
+
+    warnings.extend(reference_reachability(graph, start_id, nodes))
+
+    all_paths = reference_enumerate_paths(graph) if not errors and with_paths else []
+
+    return {"valid": not errors, "errors": errors, "warnings": warnings, "paths": all_paths}
+
+
+def reference_reachability(graph: nx.DiGraph, start_id, nodes: List[Dict]) -> List[str]:
+    """Unreachable and dead-end nodes, from ``nx.descendants`` and ``nx.ancestors``."""
+    declared = {node["id"] for node in nodes if isinstance(node, dict) and node.get("id")}
+    messages = {node["id"] for node in nodes if isinstance(node, dict) and node.get("id") and node.get("type") == "message"}
+    warnings: List[str] = []
+    if start_id and start_id in graph:
+        reached = nx.descendants(graph, start_id) | {start_id}
+        unreachable = sorted(declared - reached)
+        if unreachable:
+            warnings.append(f"Nodos inalcanzables desde el inicio: {', '.join(unreachable)}.")
+    live = set(messages)
+    for message in messages:
+        live |= nx.ancestors(graph, message)
+    dead = sorted(declared - live)
+    if dead:
+        warnings.append(f"Nodos desde los que no se llega a ningún mensaje final: {', '.join(dead)}.")
+    return warnings
+
+
+def reference_enumerate_paths(graph: nx.DiGraph) -> List[List[str]]:
+    paths: List[List[str]] = []
+    for start in roots(graph):
+        for end in terminals(graph):
+            if start == end:
+                paths.append([start])
+                continue
+            for path in nx.all_simple_paths(graph, start, end):
+                if path not in paths:
+                    paths.append(path)
+    return paths
+
+
+def timed(function: Callable[..., Dict], *args) -> tuple:
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 25_000, 50_000, 100_000])
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=VARIANTS)
+    parser.add_argument("--reference-limit", type=int, default=50_000)
+    parser.add_argument("--paths-limit", type=int, default=2_000)
+    args = parser.parse_args()
+
+    mismatches = 0
+    print(f"{'nodes':>8} {'variant':<11} {'errors':>6} {'paths':>7} {'linear s':>9} {'reference s':>12}  same")
+    for size in args.sizes:
+        for variant in args.variants:
+            flow = synthetic_flow(size, variant)
+            result, elapsed = timed(validate_flow, flow, None, None)
+            # The dynamic-programming count must agree with the full listing.
+            mismatches += result["path_count"] != len(result["paths"])
+            reference_time = "-"
+            same = "-"
+            if size <= args.reference_limit:
+                with_paths = size <= args.paths_limit
+                expected, reference_elapsed = timed(reference_validate_flow, flow, with_paths)
+                compared = {key: result[key] for key in ("valid", "errors", "warnings")}
+                compared["paths"] = sorted(result["paths"]) if with_paths else []
+                expected["paths"] = sorted(expected["paths"])
+                reference_time = f"{reference_elapsed:.3f}"
+                same = ("yes" if with_paths else "yes*") if expected == compared else "NO"
+                mismatches += expected != compared
+            print(
+                f"{len(flow['nodes']):>8} {variant:<11} {len(result['errors']):>6} {len(result['paths']):>7}"
+                f" {elapsed:>9.3f} {reference_time:>12}  {same}"
+            )
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -109,6 +109,13 @@
   let lastExpandedPropertiesWidth = PROPERTIES_DEFAULT_WIDTH;
   let hasInitialViewportFit = false;
   let savedSnapshot = null;
+  // Document exactly as stored on the server for config.flowEtag; base of delta saves.
+  let serverSnapshot = null;
+  // Server-side validation session kept in sync with the editor through node and edge edits.
+  const LIVE_VALIDATION_DELAY = 400;
+  const liveValidation = { session: null, items: null, timer: null, running: false, queued: false };
+  // Ancestor/descendant bitsets of the graph, fetched once per set of node ids and connections.
+  const lineage = { key: null, request: null };
 
   function cloneFlowSnapshot(data) {
     if (!data || typeof data !== 'object') {
@@ -129,6 +136,79 @@
     return cloneFlowSnapshot(savedSnapshot);
   }
 
+  serverSnapshot = cloneFlowSnapshot(flowData);
+
+  function stableStringify(value) {
+    if (Array.isArray(value)) {
+      return `[${value.map((item) => (item === undefined ? 'null' : stableStringify(item))).join(',')}]`;
+    }
+    if (value && typeof value === 'object') {
+      const entries = Object.keys(value)
+        .filter((key) => value[key] !== undefined)
+        .sort()
+        .map((key) => `${JSON.stringify(key)}:${stableStringify(value[key])}`);
+      return `{${entries.join(',')}}`;
+    }
+    return JSON.stringify(value);
+  }
+
+  function escapePointerToken(token) {
+    return String(token).replace(/~/g, '~0').replace(/\//g, '~1');
+  }
+
+  function diffCollection(path, baseItems, currentItems, operations) {
+    const currentById = new Map(currentItems.map((item) => [item.id, item]));
+    const keptIds = new Set();
+    const removals = [];
+    const result = [];
+    baseItems.forEach((item, index) => {
+      const id = item && typeof item === 'object' ? item.id : undefined;
+      const current = currentById.get(id);
+      if (current === undefined || keptIds.has(id)) {
+        removals.push(index);
+        return;
+      }
+      keptIds.add(id);
+      result.push(current);
+      if (stableStringify(item) !== stableStringify(current)) {
+        operations.push({ op: 'replace', path: `${path}/${index}`, value: current });
+      }
+    });
+    removals.reverse().forEach((index) => operations.push({ op: 'remove', path: `${path}/${index}` }));
+    currentItems.forEach((item) => {
+      if (!keptIds.has(item.id)) {
+        operations.push({ op: 'add', path: `${path}/-`, value: item });
+        result.push(item);
+      }
+    });
+    return result;
+  }
+
+  function buildFlowPatch(base, current) {
+    // Returns the RFC 6902 operations turning base into current plus the document
+    // the server will hold afterwards (kept in base order, new items appended).
+    const operations = [];
+    const result = {};
+    const keys = new Set([...Object.keys(base), ...Object.keys(current)]);
+    keys.forEach((key) => {
+      const path = `/${escapePointerToken(key)}`;
+      const collection = key === 'nodes' || key === 'edges';
+      if (!(key in current)) {
+        operations.push({ op: 'remove', path });
+      } else if (collection && Array.isArray(base[key]) && Array.isArray(current[key])) {
+        result[key] = diffCollection(path, base[key], current[key], operations);
+      } else {
+        result[key] = current[key];
+        if (!(key in base)) {
+          operations.push({ op: 'add', path, value: current[key] });
+        } else if (stableStringify(base[key]) !== stableStringify(current[key])) {
+          operations.push({ op: 'replace', path, value: current[key] });
+        }
+      }
+    });
+    return { operations, result };
+  }
+
   function isEditingEnabled() {
     return Boolean(body && body.classList.contains('is-editing'));
   }
@@ -192,8 +272,10 @@
         propertiesContent.innerHTML = '<p class="empty">Selecciona un nodo para editar sus propiedades.</p>';
       }
       setPropertiesCollapsed(false, { force: true, silent: true });
+      scheduleLiveValidation();
     } else {
       cancelLinking();
+      closeLiveValidation();
       if (statusBar && !options.silent) {
         statusBar.textContent = state.isDirty
           ? 'Modo visualización activo. Cambios pendientes de guardar.'
@@ -218,6 +300,7 @@
         // Ignore errors thrown by listener callbacks to avoid breaking the editor.
       }
     });
+    scheduleLiveValidation();
   }
 
   function ensureConnectionLayerVisibility() {
@@ -1164,6 +1247,7 @@
 
     updateEdgePositions();
     updateEdgeSelection();
+    showLineage(state.selectedNodeId);
   }
 
   function updateEdgePositions() {
@@ -1480,6 +1564,7 @@
     domNodes.forEach((element, id) => {
       element.classList.toggle('selected', id === nodeId);
     });
+    showLineage(nodeId);
     if (!options.keepEdgeSelection) {
       state.selectedEdgeId = null;
       updateEdgeSelection();
@@ -1496,6 +1581,76 @@
     }
   }
 
+  function loadLineage() {
+    const graph = {
+      nodes: Array.from(state.nodes.keys()).map((id) => ({ id })),
+      edges: Array.from(state.edges.values()).map((edge) => ({ source: edge.source, target: edge.target }))
+    };
+    const key = JSON.stringify(graph);
+    if (lineage.key === key) {
+      return lineage.request;
+    }
+    lineage.key = key;
+    lineage.request = fetch('/api/flow/closure', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ flow_data: graph })
+    })
+      .then((response) => (response.ok ? response.json() : null))
+      .then((closure) => closure && { ...closure, index: new Map(closure.nodes.map((id, position) => [id, position])) })
+      .catch(() => {
+        if (lineage.key === key) {
+          lineage.key = null;
+        }
+        return null;
+      });
+    return lineage.request;
+  }
+
+  function bitsetMembers(hex, nodes) {
+    const members = new Set();
+    for (let digit = 0; digit < hex.length; digit += 1) {
+      const value = parseInt(hex[hex.length - 1 - digit], 16);
+      for (let bit = 0; value && bit < 4; bit += 1) {
+        if (value & (1 << bit)) {
+          members.add(nodes[digit * 4 + bit]);
+        }
+      }
+    }
+    return members;
+  }
+
+  function clearLineage() {
+    domNodes.forEach((element) => element.classList.remove('is-upstream', 'is-downstream'));
+    domEdges.forEach((path) => path.classList.remove('is-upstream', 'is-downstream'));
+  }
+
+  async function showLineage(nodeId) {
+    clearLineage();
+    if (!nodeId) {
+      return;
+    }
+    const closure = await loadLineage();
+    const position = closure ? closure.index.get(nodeId) : undefined;
+    if (state.selectedNodeId !== nodeId || position === undefined) {
+      return;
+    }
+    const upstream = bitsetMembers(closure.ancestors[position], closure.nodes);
+    const downstream = bitsetMembers(closure.descendants[position], closure.nodes);
+    domNodes.forEach((element, id) => {
+      element.classList.toggle('is-upstream', upstream.has(id));
+      element.classList.toggle('is-downstream', downstream.has(id));
+    });
+    state.edges.forEach((edge) => {
+      const path = domEdges.get(edge.id);
+      if (!path) {
+        return;
+      }
+      path.classList.toggle('is-upstream', upstream.has(edge.source) && (upstream.has(edge.target) || edge.target === nodeId));
+      path.classList.toggle('is-downstream', downstream.has(edge.target) && (downstream.has(edge.source) || edge.source === nodeId));
+    });
+  }
+
   function updateEdgeSelection() {
     domEdges.forEach((path, edgeId) => {
       path.classList.toggle('selected', edgeId === state.selectedEdgeId);
@@ -2490,14 +2645,30 @@
       return;
     }
     const payload = buildPayload();
+    const headers = { 'Content-Type': 'application/json' };
+    if (config.flowEtag) {
+      headers['If-Match'] = `"${config.flowEtag}"`;
+    }
+    const flowUrl = `/api/flow/${encodeURIComponent(config.projectId)}/${encodeURIComponent(config.flowId)}`;
     try {
-      const response = await fetch(`/api/flow/${encodeURIComponent(config.projectId)}/${encodeURIComponent(config.flowId)}/save`, {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ flow_data: payload })
-      });
-      if (!response.ok) {
-        throw new Error('No se pudo guardar el flujo');
+      let response = null;
+      let stored = payload;
+      if (config.flowEtag && serverSnapshot) {
+        const delta = buildFlowPatch(serverSnapshot, payload);
+        response = await fetch(`${flowUrl}/patch`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ base: config.flowEtag, patch: delta.operations })
+        });
+        stored = delta.result;
+      }
+      if (!response || response.status === 400) {
+        stored = payload;
+        response = await fetch(`${flowUrl}/save`, {
+          method: 'POST',
+          headers,
+          body: JSON.stringify({ flow_data: payload })
+        });
       }
       let result = null;
       try {
@@ -2505,9 +2676,19 @@
       } catch (error) {
         result = null;
       }
+      if (response.status === 412) {
+        throw new Error((result && result.message) || 'El flujo fue modificado por otra sesión.');
+      }
+      if (!response.ok) {
+        throw new Error('No se pudo guardar el flujo');
+      }
       if (result && result.success === false) {
         throw new Error(result.message || 'No se pudo guardar el flujo');
       }
+      if (result && result.etag) {
+        config.flowEtag = result.etag;
+        serverSnapshot = cloneFlowSnapshot(stored);
+      }
       Object.assign(flowData, payload);
       if (config) {
         config.flowData = cloneFlowSnapshot(flowData) || flowData;
@@ -2516,11 +2697,223 @@
       markClean('Flujo guardado.');
       showToast('Flujo guardado correctamente');
       setEditingMode(false, { silent: true });
+      refreshFlowBadges();
     } catch (error) {
       showToast(error.message, 'error');
     }
   }
 
+  function setFlowBadge(badge, summary) {
+    if (!summary) {
+      badge.className = 'flow-badge flow-badge--pending';
+      badge.textContent = '…';
+      badge.title = 'Validación pendiente';
+    } else if (summary.valid) {
+      badge.className = 'flow-badge flow-badge--valid';
+      badge.textContent = '✔';
+      badge.title = 'Flujo válido';
+    } else {
+      badge.className = 'flow-badge flow-badge--invalid';
+      badge.textContent = '✖';
+      badge.title = `${summary.errors.length} errores: ${summary.errors.join(' ')}`;
+    }
+  }
+
+  function setFlowMetrics(element, metrics) {
+    if (!metrics) {
+      element.textContent = '';
+      element.removeAttribute('title');
+      return;
+    }
+    element.textContent = metrics.acyclic
+      ? `${metrics.node_count} n · ${metrics.path_count} c · prof. ${metrics.max_depth}`
+      : `${metrics.node_count} n · ciclo`;
+    let title = `${metrics.node_count} nodos, ${metrics.edge_count} conexiones, ${metrics.question_count} preguntas`
+      + ` · ramificación media ${metrics.branching_factor} (máx. ${metrics.max_branching})`;
+    if (metrics.acyclic) {
+      title += ` · camino más largo: ${metrics.max_depth} pasos, ${metrics.longest_path_questions} preguntas`;
+    }
+    element.title = title;
+  }
+
+  async function refreshFlowBadges() {
+    // Only flows changed since their last validation are validated again on the server.
+    const project = document.querySelector(`[data-project-id="${CSS.escape(config.projectId)}"]`);
+    if (!project) {
+      return;
+    }
+    try {
+      const response = await fetch(`/api/project/${encodeURIComponent(config.projectId)}/validate`, {
+        method: 'POST'
+      });
+      if (!response.ok) {
+        return;
+      }
+      const result = await response.json();
+      Object.entries(result.flows || {}).forEach(([flowId, summary]) => {
+        const flow = project.querySelector(`.project-flow[data-flow-id="${CSS.escape(flowId)}"]`);
+        const badge = flow && flow.querySelector('[data-flow-badge]');
+        if (badge) {
+          setFlowBadge(badge, summary);
+        }
+        const metrics = flow && flow.querySelector('[data-flow-metrics]');
+        if (metrics) {
+          setFlowMetrics(metrics, summary && summary.metrics);
+        }
+      });
+    } catch (error) {
+      // The badges are rendered again from the cache on the next page load.
+    }
+  }
+
+  function createMorePathsButton(list) {
+    // Pages through the stored flow, which matches the editor while there are no unsaved changes.
+    const button = document.createElement('button');
+    button.type = 'button';
+    button.className = 'btn secondary';
+    button.textContent = 'Cargar más caminos';
+    button.addEventListener('click', async () => {
+      button.disabled = true;
+      try {
+        const flowUrl = `/api/flow/${encodeURIComponent(config.projectId)}/${encodeURIComponent(config.flowId)}`;
+        const response = await fetch(`${flowUrl}/paths?offset=${list.children.length}&limit=200`);
+        if (!response.ok) {
+          throw new Error('No se pudieron cargar más caminos');
+        }
+        const text = await response.text();
+        text
+          .split('\n')
+          .filter((line) => line.trim())
+          .forEach((line) => {
+            const li = document.createElement('li');
+            li.textContent = JSON.parse(line).path.join(' → ');
+            list.appendChild(li);
+          });
+        if (response.headers.get('X-Next-Offset')) {
+          button.disabled = false;
+        } else {
+          button.remove();
+        }
+      } catch (error) {
+        button.disabled = false;
+        showToast(error.message, 'error');
+      }
+    });
+    return button;
+  }
+
+  function indexValidationItems(payload) {
+    const index = (items) => new Map(items.map((item) => [item.id, stableStringify(item)]));
+    return { nodes: index(payload.nodes), edges: index(payload.edges) };
+  }
+
+  function diffValidationItems(kind, base, current, items, edits) {
+    base.forEach((_, id) => {
+      if (!current.has(id)) {
+        edits.push({ op: `remove_${kind}`, id });
+      }
+    });
+    items.forEach((item) => {
+      if (!base.has(item.id)) {
+        edits.push({ op: `add_${kind}`, [kind]: item });
+      } else if (base.get(item.id) !== current.get(item.id)) {
+        edits.push({ op: `update_${kind}`, id: item.id, [kind]: item });
+      }
+    });
+  }
+
+  function showLiveValidation(result) {
+    if (!statusBar) {
+      return;
+    }
+    const errors = (result && result.errors) || [];
+    const warnings = (result && result.warnings) || [];
+    if (!result) {
+      delete statusBar.dataset.validation;
+      statusBar.removeAttribute('title');
+      return;
+    }
+    statusBar.dataset.validation = errors.length
+      ? `✖ ${errors.length} errores · ${warnings.length} advertencias`
+      : `✔ Sin errores · ${warnings.length} advertencias`;
+    statusBar.title = [...errors, ...warnings].join('\n');
+  }
+
+  function scheduleLiveValidation() {
+    if (!isEditingEnabled()) {
+      return;
+    }
+    window.clearTimeout(liveValidation.timer);
+    liveValidation.timer = window.setTimeout(runLiveValidation, LIVE_VALIDATION_DELAY);
+  }
+
+  async function runLiveValidation() {
+    if (liveValidation.running) {
+      liveValidation.queued = true;
+      return;
+    }
+    liveValidation.running = true;
+    const payload = buildPayload();
+    const items = indexValidationItems(payload);
+    try {
+      let response = null;
+      if (liveValidation.session) {
+        const edits = [];
+        diffValidationItems('node', liveValidation.items.nodes, items.nodes, payload.nodes, edits);
+        diffValidationItems('edge', liveValidation.items.edges, items.edges, payload.edges, edits);
+        response = await fetch(`/api/validation-sessions/${encodeURIComponent(liveValidation.session)}/edits`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ edits })
+        });
+        if (!response.ok) {
+          // Expired or out of sync: start again from the whole flow.
+          response = null;
+        }
+      }
+      if (!response) {
+        response = await fetch('/api/validation-sessions', {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ flow_data: payload, project_id: config.projectId })
+        });
+      }
+      if (!response.ok) {
+        throw new Error('No se pudo validar el flujo');
+      }
+      const result = await response.json();
+      liveValidation.session = result.session;
+      liveValidation.items = items;
+      if (isEditingEnabled()) {
+        showLiveValidation(result);
+      } else {
+        closeLiveValidation();
+      }
+    } catch (error) {
+      liveValidation.session = null;
+      showLiveValidation(null);
+    } finally {
+      liveValidation.running = false;
+      if (liveValidation.queued) {
+        liveValidation.queued = false;
+        scheduleLiveValidation();
+      }
+    }
+  }
+
+  function closeLiveValidation() {
+    window.clearTimeout(liveValidation.timer);
+    if (liveValidation.session) {
+      fetch(`/api/validation-sessions/${encodeURIComponent(liveValidation.session)}`, {
+        method: 'DELETE',
+        keepalive: true
+      }).catch(() => {});
+    }
+    liveValidation.session = null;
+    liveValidation.items = null;
+    showLiveValidation(null);
+  }
+
   async function validateFlow() {
     if (!isEditingEnabled()) {
       return;
@@ -2530,7 +2923,7 @@
       const response = await fetch('/api/flow/validate', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ flow_data: payload })
+        body: JSON.stringify({ flow_data: payload, project_id: config.projectId })
       });
       if (!response.ok) {
         throw new Error('No se pudo validar el flujo');
@@ -2571,8 +2964,15 @@
 
       if (result.paths && result.paths.length) {
         const pathsTitle = document.createElement('h4');
-        pathsTitle.textContent = 'Caminos posibles';
+        const pathCount = Number(result.path_count || result.paths.length);
+        pathsTitle.textContent = `Caminos posibles (${pathCount.toLocaleString('es-ES')})`;
         container.appendChild(pathsTitle);
+        if (result.truncated) {
+          const note = document.createElement('p');
+          note.className = 'paths-note';
+          note.textContent = `Se muestran los primeros ${result.paths.length} caminos.`;
+          container.appendChild(note);
+        }
         const list = document.createElement('ol');
         list.className = 'paths-list';
         result.paths.forEach((path) => {
@@ -2581,6 +2981,9 @@
           list.appendChild(li);
         });
         container.appendChild(list);
+        if (result.truncated && !state.isDirty) {
+          container.appendChild(createMorePathsButton(list));
+        }
       }
 
       openModal('Resultado de la validación', container);
@@ -3005,6 +3408,7 @@
   }
   notifyDirtyChange();
 
+  window.addEventListener('pagehide', closeLiveValidation);
   window.addEventListener('beforeunload', (event) => {
     if (state.isDirty) {
       event.preventDefault();
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The application modules are imported as top-level packages (``utils``), as app.py does.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
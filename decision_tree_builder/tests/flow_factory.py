@@ -0,0 +1,68 @@
+"""Random flows shared by the graph and validation tests."""
+
+import random
+from typing import Dict, List, Optional
+
+ANSWERS = ["Sí", "No", "Quizás"]
+
+
+def random_flow(seed: int, size: int = 8, edge_factor: float = 1.5, acyclic: bool = False) -> Dict:
+    """Return a small flow with a Start node, questions, messages and random edges.
+
+    With ``acyclic`` every edge goes from an earlier node to a later one;
+    otherwise back edges, self loops, unknown endpoints and unlabelled edges
+    show up too.
+    """
+    rng = random.Random(seed)
+    nodes: List[Dict] = [{"id": "start", "type": "start"}]
+    for index in range(size):
+        node_type = rng.choice(["question", "question", "message"])
+        node = {"id": f"n{index}", "type": node_type}
+        if node_type == "question" and rng.random() < 0.7:
+            node["expected_answers"] = rng.sample(ANSWERS, 2)
+        nodes.append(node)
+    ids = [node["id"] for node in nodes]
+    edges: List[Dict] = []
+    for index in range(int(size * edge_factor)):
+        if acyclic:
+            first, second = sorted(rng.sample(range(len(ids)), 2))
+            source, target = ids[first], ids[second]
+        else:
+            source = rng.choice(ids)
+            target = rng.choice(ids + ["ghost"] if rng.random() < 0.1 else ids)
+        edge = {"id": f"e{index}", "source": source, "target": target}
+        if rng.random() < 0.9:
+            edge["label"] = rng.choice(ANSWERS)
+        edges.append(edge)
+    return {"id": f"random-{seed}", "name": "random", "nodes": nodes, "edges": edges}
+
+
+def brute_force_paths(flow: Dict, sources: Optional[List[str]] = None) -> List[List[str]]:
+    """Enumerate every simple path to a terminal by plain recursion, for reference.
+
+    Paths start at ``sources`` (the roots by default) and follow the edges in
+    file order, skipping repeated source → target pairs.
+    """
+    successors: Dict[str, List[str]] = {node["id"]: [] for node in flow["nodes"]}
+    for edge in flow["edges"]:
+        successors.setdefault(edge["source"], [])
+        successors.setdefault(edge["target"], [])
+        if edge["target"] not in successors[edge["source"]]:
+            successors[edge["source"]].append(edge["target"])
+    if sources is None:
+        targets = {target for children in successors.values() for target in children}
+        sources = [node_id for node_id in successors if node_id not in targets]
+
+    found: List[List[str]] = []
+
+    def walk(path: List[str]) -> None:
+        children = successors[path[-1]]
+        if not children:
+            found.append(list(path))
+        for child in children:
+            if child not in path:
+                walk(path + [child])
+
+    for source in sources:
+        walk([source])
+    return found
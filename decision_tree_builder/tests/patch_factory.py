@@ -0,0 +1,65 @@
+"""Patches built the way the editor builds them, for the tests that apply them."""
+
+from typing import Dict, List
+
+from utils.fingerprint import canonical_json
+
+
+def _escape(token: str) -> str:
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+def _diff_collection(path: str, base_items: List, current_items: List, operations: List[Dict]) -> None:
+    """Diff two node/edge lists by ``id``, falling back to a whole-list replace.
+
+    The per-item form is only used when both lists carry unique ids and the
+    result keeps ``current_items`` order (surviving items first, new ones
+    appended), which is how the editor reorders collections.
+    """
+    base_ids = [item.get("id") if isinstance(item, dict) else None for item in base_items]
+    current_ids = [item.get("id") if isinstance(item, dict) else None for item in current_items]
+    unique = (
+        None not in base_ids
+        and None not in current_ids
+        and len(set(base_ids)) == len(base_ids)
+        and len(set(current_ids)) == len(current_ids)
+    )
+    known = set(base_ids)
+    current_by_id = dict(zip(current_ids, current_items)) if unique else {}
+    kept = [item_id for item_id in base_ids if item_id in current_by_id]
+    added = [item_id for item_id in current_ids if item_id not in known]
+    if not unique or kept + added != current_ids:
+        operations.append({"op": "replace", "path": path, "value": current_items})
+        return
+
+    removals = []
+    for index, (item_id, item) in enumerate(zip(base_ids, base_items)):
+        current = current_by_id.get(item_id)
+        if current is None:
+            removals.append(index)
+        elif canonical_json(item) != canonical_json(current):
+            operations.append({"op": "replace", "path": f"{path}/{index}", "value": current})
+    for index in reversed(removals):
+        operations.append({"op": "remove", "path": f"{path}/{index}"})
+    for item_id in added:
+        operations.append({"op": "add", "path": f"{path}/-", "value": current_by_id[item_id]})
+
+
+def make_patch(base: Dict, current: Dict) -> List[Dict]:
+    """Return the operations turning flow ``base`` into ``current``.
+
+    Nodes and edges are diffed item by item (as the editor does); every other
+    top-level key is added, removed or replaced as a whole.
+    """
+    operations: List[Dict] = []
+    for key in list(base) + [key for key in current if key not in base]:
+        path = f"/{_escape(key)}"
+        if key not in current:
+            operations.append({"op": "remove", "path": path})
+        elif key not in base:
+            operations.append({"op": "add", "path": path, "value": current[key]})
+        elif key in {"nodes", "edges"} and isinstance(base[key], list) and isinstance(current[key], list):
+            _diff_collection(path, base[key], current[key], operations)
+        elif canonical_json(base[key]) != canonical_json(current[key]):
+            operations.append({"op": "replace", "path": path, "value": current[key]})
+    return operations
@@ -0,0 +1,23 @@
+"""Bulk YAML conversion in a worker pool."""
+
+from flow_factory import random_flow
+from utils.bulk_import import convert_sources
+from utils.yaml_export import flow_to_yaml
+
+
+def test_pool_and_serial_conversion_agree():
+    sources = [
+        (f"flow-{seed}.yaml", flow_to_yaml(random_flow(seed, acyclic=True))[0].encode("utf-8")) for seed in range(4)
+    ]
+    sources.append(("broken.yaml", b"name: x\n"))
+
+    serial = convert_sources(sources, max_workers=1)
+    pooled = convert_sources(sources, max_workers=2)
+
+    # Imported edges get fresh random ids, so compare everything else.
+    def without_flow(reports):
+        return [{key: value for key, value in report.items() if key != "flow"} for report in reports]
+
+    assert without_flow(pooled) == without_flow(serial)
+    assert [report["flow"]["nodes"] for report in pooled[:4]] == [report["flow"]["nodes"] for report in serial[:4]]
+    assert [report["success"] for report in pooled] == [True, True, True, True, False]
@@ -0,0 +1,83 @@
+"""The CSR FlowGraph against the networkx graph it replaced."""
+
+import pytest
+
+from flow_factory import random_flow
+from utils.paths import FlowGraph, build_graph, roots, terminals
+
+nx = pytest.importorskip("networkx")
+
+SEEDS = range(40)
+
+
+def flows(seed):
+    return random_flow(seed, size=12, edge_factor=1.0 + (seed % 5) * 0.5, acyclic=seed % 3 == 0)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_structure_matches_networkx(seed):
+    flow = flows(seed)
+    graph = FlowGraph.from_flow(flow)
+    reference = build_graph(flow)
+
+    assert graph.nodes == list(reference.nodes)
+    assert graph.roots() == roots(reference)
+    assert graph.terminals() == terminals(reference)
+    for node_id in graph.nodes:
+        assert graph.successors(node_id) == list(reference.successors(node_id))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_find_cycle_matches_networkx(seed):
+    flow = flows(seed)
+    reference = build_graph(flow)
+    try:
+        edges = nx.find_cycle(reference)
+        expected = [source for source, _ in edges] + [edges[-1][1]]
+    except nx.NetworkXNoCycle:
+        expected = None
+    assert FlowGraph.from_flow(flow).find_cycle() == expected
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_reachability_matches_networkx(seed):
+    flow = flows(seed)
+    graph = FlowGraph.from_flow(flow)
+    reference = build_graph(flow)
+    for reverse in (False, True):
+        marks = graph.reachable(["start"], reverse=reverse)
+        related = nx.ancestors(reference, "start") if reverse else nx.descendants(reference, "start")
+        assert {node_id for node_id, mark in zip(graph.nodes, marks) if mark} == related | {"start"}
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_order_based_queries_match_networkx(seed):
+    flow = flows(seed)
+    graph = FlowGraph.from_flow(flow)
+    reference = build_graph(flow)
+    if not nx.is_directed_acyclic_graph(reference):
+        assert graph.topological_order() is None
+        assert graph.longest_path() is None
+        with pytest.raises(ValueError):
+            graph.closure()
+        return
+
+    order = graph.topological_order()
+    position = {node_id: index for index, node_id in enumerate(order)}
+    assert sorted(order) == sorted(reference.nodes)
+    assert all(position[source] < position[target] for source, target in reference.edges)
+    assert len(graph.longest_path()) - 1 == nx.dag_longest_path_length(reference)
+
+    descendants, ancestors = graph.closure()
+    for index, node_id in enumerate(graph.nodes):
+        assert {graph.nodes[bit] for bit in range(len(graph)) if descendants[index] >> bit & 1} == nx.descendants(reference, node_id)
+        assert {graph.nodes[bit] for bit in range(len(graph)) if ancestors[index] >> bit & 1} == nx.ancestors(reference, node_id)
+
+
+def test_parallel_edges_collapse():
+    graph = FlowGraph.from_flow(
+        {"nodes": [{"id": "a"}, {"id": "b"}], "edges": [{"source": "a", "target": "b"}, {"source": "a", "target": "b"}]}
+    )
+    assert graph.successors("a") == ["b"]
+    assert graph.out_degrees() == [1, 0]
+    assert graph.path_counts() == {"b": 1}
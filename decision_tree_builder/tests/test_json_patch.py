@@ -0,0 +1,105 @@
+"""RFC 6902 patches used by delta saves."""
+
+import copy
+
+import pytest
+
+from flow_factory import random_flow
+from patch_factory import make_patch
+from utils.json_patch import JsonPatchError, apply_patch
+
+
+def round_trip(base, current):
+    patch = make_patch(base, current)
+    assert apply_patch(copy.deepcopy(base), copy.deepcopy(patch)) == current
+
+
+def test_editor_node_edits_apply_in_order():
+    # Replacements first, removals from the highest index, then appends: the editor's order.
+    flow = random_flow(2)
+    expected = copy.deepcopy(flow)
+    expected["nodes"][1] = dict(expected["nodes"][1], text="¿Es cliente?")
+    del expected["nodes"][5]
+    del expected["nodes"][3]
+    expected["nodes"].append({"id": "nuevo", "type": "message"})
+
+    apply_patch(
+        flow,
+        [
+            {"op": "replace", "path": "/nodes/1", "value": expected["nodes"][1]},
+            {"op": "remove", "path": "/nodes/5"},
+            {"op": "remove", "path": "/nodes/3"},
+            {"op": "add", "path": "/nodes/-", "value": {"id": "nuevo", "type": "message"}},
+        ],
+    )
+    assert flow == expected
+
+
+def test_whole_lists_and_escaped_keys():
+    document = {"id": "f", "name": "old", "description": "x", "nodes": [{"id": "a"}], "edges": []}
+    apply_patch(
+        document,
+        [
+            {"op": "replace", "path": "/nodes", "value": [{"id": "b"}, {"id": "a"}]},
+            {"op": "replace", "path": "/name", "value": "new"},
+            {"op": "remove", "path": "/description"},
+            {"op": "add", "path": "/meta~1data", "value": {"a~b": 1}},
+            {"op": "replace", "path": "/meta~1data/a~0b", "value": 2},
+        ],
+    )
+    assert document == {"id": "f", "name": "new", "nodes": [{"id": "b"}, {"id": "a"}], "edges": [], "meta/data": {"a~b": 2}}
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_random_edits_round_trip(seed):
+    base = random_flow(seed)
+    current = random_flow(seed + 1000)
+    current["nodes"] = [node for node in current["nodes"] if node["id"] != "n2"]
+    round_trip(base, current)
+    round_trip(current, base)
+    edited = copy.deepcopy(base)
+    edited["edges"].reverse()
+    round_trip(base, edited)
+
+
+def test_move_copy_and_test_operations():
+    document = {"a": {"b": [1, 2, 3]}, "c": "x"}
+    apply_patch(
+        document,
+        [
+            {"op": "test", "path": "/a/b/1", "value": 2},
+            {"op": "copy", "from": "/a/b", "path": "/d"},
+            {"op": "move", "from": "/c", "path": "/a/c"},
+            {"op": "add", "path": "/d/0", "value": 0},
+            {"op": "replace", "path": "/a/b/2", "value": 4},
+        ],
+    )
+    assert document == {"a": {"b": [1, 2, 4], "c": "x"}, "d": [0, 1, 2, 3]}
+
+
+@pytest.mark.parametrize(
+    "operation",
+    [
+        {"op": "remove", "path": "/missing"},
+        {"op": "replace", "path": "/nodes/5", "value": {}},
+        {"op": "add", "path": "/nodes/01", "value": {}},
+        {"op": "add", "path": "nodes", "value": {}},
+        {"op": "add", "path": "", "value": {}},
+        {"op": "add", "path": "/nodes/-"},
+        {"op": "add", "path": "/name/x", "value": 1},
+        {"op": "test", "path": "/name", "value": "otro"},
+        {"op": "move", "from": "/nodes", "path": "/nodes/0"},
+        {"op": "copy", "from": "/missing", "path": "/x"},
+        {"op": "frobnicate", "path": "/name"},
+        "not-an-operation",
+    ],
+)
+def test_invalid_operations_are_rejected(operation):
+    document = {"name": "flujo", "nodes": [{"id": "a"}]}
+    with pytest.raises(JsonPatchError):
+        apply_patch(document, [operation])
+
+
+def test_patch_must_be_a_list():
+    with pytest.raises(JsonPatchError):
+        apply_patch({}, {"op": "add", "path": "/a", "value": 1})
@@ -0,0 +1,86 @@
+"""Mandatory questions from dominator trees, checked against path intersection."""
+
+import pytest
+
+from flow_factory import brute_force_paths, random_flow
+from utils.mandatory_questions import mandatory_questions
+from utils.paths import FlowGraph
+
+
+def common_questions(flow, paths):
+    """Return the questions on every one of ``paths``, in the order they are asked."""
+    questions = {node["id"] for node in flow["nodes"] if node["type"] == "question"}
+    if not paths:
+        return []
+    shared = set(paths[0]).intersection(*paths[1:])
+    return [node_id for node_id in paths[0] if node_id in shared and node_id in questions]
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_mandatory_questions_match_path_intersection(seed):
+    flow = random_flow(seed, size=10, edge_factor=1.2 + (seed % 4) * 0.4, acyclic=True)
+    result = mandatory_questions(flow, cache=None)
+
+    assert result["start"] == "start"
+    assert result["mandatory"] == common_questions(flow, brute_force_paths(flow, ["start"]))
+
+    every = brute_force_paths(flow)
+    for terminal in FlowGraph.from_flow(flow).terminals():
+        # Dominators are proper: the terminal itself is not one of its own questions.
+        reaching = [path[:-1] for path in every if path[-1] == terminal]
+        assert result["outcomes"][terminal] == common_questions(flow, reaching), terminal
+
+
+def test_diamond_keeps_the_shared_questions():
+    flow = {
+        "nodes": [
+            {"id": "start", "type": "start"},
+            {"id": "q1", "type": "question"},
+            {"id": "q2", "type": "question"},
+            {"id": "q3", "type": "question"},
+            {"id": "m", "type": "message"},
+            {"id": "q4", "type": "question"},
+            {"id": "end", "type": "message"},
+        ],
+        "edges": [
+            {"source": "start", "target": "q1"},
+            {"source": "q1", "target": "q2"},
+            {"source": "q1", "target": "q3"},
+            {"source": "q2", "target": "m"},
+            {"source": "q3", "target": "m"},
+            {"source": "m", "target": "q4"},
+            {"source": "q4", "target": "end"},
+        ],
+    }
+    result = mandatory_questions(flow, cache=None)
+    assert result["mandatory"] == ["q1", "q4"]
+    assert result["outcomes"] == {"end": ["q1", "q4"]}
+    assert result["dominators"]["m"] == "q1"
+    assert result["post_dominators"]["q1"] == "m"
+
+
+def test_cycles_are_allowed():
+    flow = {
+        "nodes": [
+            {"id": "start", "type": "start"},
+            {"id": "q1", "type": "question"},
+            {"id": "q2", "type": "question"},
+            {"id": "end", "type": "message"},
+        ],
+        "edges": [
+            {"source": "start", "target": "q1"},
+            {"source": "q1", "target": "q2"},
+            {"source": "q2", "target": "q1"},
+            {"source": "q2", "target": "end"},
+        ],
+    }
+    result = mandatory_questions(flow, cache=None)
+    assert result["mandatory"] == ["q1", "q2"]
+    assert result["outcomes"] == {"end": ["q1", "q2"]}
+
+
+def test_flow_without_start():
+    result = mandatory_questions({"nodes": [{"id": "q", "type": "question"}], "edges": []}, cache=None)
+    assert result["start"] is None
+    assert result["mandatory"] == []
+    assert result["outcomes"] == {"q": []}
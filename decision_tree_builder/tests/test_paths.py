@@ -0,0 +1,86 @@
+"""Path counting and paginated path selection on the CSR flow graph."""
+
+import pytest
+
+from flow_factory import brute_force_paths, random_flow
+from utils.paths import FlowGraph, enumerate_paths
+
+SEEDS = range(30)
+
+
+def acyclic_flow(seed):
+    return random_flow(seed, size=10, edge_factor=2.0, acyclic=True)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_iter_paths_matches_brute_force(seed):
+    flow = acyclic_flow(seed)
+    assert list(FlowGraph.from_flow(flow).iter_paths()) == brute_force_paths(flow)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_path_counts_match_enumeration(seed):
+    flow = acyclic_flow(seed)
+    graph = FlowGraph.from_flow(flow)
+    expected = {terminal: 0 for terminal in graph.terminals()}
+    for path in brute_force_paths(flow):
+        expected[path[-1]] += 1
+    assert graph.path_counts() == expected
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_select_paths_filters_and_pages_like_enumeration(seed):
+    flow = acyclic_flow(seed)
+    graph = FlowGraph.from_flow(flow)
+    every = brute_force_paths(flow)
+    filters = [(None, None), (None, "ghost")]
+    filters += [(terminal, None) for terminal in graph.terminals()]
+    filters += [(None, node_id) for node_id in graph.nodes]
+    filters += [(graph.terminals()[0], node_id) for node_id in graph.nodes[::3]]
+
+    for terminal, through in filters:
+        expected = [
+            path
+            for path in every
+            if (terminal is None or path[-1] == terminal) and (through is None or through in path)
+        ]
+        for offset in sorted({0, 1, len(expected) // 2, max(len(expected) - 1, 0), len(expected), len(expected) + 3}):
+            total, selected = graph.select_paths(offset, terminal, through)
+            assert total == len(expected)
+            assert list(selected) == expected[offset:], (terminal, through, offset)
+
+
+def test_select_paths_is_lazy_on_a_huge_lattice():
+    # 2**60 paths: only the pages that are read get enumerated.
+    nodes = [{"id": "start", "type": "start"}] + [{"id": f"n{i}", "type": "question"} for i in range(60)]
+    edges = []
+    previous = "start"
+    for index in range(60):
+        edges.append({"id": f"a{index}", "source": previous, "target": f"n{index}"})
+        edges.append({"id": f"b{index}", "source": previous, "target": f"m{index}"})
+        edges.append({"id": f"c{index}", "source": f"m{index}", "target": f"n{index}"})
+        previous = f"n{index}"
+    graph = FlowGraph.from_flow({"nodes": nodes, "edges": edges})
+
+    total, selected = graph.select_paths(offset=2**60 - 1)
+    assert total == 2**60
+    last = next(selected)
+    assert last[1] == "m0" and last[-1] == "n59"
+    assert next(selected, None) is None
+
+
+def test_select_paths_rejects_cycles():
+    graph = FlowGraph.from_flow(
+        {"nodes": [{"id": "a"}, {"id": "b"}], "edges": [{"source": "a", "target": "b"}, {"source": "b", "target": "a"}]}
+    )
+    assert graph.path_counts() is None
+    with pytest.raises(ValueError):
+        graph.select_paths()
+
+
+def test_isolated_nodes_are_single_node_paths():
+    flow = {"nodes": [{"id": "a"}, {"id": "b"}], "edges": [{"source": "b", "target": "c"}]}
+    assert enumerate_paths(flow) == [["a"], ["b", "c"]]
+    assert enumerate_paths(flow, limit=1) == [["a"]]
+    total, selected = FlowGraph.from_flow(flow).select_paths(terminal="a")
+    assert (total, list(selected)) == (1, [["a"]])
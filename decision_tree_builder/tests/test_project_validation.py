@@ -0,0 +1,50 @@
+"""Cached validation summaries of a project."""
+
+import json
+
+from flow_factory import random_flow
+from utils.catalog import FileCatalog
+from utils.fingerprint import content_hash
+from utils.project_validation import VALIDATION_FILENAME, ProjectValidation, validate_flows
+
+FLOW = {
+    "id": "alta",
+    "nodes": [{"id": "start", "type": "message", "message": "hola"}],
+    "edges": [],
+}
+
+
+def make_validation(tmp_path, catalog):
+    project_dir = tmp_path / "demo"
+    project_dir.mkdir(exist_ok=True)
+    return ProjectValidation(project_dir, tmp_path / "validation.lock", catalog=catalog)
+
+
+def test_summaries_are_read_from_the_catalogue_until_the_file_changes(tmp_path, monkeypatch):
+    catalog = FileCatalog()
+    entries = [{"id": "alta", "hash": content_hash(FLOW), "revision": 1}]
+    make_validation(tmp_path, catalog).refresh(entries, lambda entry: FLOW, max_workers=1)
+
+    reads = []
+    original = ProjectValidation._read_summaries
+
+    def counting_read(path):
+        reads.append(path)
+        return original(path)
+
+    monkeypatch.setattr(ProjectValidation, "_read_summaries", staticmethod(counting_read))
+
+    summaries = make_validation(tmp_path, catalog).read()
+    assert summaries["alta"]["hash"] == content_hash(FLOW)
+    assert reads == []
+
+    # Written by another worker process: the new file is picked up.
+    path = tmp_path / "demo" / VALIDATION_FILENAME
+    path.write_text(json.dumps({}), encoding="utf-8")
+    assert make_validation(tmp_path, catalog).read() == {}
+    assert reads == [path]
+
+
+def test_pool_and_serial_validation_agree():
+    flows = {f"flow-{seed}": random_flow(seed, acyclic=seed % 2 == 0) for seed in range(5)}
+    assert validate_flows(flows, max_workers=2) == validate_flows(flows, max_workers=1)
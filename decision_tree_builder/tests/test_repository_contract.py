@@ -0,0 +1,284 @@
+"""Behaviour every storage backend must share."""
+
+import json
+
+import pytest
+
+from patch_factory import make_patch
+from utils.repository import copy_repository, create_repository
+from utils.trash import TrashError
+
+BACKENDS = ["filesystem", "sqlite"]
+
+
+def make_flow(flow_id, *node_ids):
+    nodes = [{"id": node_id, "type": "message", "message": node_id} for node_id in node_ids]
+    edges = [{"source": source, "target": target} for source, target in zip(node_ids, node_ids[1:])]
+    return {"id": flow_id, "name": flow_id, "description": "", "nodes": nodes, "edges": edges}
+
+
+def open_repository(backend, data_dir):
+    repository = create_repository(backend, data_dir, data_dir / "flows.sqlite3")
+    repository.ensure_storage()
+    return repository
+
+
+@pytest.fixture(params=BACKENDS)
+def repository(request, tmp_path):
+    repository = open_repository(request.param, tmp_path / "data")
+    repository.save_project_metadata("demo", {"id": "demo", "name": "Demo"})
+    repository.save_projects([{"id": "demo", "name": "Demo"}])
+    yield repository
+    repository.compactor.shutdown()
+
+
+def revision_kinds(repository, flow_id):
+    return [(info["revision"], info["kind"]) for info in repository.flow_revisions("demo", flow_id)]
+
+
+def test_save_and_load(repository):
+    flow = make_flow("alta", "start", "end")
+    entry = repository.save_flow("demo", "alta", flow)
+
+    assert repository.load_flow("demo", "alta") == flow
+    assert entry["revision"] == 1
+    assert entry["node_count"] == 2 and entry["edge_count"] == 1
+    assert repository.flow_entry("demo", "alta") == entry
+    assert repository.flow_index("demo") == {"alta.json": entry}
+    assert repository.load_flow("demo", "missing") is None
+
+
+def test_revisions_increase_on_every_save(repository):
+    repository.save_flow("demo", "alta", make_flow("alta", "start"))
+    entry = repository.save_flow("demo", "alta", make_flow("alta", "start", "end"))
+
+    assert entry["revision"] == 2
+    assert repository.flow_entry("demo", "alta")["revision"] == 2
+
+
+def test_save_flows_stores_a_batch(repository):
+    flows = {"a": make_flow("a", "start"), "b": make_flow("b", "start", "end")}
+    entries = repository.save_flows("demo", flows)
+
+    assert sorted(entries) == ["a", "b"]
+    assert {entry["revision"] for entry in entries.values()} == {1}
+    for flow_id, flow in flows.items():
+        assert repository.load_flow("demo", flow_id) == flow
+
+
+def test_saving_the_stored_revision_again_is_a_no_op(repository):
+    flow = make_flow("alta", "start", "end")
+    entry = repository.save_flow("demo", "alta", flow)
+    revisions = repository.flow_revisions("demo", "alta")
+
+    again = repository.save_flow("demo", "alta", flow, entry["hash"], revision=entry["revision"])
+
+    assert again == entry
+    assert repository.flow_revisions("demo", "alta") == revisions
+
+
+def test_rebuilding_the_index_keeps_unchanged_flows(repository):
+    repository.save_flow("demo", "alta", make_flow("alta", "start"))
+    entry = repository.save_flow("demo", "alta", make_flow("alta", "start", "end"))
+    revisions = repository.flow_revisions("demo", "alta")
+
+    index = repository.rebuild_flow_index("demo")
+
+    assert index["alta.json"]["revision"] == entry["revision"]
+    assert index["alta.json"]["hash"] == entry["hash"]
+    assert repository.flow_revisions("demo", "alta") == revisions
+
+
+def test_rename_moves_flow_and_history(repository):
+    repository.save_flow("demo", "alta", make_flow("alta", "start"))
+    repository.save_flow("demo", "alta", make_flow("alta", "start", "end"))
+
+    repository.rename_flow("demo", "alta", "baja")
+
+    assert repository.load_flow("demo", "alta") is None
+    assert repository.flow_entry("demo", "alta") is None
+    assert repository.load_flow("demo", "baja") == make_flow("alta", "start", "end")
+    assert repository.flow_entry("demo", "baja")["filename"] == "baja.json"
+    assert list(repository.flow_index("demo")) == ["baja.json"]
+    assert revision_kinds(repository, "baja") == [(1, "snapshot"), (2, "snapshot")]
+    assert repository.flow_revisions("demo", "alta") == []
+
+
+def test_rename_of_missing_flow_does_nothing(repository):
+    repository.rename_flow("demo", "missing", "other")
+
+    assert repository.flow_index("demo") == {}
+
+
+def test_duplicate_copies_flows_and_history(repository):
+    flow = make_flow("alta", "start", "end")
+    repository.save_flow("demo", "alta", make_flow("alta", "start"))
+    repository.save_flow("demo", "alta", flow)
+
+    flows = repository.duplicate_project("demo", "copia")
+
+    assert list(flows) == ["alta.json"]
+    assert repository.load_flow("copia", "alta") == flow
+    assert repository.flow_revisions("copia", "alta") == repository.flow_revisions("demo", "alta")
+
+    # Both projects evolve independently afterwards.
+    repository.save_flow("copia", "alta", make_flow("alta", "other"))
+    assert repository.load_flow("demo", "alta") == flow
+    assert repository.flow_entry("demo", "alta")["revision"] == 2
+    assert repository.flow_entry("copia", "alta")["revision"] == 3
+
+
+def test_deleted_flow_is_restored_with_its_history(repository):
+    flow = make_flow("alta", "start", "end")
+    repository.save_flow("demo", "alta", make_flow("alta", "start"))
+    entry = repository.save_flow("demo", "alta", flow)
+    revisions = repository.flow_revisions("demo", "alta")
+
+    entry_id = repository.delete_flow("demo", "alta")
+
+    assert repository.load_flow("demo", "alta") is None
+    assert repository.flow_index("demo") == {}
+    listed = repository.trash_entries()
+    assert [(item["id"], item["kind"], item["flow_id"]) for item in listed] == [(entry_id, "flow", "alta")]
+
+    info = repository.restore_trash_entry(entry_id)
+
+    assert info["flow_id"] == "alta"
+    assert repository.load_flow("demo", "alta") == flow
+    assert repository.flow_entry("demo", "alta")["revision"] == entry["revision"]
+    assert repository.flow_revisions("demo", "alta") == revisions
+    assert repository.trash_entries() == []
+
+
+def test_restoring_a_flow_over_an_existing_one_fails(repository):
+    repository.save_flow("demo", "alta", make_flow("alta", "start"))
+    entry_id = repository.delete_flow("demo", "alta")
+    repository.save_flow("demo", "alta", make_flow("alta", "other"))
+
+    with pytest.raises(TrashError):
+        repository.restore_trash_entry(entry_id)
+
+    assert repository.load_flow("demo", "alta") == make_flow("alta", "other")
+
+
+def test_deleted_project_is_restored(repository):
+    flow = make_flow("alta", "start", "end")
+    repository.save_flow("demo", "alta", flow)
+
+    entry_id = repository.delete_project("demo")
+
+    assert repository.load_project_metadata("demo") is None
+    assert repository.load_flow("demo", "alta") is None
+
+    repository.restore_trash_entry(entry_id)
+
+    assert repository.load_project_metadata("demo") == {"id": "demo", "name": "Demo"}
+    assert repository.load_flow("demo", "alta") == flow
+    assert [info["revision"] for info in repository.flow_revisions("demo", "alta")] == [1]
+
+
+def test_patch_saves_are_recorded_as_deltas(repository):
+    first = make_flow("alta", "start")
+    second = make_flow("alta", "start", "end")
+    third = make_flow("alta", "start", "middle", "end")
+    repository.save_flow("demo", "alta", first)
+    repository.save_flow("demo", "alta", second, patch=make_patch(first, second))
+    repository.save_flow("demo", "alta", third, patch=make_patch(second, third))
+
+    assert revision_kinds(repository, "alta") == [(1, "snapshot"), (2, "delta"), (3, "delta")]
+    for revision, flow in enumerate([first, second, third], start=1):
+        assert repository.load_flow_revision("demo", "alta", revision) == flow
+    assert repository.load_flow_revision("demo", "alta", 4) is None
+
+
+def test_full_saves_are_recorded_as_snapshots(repository):
+    first = make_flow("alta", "start")
+    second = make_flow("alta", "start", "end")
+    repository.save_flow("demo", "alta", first)
+    repository.save_flow("demo", "alta", second)
+
+    assert revision_kinds(repository, "alta") == [(1, "snapshot"), (2, "snapshot")]
+    assert repository.load_flow_revision("demo", "alta", 1) == first
+    assert repository.load_flow_revision("demo", "alta", 2) == second
+
+
+def test_compaction_folds_the_journal_into_a_snapshot(repository):
+    first = make_flow("alta", "start")
+    second = make_flow("alta", "start", "end")
+    repository.save_flow("demo", "alta", first)
+    repository.save_flow("demo", "alta", second, patch=make_patch(first, second))
+
+    assert repository.compact_flow_history("demo", "alta") is True
+    assert repository.compact_flow_history("demo", "alta") is False
+    assert revision_kinds(repository, "alta") == [(1, "snapshot"), (2, "snapshot")]
+    assert repository.load_flow_revision("demo", "alta", 1) == first
+    assert repository.load_flow_revision("demo", "alta", 2) == second
+
+
+def test_saving_unchanged_content_keeps_the_revision(repository):
+    flow = make_flow("alta", "start", "end")
+    entry = repository.save_flow("demo", "alta", flow)
+
+    assert repository.save_flow("demo", "alta", json.loads(json.dumps(flow))) == entry
+    assert repository.save_flows("demo", {"alta": flow, "baja": make_flow("baja", "start")})["alta"] == entry
+    assert revision_kinds(repository, "alta") == [(1, "snapshot")]
+
+
+def test_compaction_keeps_only_the_newest_segments(repository):
+    repository.history_segments = 2
+    flows = [make_flow("alta", *[f"n{index}" for index in range(count)]) for count in range(1, 6)]
+    for flow in flows:
+        repository.save_flow("demo", "alta", flow)
+    # Waits for the pruning scheduled by the snapshot saves.
+    repository.compactor.shutdown()
+
+    assert revision_kinds(repository, "alta") == [(4, "snapshot"), (5, "snapshot")]
+    assert repository.load_flow_revision("demo", "alta", 3) is None
+    assert repository.load_flow_revision("demo", "alta", 4) == flows[3]
+
+    repository.save_flow("demo", "alta", make_flow("alta", "end"), patch=make_patch(flows[-1], make_flow("alta", "end")))
+    assert revision_kinds(repository, "alta") == [(4, "snapshot"), (5, "snapshot"), (6, "delta")]
+    assert repository.load_flow_revision("demo", "alta", 6) == make_flow("alta", "end")
+    assert repository.compact_flow_history("demo", "alta") is True
+    assert revision_kinds(repository, "alta") == [(5, "snapshot"), (6, "snapshot")]
+    assert repository.compact_flow_history("demo", "alta") is False
+
+
+@pytest.mark.parametrize("target_backend", BACKENDS)
+def test_migration_keeps_flows_and_revisions(repository, tmp_path, target_backend):
+    flow = make_flow("alta", "start", "end")
+    repository.save_flow("demo", "alta", make_flow("alta", "start"))
+    repository.save_flow("demo", "alta", flow)
+    repository.save_flow("demo", "baja", make_flow("baja", "start"))
+
+    target = open_repository(target_backend, tmp_path / "target")
+    try:
+        copied = copy_repository(repository, target)
+
+        assert copied == {"projects": 1, "flows": 2}
+        assert target.load_projects() == repository.load_projects()
+        assert target.load_project_metadata("demo") == repository.load_project_metadata("demo")
+        assert target.load_flow("demo", "alta") == flow
+        assert target.flow_entry("demo", "alta")["revision"] == 2
+        assert target.flow_entry("demo", "alta")["hash"] == repository.flow_entry("demo", "alta")["hash"]
+        assert target.load_flow_revision("demo", "alta", 2) == flow
+    finally:
+        target.compactor.shutdown()
+
+
+def test_filesystem_history_starts_with_the_revision_already_on_disk(tmp_path):
+    data_dir = tmp_path / "data"
+    flow_dir = data_dir / "demo" / "flows"
+    flow_dir.mkdir(parents=True)
+    original = make_flow("alta", "start")
+    (flow_dir / "alta.json").write_text(json.dumps(original), encoding="utf-8")
+    repository = open_repository("filesystem", data_dir)
+    try:
+        updated = make_flow("alta", "start", "end")
+        repository.save_flow("demo", "alta", updated, patch=make_patch(original, updated))
+
+        assert revision_kinds(repository, "alta") == [(1, "snapshot"), (2, "delta")]
+        assert repository.load_flow_revision("demo", "alta", 1) == original
+        assert repository.load_flow_revision("demo", "alta", 2) == updated
+    finally:
+        repository.compactor.shutdown()
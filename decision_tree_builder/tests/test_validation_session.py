@@ -0,0 +1,158 @@
+"""Incremental validation sessions, checked against a full validation after every edit."""
+
+import random
+import re
+
+import pytest
+
+from flow_factory import ANSWERS, random_flow
+from utils.validation_rules import DEFAULT_RULES, RuleSet
+from utils.validation_session import ValidationSession, ValidationSessionError, ValidationSessions
+from utils.validator import validate_flow
+
+PROJECT_RULES = RuleSet.from_config(
+    [
+        "answer-spelling",
+        {"rule": "message-severity", "allowed": ["info", "error"]},
+        {"rule": "required-metadata", "keys": ["owner"], "types": ["question"]},
+        "no-such-rule",
+    ]
+)
+RULE_SETS = {"default": DEFAULT_RULES, "project": PROJECT_RULES}
+CYCLE = re.compile(r"(Se detectó un ciclo en el flujo:).*")
+LABELS = ANSWERS + ["si", "NO", "Otra", ""]
+
+
+def normalised(messages):
+    # The session names the cycle found when it appeared, not necessarily the first one.
+    return [CYCLE.sub(r"\1 …", message) for message in messages]
+
+
+def assert_matches_full_validation(session, rules):
+    report = session.report()
+    expected = validate_flow(session.flow_data(), 0, cache=None, rules=rules)
+    assert normalised(report["errors"]) == normalised(expected["errors"])
+    assert report["warnings"] == expected["warnings"]
+    assert report["valid"] == expected["valid"]
+
+
+def random_node(rng, node_id):
+    node_type = "start" if rng.random() < 0.05 else rng.choice(["question", "question", "message"])
+    node = {"id": node_id, "type": node_type}
+    if node["type"] == "question" and rng.random() < 0.7:
+        node["expected_answers"] = rng.sample(ANSWERS, 2)
+    if node["type"] == "message" and rng.random() < 0.5:
+        node["severity"] = rng.choice(["info", "warning"])
+    if rng.random() < 0.5:
+        node["metadata"] = {"owner": rng.choice(["", "ana"])}
+    return node
+
+
+def random_edit(rng, flow, counter):
+    node_ids = [node["id"] for node in flow["nodes"]]
+    edge_ids = [edge["id"] for edge in flow["edges"]]
+    endpoints = node_ids + ["ghost", f"x{counter}"]
+    choice = rng.random()
+    if choice < 0.15 or not node_ids:
+        # Now and then an id that already exists, to exercise duplicates.
+        node_id = rng.choice(node_ids) if node_ids and rng.random() < 0.1 else f"x{counter}"
+        return {"op": "add_node", "node": random_node(rng, node_id)}
+    if choice < 0.3:
+        node_id = rng.choice(node_ids)
+        new_id = node_id if rng.random() < 0.8 else f"x{counter}"
+        return {"op": "update_node", "id": node_id, "node": random_node(rng, new_id)}
+    if choice < 0.4:
+        return {"op": "remove_node", "id": rng.choice(node_ids)}
+    edge = {"id": f"y{counter}", "source": rng.choice(endpoints), "target": rng.choice(endpoints)}
+    if rng.random() < 0.9:
+        edge["label"] = rng.choice(LABELS)
+    if choice < 0.65 or not edge_ids:
+        return {"op": "add_edge", "edge": edge}
+    if choice < 0.85:
+        edge_id = rng.choice(edge_ids)
+        return {"op": "update_edge", "id": edge_id, "edge": dict(edge, id=edge_id)}
+    return {"op": "remove_edge", "id": rng.choice(edge_ids)}
+
+
+@pytest.mark.parametrize("rules_name", sorted(RULE_SETS))
+@pytest.mark.parametrize("seed", range(25))
+def test_edit_sequences_match_full_validation(seed, rules_name):
+    rules = RULE_SETS[rules_name]
+    rng = random.Random(seed)
+    session = ValidationSession(random_flow(seed, size=6, acyclic=seed % 2 == 0), rules)
+    assert_matches_full_validation(session, rules)
+    for counter in range(40):
+        session.apply([random_edit(rng, session.flow_data(), counter)])
+        assert_matches_full_validation(session, rules)
+
+
+def test_valid_flow_stays_valid_through_edits():
+    flow = {
+        "nodes": [
+            {"id": "start", "type": "start"},
+            {"id": "q", "type": "question", "expected_answers": ["Sí", "No"]},
+            {"id": "yes", "type": "message"},
+            {"id": "no", "type": "message"},
+        ],
+        "edges": [
+            {"id": "e0", "source": "start", "target": "q"},
+            {"id": "e1", "source": "q", "target": "yes", "label": "Sí"},
+            {"id": "e2", "source": "q", "target": "no", "label": "No"},
+        ],
+    }
+    session = ValidationSession(flow)
+    assert session.report()["valid"]
+
+    session.apply([{"op": "add_edge", "edge": {"id": "e3", "source": "no", "target": "q"}}])
+    report = session.report()
+    assert not report["valid"]
+    assert any(message.startswith("Se detectó un ciclo") for message in report["errors"])
+
+    session.apply([{"op": "remove_edge", "id": "e3"}])
+    assert session.report()["valid"]
+    assert session.flow_data() == flow
+
+
+@pytest.mark.parametrize(
+    "edit",
+    [
+        {"op": "remove_node", "id": "missing"},
+        {"op": "update_edge", "id": "missing", "edge": {}},
+        {"op": "rename_node", "id": "start"},
+        "add_node",
+    ],
+)
+def test_bad_edits_are_rejected(edit):
+    session = ValidationSession(random_flow(0))
+    with pytest.raises(ValidationSessionError):
+        session.apply([edit])
+
+
+def test_sessions_registry_applies_closes_and_evicts():
+    sessions = ValidationSessions(limit=2)
+    flow = random_flow(1)
+    first, report = sessions.open(flow, PROJECT_RULES)
+    assert report["errors"] == validate_flow(flow, 0, cache=None, rules=PROJECT_RULES)["errors"]
+
+    report = sessions.apply(first, [{"op": "remove_node", "id": "n0"}])
+    assert report is not None
+    assert report["revision"] == 1
+
+    with pytest.raises(ValidationSessionError):
+        sessions.apply(first, [{"op": "remove_node", "id": "n0"}])
+    # A rejected batch closes the session.
+    assert sessions.apply(first, []) is None
+
+    second, _ = sessions.open(flow)
+    third, _ = sessions.open(flow)
+    fourth, _ = sessions.open(flow)
+    assert sessions.apply(second, []) is None
+    assert sessions.apply(third, []) is not None
+    assert sessions.close(fourth)
+    assert not sessions.close(fourth)
+
+
+def test_idle_sessions_expire():
+    sessions = ValidationSessions(idle_timeout=0)
+    session_id, _ = sessions.open(random_flow(2))
+    assert sessions.apply(session_id, []) is None
@@ -0,0 +1,49 @@
+"""validate_flow against the networkx-based validator it replaced."""
+
+import pytest
+
+from flow_factory import random_flow
+from utils.validator import validate_flow
+
+pytest.importorskip("networkx")
+
+from benchmarks.validator_scaling import VARIANTS, reference_validate_flow, synthetic_flow  # noqa: E402
+
+
+def assert_same_as_reference(flow):
+    result = validate_flow(flow, None, cache=None)
+    expected = reference_validate_flow(flow)
+
+    assert result["valid"] == expected["valid"]
+    assert result["errors"] == expected["errors"]
+    assert result["warnings"] == expected["warnings"]
+    # The reference groups paths by terminal; the linear validator lists them depth first.
+    assert sorted(result["paths"]) == sorted(expected["paths"])
+    assert result["path_count"] == len(result["paths"])
+    assert sum(result["path_counts"].values()) == result["path_count"]
+
+
+@pytest.mark.parametrize("variant", VARIANTS)
+@pytest.mark.parametrize("size", [12, 200])
+def test_synthetic_flows_match_the_reference(variant, size):
+    assert_same_as_reference(synthetic_flow(size, variant))
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_random_flows_match_the_reference(seed):
+    assert_same_as_reference(random_flow(seed, size=seed % 10 + 1, acyclic=seed % 2 == 0))
+
+
+def test_empty_flow_matches_the_reference():
+    assert_same_as_reference({"nodes": [], "edges": []})
+
+
+def test_path_listing_is_capped_but_counted():
+    flow = synthetic_flow(200, "valid")
+    full = validate_flow(flow, None, cache=None)
+    capped = validate_flow(flow, 5, cache=None)
+
+    assert capped["paths"] == full["paths"][:5]
+    assert capped["path_count"] == full["path_count"] > 5
+    assert capped["truncated"] is True
+    assert full["truncated"] is False
@@ -0,0 +1,63 @@
+"""YAML write-behind against a shared repository."""
+
+import pytest
+
+from utils import yaml_export
+from utils.repository import FileSystemRepository
+from utils.yaml_writer import YamlWriteBehind
+
+
+def make_flow(message):
+    return {
+        "id": "alta",
+        "name": "alta",
+        "description": "",
+        "nodes": [{"id": "start", "type": "message", "message": message}],
+        "edges": [],
+    }
+
+
+@pytest.fixture
+def repository(tmp_path, monkeypatch):
+    monkeypatch.setattr(yaml_export, "DATA_DIR", tmp_path)
+    repository = FileSystemRepository(tmp_path)
+    repository.ensure_storage()
+    yield repository
+    repository.compactor.shutdown()
+
+
+def test_export_of_the_stored_flow_is_written(repository, tmp_path):
+    flow = make_flow("hola")
+    repository.save_flow("demo", "alta", flow)
+    writer = YamlWriteBehind(repository)
+
+    writer.submit("demo", "alta", flow)
+    writer.shutdown()
+
+    assert "hola" in (tmp_path / "demo" / "flows" / "alta.yaml").read_text(encoding="utf-8")
+
+
+def test_export_of_an_outdated_flow_is_skipped(repository, tmp_path):
+    old = make_flow("hola")
+    repository.save_flow("demo", "alta", old)
+    # Another worker process saved a newer revision in the meantime.
+    repository.save_flow("demo", "alta", make_flow("adiós"))
+    writer = YamlWriteBehind(repository)
+
+    writer.submit("demo", "alta", old)
+    writer.shutdown()
+
+    assert not (tmp_path / "demo" / "flows" / "alta.yaml").exists()
+    assert writer.status("demo", "alta")["state"] == "idle"
+
+
+def test_finished_exports_are_forgotten(repository):
+    writer = YamlWriteBehind(repository)
+    for index in range(5):
+        flow = make_flow(f"hola {index}")
+        repository.save_flow("demo", f"flujo-{index}", dict(flow, id=f"flujo-{index}"))
+        writer.submit("demo", f"flujo-{index}", dict(flow, id=f"flujo-{index}"))
+    writer.shutdown()
+
+    assert writer._jobs == {}
+    assert writer.status("demo", "flujo-0") == {"state": "idle", "submitted": 0, "written": 0, "error": None}
@@ -0,0 +1,124 @@
+"""Parallel conversion of many YAML flow files at once."""
+
+from __future__ import annotations
+
+import os
+import zipfile
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+from .paths import FlowDict
+from .process_pool import process_pool
+from .validator import validate_flow
+from .yaml_export import START_NODE_TITLE
+from .yaml_import import YamlImportError, yaml_to_flow
+
+YAML_SUFFIXES = {".yaml", ".yml"}
+
+ImportSource = Tuple[str, bytes]
+
+
+def _is_yaml_name(name: str) -> bool:
+    path = Path(name)
+    return path.suffix.lower() in YAML_SUFFIXES and not any(part.startswith((".", "__MACOSX")) for part in path.parts)
+
+
+def read_directory(directory: Path) -> List[ImportSource]:
+    """Return every YAML file below ``directory`` as ``(relative name, bytes)``."""
+    sources = []
+    for path in sorted(directory.rglob("*")):
+        relative = path.relative_to(directory).as_posix()
+        if path.is_file() and _is_yaml_name(relative):
+            sources.append((relative, path.read_bytes()))
+    return sources
+
+
+def read_archive(archive: Union[Path, BinaryIO]) -> List[ImportSource]:
+    """Return every YAML member of a ZIP archive as ``(member name, bytes)``.
+
+    Raises :class:`YamlImportError` when ``archive`` is not a valid ZIP file.
+    """
+    try:
+        with zipfile.ZipFile(archive) as bundle:
+            return [
+                (info.filename, bundle.read(info))
+                for info in sorted(bundle.infolist(), key=lambda info: info.filename)
+                if not info.is_dir() and _is_yaml_name(info.filename)
+            ]
+    except zipfile.BadZipFile as error:
+        raise YamlImportError(f"El archivo ZIP no es válido: {error}") from error
+
+
+def ensure_start_node(flow: FlowDict) -> FlowDict:
+    """Add the Start node the editor would add when opening an imported flow."""
+    nodes = flow.setdefault("nodes", [])
+    if not any(isinstance(node, dict) and node.get("type") == "start" for node in nodes):
+        nodes.insert(
+            0,
+            {
+                "id": "start",
+                "type": "start",
+                "title": START_NODE_TITLE,
+                "position": {"x": 80, "y": 80},
+                "metadata": {},
+                "appearance": {},
+            },
+        )
+    for edge in flow.get("edges", []):
+        if isinstance(edge, dict) and edge.get("source") == "start":
+            edge["source_port"] = "start"
+    return flow
+
+
+def convert_source(name: str, content: bytes) -> Dict:
+    """Convert and validate one YAML file and return its report entry.
+
+    Successful entries carry the converted flow under ``"flow"``.
+    """
+    report: Dict = {"file": name, "success": False}
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        report["error"] = "El fichero no está codificado en UTF-8."
+        return report
+    try:
+        flow = ensure_start_node(yaml_to_flow(text))
+    except YamlImportError as error:
+        report["error"] = str(error)
+        return report
+
+    # Workers are short-lived: caching the result or listing paths would be wasted work.
+    validation = validate_flow(flow, 0, cache=None)
+    report.update(
+        {
+            "success": True,
+            "flow": flow,
+            "valid": validation["valid"],
+            "errors": validation["errors"],
+            "warnings": validation["warnings"],
+        }
+    )
+    return report
+
+
+def convert_sources(sources: List[ImportSource], max_workers: Optional[int] = None) -> List[Dict]:
+    """Convert ``sources`` in a process pool, returning reports in input order."""
+    if len(sources) < 2 or max_workers == 1:
+        return [convert_source(name, content) for name, content in sources]
+    names = [name for name, _ in sources]
+    contents = [content for _, content in sources]
+    workers = min(max_workers or os.cpu_count() or 1, len(sources))
+    chunksize = max(1, len(sources) // (workers * 4))
+    with process_pool(workers) as pool:
+        return list(pool.map(convert_source, names, contents, chunksize=chunksize))
+
+
+__all__ = [
+    "ImportSource",
+    "YAML_SUFFIXES",
+    "convert_source",
+    "convert_sources",
+    "ensure_start_node",
+    "read_archive",
+    "read_directory",
+]
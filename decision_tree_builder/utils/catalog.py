@@ -0,0 +1,90 @@
+"""In-memory catalogue of values derived from files on disk."""
+
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+Signature = Tuple[int, int, int]
+
+
+def file_signature(path: Path) -> Optional[Signature]:
+    """Return the ``(mtime_ns, size, inode)`` of ``path`` or ``None`` if missing.
+
+    The inode changes on every atomic replace, so a rewrite by another process
+    is detected even when size and timestamp happen to match.
+    """
+    try:
+        info = path.stat()
+    except OSError:
+        return None
+    return info.st_mtime_ns, info.st_size, info.st_ino
+
+
+class FileCatalog:
+    """Process-wide cache keyed by path and invalidated by file signature changes.
+
+    Each entry stores the signature of the file (or directory) it was derived
+    from. Lookups only ``stat`` the path and call the loader again when the
+    signature differs, so unchanged files are never re-read.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[Path, Tuple[Signature, Any]] = {}
+        self._lock = threading.RLock()
+
+    def get(self, path: Path, loader: Callable[[Path], Any], default: Any = None) -> Any:
+        """Return the cached value for ``path``, reloading it when it changed."""
+        signature = file_signature(path)
+        if signature is None:
+            self.discard(path)
+            return default
+        with self._lock:
+            cached = self._entries.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        value = loader(path)
+        with self._lock:
+            self._entries[path] = (signature, value)
+        return value
+
+    def put(self, path: Path, value: Any) -> None:
+        """Store ``value`` for ``path`` using its current signature."""
+        signature = file_signature(path)
+        with self._lock:
+            if signature is None:
+                self._entries.pop(path, None)
+            else:
+                self._entries[path] = (signature, value)
+
+    def update(self, path: Path, updater: Callable[[Any], Any]) -> None:
+        """Apply ``updater`` to the cached value and re-stamp it in place.
+
+        Paths that were never loaded are left untouched so the next lookup
+        reads them from disk.
+        """
+        signature = file_signature(path)
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is None or signature is None:
+                self._entries.pop(path, None)
+                return
+            self._entries[path] = (signature, updater(cached[1]))
+
+    def discard(self, path: Path) -> None:
+        with self._lock:
+            self._entries.pop(path, None)
+
+    def discard_tree(self, directory: Path) -> None:
+        """Forget every cached entry located under ``directory``."""
+        with self._lock:
+            for path in [path for path in self._entries if path == directory or directory in path.parents]:
+                del self._entries[path]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+__all__ = ["FileCatalog", "file_signature"]
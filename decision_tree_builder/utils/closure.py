@@ -0,0 +1,57 @@
+"""Ancestor and descendant sets of every node of a flow, cached by content."""
+
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+from .paths import FlowDict, FlowGraph
+from .validation_cache import ValidationCache, validation_key
+
+# The closure takes O(V²) bits, so it is only precomputed for flows up to this size.
+CLOSURE_NODE_LIMIT = 2000
+
+closure_cache = ValidationCache(max_entries=64)
+
+
+class ClosureError(ValueError):
+    """Error raised when the closure of a flow cannot be computed."""
+
+
+def flow_closure(
+    flow_data: FlowDict, node_limit: int = CLOSURE_NODE_LIMIT, cache: Optional[ValidationCache] = closure_cache
+) -> Dict[str, object]:
+    """Return the transitive closure of the flow graph.
+
+    The result lists the graph ``nodes`` and, aligned with them, their
+    ``ancestors`` and ``descendants`` as hexadecimal bitsets where bit ``i``
+    stands for ``nodes[i]``. It only depends on node ids and edge endpoints
+    and is kept in ``cache`` by content, so it is computed once per revision.
+    Raises :class:`ClosureError` for cyclic flows and flows larger than
+    ``node_limit``.
+    """
+    key = validation_key(flow_data, node_limit) if cache is not None else None
+    if key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    graph = FlowGraph.from_flow(flow_data)
+    if len(graph) > node_limit:
+        raise ClosureError(
+            f"El flujo tiene {len(graph)} nodos; las relaciones entre nodos solo se precalculan hasta {node_limit}."
+        )
+    try:
+        descendants, ancestors = graph.closure()
+    except ValueError:
+        raise ClosureError("El flujo contiene un ciclo; no se pueden calcular sus antecesores y descendientes.") from None
+    result = {
+        "nodes": graph.ids,
+        "ancestors": [format(bits, "x") for bits in ancestors],
+        "descendants": [format(bits, "x") for bits in descendants],
+    }
+    if key is not None:
+        cache.put(key, result)
+    return result
+
+
+__all__ = ["CLOSURE_NODE_LIMIT", "ClosureError", "closure_cache", "flow_closure"]
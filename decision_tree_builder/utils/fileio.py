@@ -0,0 +1,129 @@
+"""Crash- and multi-process-safe helpers for files under ``data/``.
+
+Writers replace files atomically (temporary file in the same directory,
+``fsync`` and :func:`os.replace`), so readers never need a lock: they either
+see the previous complete file or the new one. Read-modify-write sequences
+are serialised with advisory ``fcntl.flock`` locks held on separate lock
+files, which also excludes threads of the same process.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator
+
+try:  # pragma: no cover - depends on the platform
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+LOCK_DIRNAME = ".locks"
+
+_held = threading.local()
+_fallback_locks: Dict[Path, threading.RLock] = {}
+_fallback_guard = threading.Lock()
+
+
+def atomic_write_text(path: Path, content: str, encoding: str = "utf-8") -> None:
+    """Write ``content`` to ``path`` so that readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "w", encoding=encoding) as handle:
+            handle.write(content)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp_name, path)
+    except BaseException:
+        try:
+            os.unlink(temp_name)
+        except OSError:
+            pass
+        raise
+
+
+def _handle_remove_readonly(func, path, exc_info):
+    """Retry a failed removal after clearing the read-only bit on Windows."""
+
+    exc = exc_info[1]
+    if isinstance(exc, PermissionError):
+        os.chmod(path, stat.S_IWRITE)
+        func(path)
+    else:
+        raise exc
+
+
+def remove_tree(path: Path) -> None:
+    if path.exists():
+        shutil.rmtree(path, onerror=_handle_remove_readonly)
+
+
+def link_or_copy(source: Path, target: Path) -> None:
+    """Hardlink ``source`` at ``target``, copying it where links are not supported.
+
+    Only safe for files that are replaced atomically rather than modified in
+    place: the next write then gives ``target`` its own inode.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def lock_path(data_dir: Path, *parts: str) -> Path:
+    """Return the lock file for ``parts`` inside the hidden lock directory of ``data_dir``."""
+    *directories, name = parts
+    return data_dir.joinpath(LOCK_DIRNAME, *directories, f"{name}.lock")
+
+
+def _fallback_lock(path: Path) -> threading.RLock:
+    with _fallback_guard:
+        return _fallback_locks.setdefault(path, threading.RLock())
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive advisory lock on ``path`` for the duration of the block.
+
+    The lock is re-entrant within a thread. Without ``fcntl`` (Windows) it
+    degrades to a per-process lock.
+    """
+    depths = getattr(_held, "depths", None)
+    if depths is None:
+        depths = _held.depths = {}
+    if depths.get(path):
+        depths[path] += 1
+        try:
+            yield
+        finally:
+            depths[path] -= 1
+        return
+
+    if fcntl is None:
+        with _fallback_lock(path):
+            depths[path] = 1
+            try:
+                yield
+            finally:
+                depths.pop(path, None)
+        return
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as handle:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        depths[path] = 1
+        try:
+            yield
+        finally:
+            depths.pop(path, None)
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+__all__ = ["LOCK_DIRNAME", "atomic_write_text", "file_lock", "link_or_copy", "lock_path", "remove_tree"]
@@ -0,0 +1,20 @@
+"""Canonical serialisation and content hashing of flow documents."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any
+
+
+def canonical_json(value: Any) -> str:
+    """Serialise ``value`` compactly with sorted keys so equal data yields equal text."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def content_hash(value: Any) -> str:
+    """Return the SHA-256 hex digest of the canonical serialisation of ``value``."""
+    return hashlib.sha256(canonical_json(value).encode("utf-8")).hexdigest()
+
+
+__all__ = ["canonical_json", "content_hash"]
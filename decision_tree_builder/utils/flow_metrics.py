@@ -0,0 +1,61 @@
+"""Complexity metrics of a flow, for capacity planning."""
+
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+from .paths import FlowDict, FlowGraph
+from .validation_cache import ValidationCache, validation_key
+
+metrics_cache = ValidationCache(max_entries=256)
+
+
+def flow_metrics(flow_data: FlowDict, cache: Optional[ValidationCache] = metrics_cache) -> Dict[str, object]:
+    """Return the size, shape and path metrics of a flow.
+
+    ``node_count``, ``edge_count`` (distinct connections) and
+    ``question_count`` describe its size; ``branching_factor`` is the mean
+    number of successors of the nodes that have any and ``max_branching``
+    the largest. On an acyclic flow ``path_count`` is the exact number of
+    root → terminal paths and ``longest_path`` one with the most edges
+    (``max_depth``), with ``longest_path_questions`` the questions on it;
+    these are ``None`` when the flow has a cycle. Everything is linear in
+    nodes and edges, and results are kept in ``cache`` by content.
+    """
+    key = validation_key(flow_data, None) if cache is not None else None
+    if key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    nodes = flow_data.get("nodes", []) if isinstance(flow_data, dict) else []
+    types: Dict[str, object] = {}
+    for node in nodes:
+        if isinstance(node, dict) and node.get("id"):
+            types.setdefault(node["id"], node.get("type"))
+
+    graph = FlowGraph.from_flow(flow_data)
+    degrees = graph.out_degrees()
+    branching = [degree for degree in degrees if degree]
+    counts = graph.path_counts()
+    longest = graph.longest_path()
+    result = {
+        "node_count": len(graph),
+        "edge_count": sum(degrees),
+        "question_count": sum(1 for node_type in types.values() if node_type == "question"),
+        "branching_factor": round(sum(branching) / len(branching), 2) if branching else 0.0,
+        "max_branching": max(degrees, default=0),
+        "acyclic": counts is not None,
+        "path_count": None if counts is None else sum(counts.values()),
+        "max_depth": None if longest is None else max(len(longest) - 1, 0),
+        "longest_path": longest,
+        "longest_path_questions": (
+            None if longest is None else sum(1 for node_id in longest if types.get(node_id) == "question")
+        ),
+    }
+    if key is not None:
+        cache.put(key, result)
+    return result
+
+
+__all__ = ["flow_metrics", "metrics_cache"]
@@ -0,0 +1,249 @@
+"""Per-flow revision history: full snapshots plus an append-only patch journal."""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from .fileio import atomic_write_text, link_or_copy
+from .json_patch import JsonPatchError, apply_patch
+from .paths import FlowDict
+
+HISTORY_DIRNAME = "history"
+COMPACT_THRESHOLD_BYTES = 64 * 1024
+# Snapshots (each with the journal that follows it) kept per flow; older ones are pruned.
+HISTORY_SEGMENTS = 16
+
+_SNAPSHOT_PATTERN = re.compile(r"^(\d+)\.snapshot\.json$")
+
+
+def revision_info(revision: int, digest: str, saved_at: str, kind: str) -> Dict:
+    """Return the public description of one stored revision."""
+    return {"revision": revision, "hash": digest, "saved_at": saved_at, "kind": kind}
+
+
+class FlowHistory:
+    """Revision history of one flow stored in its own directory.
+
+    ``<rev>.snapshot.json`` holds the complete flow at ``rev`` and
+    ``<rev>.journal.ndjson`` one JSON Patch line per later revision until the
+    next snapshot. ``HEAD`` names the newest revision so a save only appends
+    its delta. Callers serialise writers with the flow lock; readers never
+    lock because snapshots are replaced atomically and a torn trailing journal
+    line is ignored.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+
+    def _snapshot_path(self, revision: int) -> Path:
+        return self.directory / f"{revision:08d}.snapshot.json"
+
+    def _journal_path(self, revision: int) -> Path:
+        return self.directory / f"{revision:08d}.journal.ndjson"
+
+    def snapshots(self) -> List[int]:
+        if not self.directory.exists():
+            return []
+        revisions = []
+        for path in self.directory.iterdir():
+            match = _SNAPSHOT_PATTERN.match(path.name)
+            if match:
+                revisions.append(int(match.group(1)))
+        return sorted(revisions)
+
+    def head(self) -> Optional[Dict]:
+        try:
+            head = json.loads((self.directory / "HEAD").read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        return head if isinstance(head, dict) else None
+
+    def _set_head(self, revision: int, digest: str, saved_at: str) -> None:
+        head = {"revision": revision, "hash": digest, "saved_at": saved_at}
+        atomic_write_text(self.directory / "HEAD", json.dumps(head))
+
+    def journal_size(self) -> int:
+        """Return the size in bytes of the journal segment after the newest snapshot."""
+        snapshots = self.snapshots()
+        if not snapshots:
+            return 0
+        try:
+            return self._journal_path(snapshots[-1]).stat().st_size
+        except OSError:
+            return 0
+
+    def write_snapshot(self, revision: int, digest: str, document: FlowDict, saved_at: str) -> None:
+        payload = {"revision": revision, "hash": digest, "saved_at": saved_at, "flow": document}
+        atomic_write_text(self._snapshot_path(revision), json.dumps(payload, ensure_ascii=False))
+        head = self.head()
+        if head is None or int(head.get("revision") or 0) <= revision:
+            self._set_head(revision, digest, saved_at)
+
+    def append(self, revision: int, digest: str, patch: List[Dict], saved_at: str) -> None:
+        """Append the delta producing ``revision`` to the newest journal segment."""
+        segment = self.snapshots()[-1]
+        line = json.dumps(
+            {"revision": revision, "hash": digest, "saved_at": saved_at, "patch": patch},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        with open(self._journal_path(segment), "a", encoding="utf-8") as handle:
+            handle.write(line + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+        self._set_head(revision, digest, saved_at)
+
+    def prune(self, keep: int) -> int:
+        """Delete all but the newest ``keep`` snapshots and their journals; return how many went."""
+        snapshots = self.snapshots()
+        dropped = snapshots[: max(len(snapshots) - keep, 0)]
+        for revision in dropped:
+            for path in (self._journal_path(revision), self._snapshot_path(revision)):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+        return len(dropped)
+
+    def copy_to(self, directory: Path) -> None:
+        """Duplicate the history into ``directory``.
+
+        Snapshots and ``HEAD`` are only ever replaced atomically, so they are
+        hardlinked; journals are appended to in place and get a real copy.
+        """
+        if not self.directory.exists():
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        for path in self.directory.iterdir():
+            if path.name.endswith(".journal.ndjson"):
+                shutil.copy2(path, directory / path.name)
+            elif path.is_file() and not path.name.endswith(".tmp"):
+                link_or_copy(path, directory / path.name)
+
+    def _read_snapshot(self, revision: int) -> Optional[Dict]:
+        try:
+            return json.loads(self._snapshot_path(revision).read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _journal(self, segment: int) -> Iterator[Dict]:
+        try:
+            handle = open(self._journal_path(segment), encoding="utf-8")
+        except OSError:
+            return
+        with handle:
+            for line in handle:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                yield entry
+
+    def revisions(self) -> List[Dict]:
+        """Return every recorded revision in ascending order, without contents."""
+        found: Dict[int, Dict] = {}
+        for segment in self.snapshots():
+            snapshot = self._read_snapshot(segment)
+            if snapshot is not None:
+                found[segment] = revision_info(segment, snapshot["hash"], snapshot["saved_at"], "snapshot")
+            for entry in self._journal(segment):
+                found.setdefault(
+                    entry["revision"], revision_info(entry["revision"], entry["hash"], entry["saved_at"], "delta")
+                )
+        return [found[revision] for revision in sorted(found)]
+
+    def load(self, revision: int) -> Optional[FlowDict]:
+        """Return the flow at ``revision`` by replaying the nearest snapshot's journal."""
+        candidates = [segment for segment in self.snapshots() if segment <= revision]
+        if not candidates:
+            return None
+        snapshot = self._read_snapshot(candidates[-1])
+        if snapshot is None:
+            return None
+        document = snapshot["flow"]
+        if candidates[-1] == revision:
+            return document
+        for entry in self._journal(candidates[-1]):
+            if entry["revision"] > revision:
+                break
+            try:
+                apply_patch(document, entry["patch"])
+            except JsonPatchError:
+                return None
+            if entry["revision"] == revision:
+                return document
+        return None
+
+
+def plan_record(
+    head: Optional[Dict], previous: Optional[Tuple[int, str]], revision: int, digest: str
+) -> Optional[str]:
+    """Decide how a new revision is recorded: ``"delta"``, ``"snapshot"`` or ``None``.
+
+    A delta is only valid when the document it applies to (``previous``, the
+    stored revision and hash before the save) is the last one recorded in the
+    history; anything else (first save, edits made outside the application,
+    explicit revisions from a migration) starts a new snapshot. ``None`` means
+    the history already ends with this exact revision.
+    """
+    if head is not None and int(head.get("revision") or 0) == revision and head.get("hash") == digest:
+        return None
+    if head is None or previous is None:
+        return "snapshot"
+    previous_revision, previous_hash = previous
+    if head.get("hash") != previous_hash or int(head.get("revision") or 0) != previous_revision:
+        return "snapshot"
+    return "delta" if revision == previous_revision + 1 else "snapshot"
+
+
+class HistoryCompactor:
+    """Fold long journals into fresh snapshots and prune old segments on a background thread.
+
+    ``compact`` does both for one flow; the repositories schedule it when a
+    journal outgrows its threshold or a flow has more than its retained
+    number of snapshots. Requests for a flow that is already queued are
+    coalesced.
+    """
+
+    def __init__(self, compact: Callable[[str, str], bool], max_workers: int = 1) -> None:
+        self._compact = compact
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="history-compact")
+        self._pending: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+
+    def schedule(self, project_id: str, flow_id: str) -> None:
+        key = (project_id, flow_id)
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        self._executor.submit(self._run, key)
+
+    def _run(self, key: Tuple[str, str]) -> None:
+        with self._lock:
+            self._pending.discard(key)
+        try:
+            self._compact(*key)
+        except Exception:  # pragma: no cover - compaction is best effort
+            pass
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+__all__ = [
+    "COMPACT_THRESHOLD_BYTES",
+    "FlowHistory",
+    "HISTORY_DIRNAME",
+    "HISTORY_SEGMENTS",
+    "HistoryCompactor",
+    "plan_record",
+    "revision_info",
+]
@@ -0,0 +1,116 @@
+"""Minimal RFC 6902 JSON Patch implementation used for delta flow saves."""
+
+from __future__ import annotations
+
+import copy
+from typing import Any, Dict, List, Tuple
+
+
+class JsonPatchError(ValueError):
+    """Error raised when a patch operation cannot be applied."""
+
+
+def _parse_pointer(pointer: Any) -> List[str]:
+    if not isinstance(pointer, str):
+        raise JsonPatchError("La ruta del parche debe ser una cadena.")
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JsonPatchError(f"Ruta de parche inválida: '{pointer}'.")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _array_index(container: List, token: str, allow_end: bool) -> int:
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise JsonPatchError(f"Índice de lista inválido: '{token}'.")
+    index = int(token)
+    limit = len(container) if allow_end else len(container) - 1
+    if index > limit:
+        raise JsonPatchError(f"Índice fuera de rango: {index}.")
+    return index
+
+
+def _resolve(document: Any, tokens: List[str]) -> Any:
+    current = document
+    for token in tokens:
+        if isinstance(current, dict):
+            if token not in current:
+                raise JsonPatchError(f"La clave '{token}' no existe.")
+            current = current[token]
+        elif isinstance(current, list):
+            current = current[_array_index(current, token, allow_end=False)]
+        else:
+            raise JsonPatchError(f"No se puede navegar dentro de '{token}'.")
+    return current
+
+
+def _split(document: Any, pointer: Any) -> Tuple[Any, str]:
+    tokens = _parse_pointer(pointer)
+    if not tokens:
+        raise JsonPatchError("La operación no puede aplicarse a la raíz del documento.")
+    return _resolve(document, tokens[:-1]), tokens[-1]
+
+
+def _add(document: Any, pointer: Any, value: Any) -> None:
+    parent, token = _split(document, pointer)
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_array_index(parent, token, allow_end=True), value)
+    else:
+        raise JsonPatchError(f"No se puede añadir en '{pointer}'.")
+
+
+def _remove(document: Any, pointer: Any) -> Any:
+    parent, token = _split(document, pointer)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"La clave '{token}' no existe.")
+        return parent.pop(token)
+    if isinstance(parent, list):
+        return parent.pop(_array_index(parent, token, allow_end=False))
+    raise JsonPatchError(f"No se puede eliminar '{pointer}'.")
+
+
+def apply_patch(document: Dict, operations: List[Dict]) -> Dict:
+    """Apply ``operations`` to ``document`` in place and return it.
+
+    Operations are applied in order; a failing operation raises
+    :class:`JsonPatchError` and leaves the document partially modified, so
+    callers should patch a private copy.
+    """
+    if not isinstance(operations, list):
+        raise JsonPatchError("El parche debe ser una lista de operaciones.")
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise JsonPatchError("Cada operación del parche debe ser un objeto.")
+        op = operation.get("op")
+        path = operation.get("path")
+        if op in {"add", "replace", "test"} and "value" not in operation:
+            raise JsonPatchError(f"La operación '{op}' requiere un valor.")
+        if op == "add":
+            _add(document, path, operation["value"])
+        elif op == "remove":
+            _remove(document, path)
+        elif op == "replace":
+            _remove(document, path)
+            _add(document, path, operation["value"])
+        elif op == "move":
+            from_tokens = _parse_pointer(operation.get("from"))
+            if _parse_pointer(path)[: len(from_tokens)] == from_tokens and path != operation.get("from"):
+                raise JsonPatchError("No se puede mover un valor dentro de sí mismo.")
+            _add(document, path, _remove(document, operation.get("from")))
+        elif op == "copy":
+            value = _resolve(document, _parse_pointer(operation.get("from")))
+            _add(document, path, copy.deepcopy(value))
+        elif op == "test":
+            if _resolve(document, _parse_pointer(path)) != operation["value"]:
+                raise JsonPatchError(f"La comprobación de '{path}' no coincide.")
+        else:
+            raise JsonPatchError(f"Operación de parche desconocida: '{op}'.")
+    return document
+
+
+__all__ = ["apply_patch", "JsonPatchError"]
@@ -0,0 +1,69 @@
+"""Questions that every path of a flow asks, from its dominator trees."""
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+from .paths import FlowDict, FlowGraph
+from .validation_cache import ValidationCache, validation_key
+
+mandatory_cache = ValidationCache(max_entries=256)
+
+
+def _chain(node: Optional[str], tree: Dict[str, Optional[str]]) -> List[str]:
+    """Return the proper dominators of ``node`` in ``tree``, nearest first."""
+    chain: List[str] = []
+    parent = tree.get(node) if node is not None else None
+    while parent is not None:
+        chain.append(parent)
+        parent = tree[parent]
+    return chain
+
+
+def mandatory_questions(flow_data: FlowDict, cache: Optional[ValidationCache] = mandatory_cache) -> Dict[str, object]:
+    """Return the questions that lie on every path of a flow.
+
+    ``mandatory`` lists, in the order they are asked, the questions on every
+    path from ``start`` to a terminal: the post-dominators of Start.
+    ``outcomes`` maps every terminal to the questions on every path that
+    reaches it from the roots (its dominators), also in order. The
+    immediate-dominator trees behind them are returned as ``dominators`` and
+    ``post_dominators`` (node → parent, ``None`` at the top or where the node
+    is cut off). Both trees are built in near-linear time and cycles are
+    allowed. Results are kept in ``cache`` by content.
+    """
+    key = validation_key(flow_data, None) if cache is not None else None
+    if key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    nodes = flow_data.get("nodes", []) if isinstance(flow_data, dict) else []
+    types: Dict[str, object] = {}
+    for node in nodes:
+        if isinstance(node, dict) and node.get("id"):
+            types.setdefault(node["id"], node.get("type"))
+    start = next((node_id for node_id, node_type in types.items() if node_type == "start"), None)
+
+    graph = FlowGraph.from_flow(flow_data)
+    dominators = graph.immediate_dominators()
+    post_dominators = graph.immediate_post_dominators()
+
+    def questions(chain: List[str]) -> List[str]:
+        return [node_id for node_id in chain if types.get(node_id) == "question"]
+
+    result = {
+        "start": start,
+        "mandatory": questions(_chain(start, post_dominators)),
+        "outcomes": {
+            terminal: questions(_chain(terminal, dominators)[::-1]) for terminal in graph.terminals()
+        },
+        "dominators": dominators,
+        "post_dominators": post_dominators,
+    }
+    if key is not None:
+        cache.put(key, result)
+    return result
+
+
+__all__ = ["mandatory_cache", "mandatory_questions"]
@@ -0,0 +1,127 @@
+"""Compact per-project manifest summarising the flows stored on disk."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .fileio import atomic_write_text
+from .fingerprint import content_hash
+from .paths import FlowDict
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 2
+
+Manifest = Dict[str, Dict]
+
+
+def flow_summary(
+    filename: str, flow: FlowDict, size: int, revision: int, digest: Optional[str] = None
+) -> Dict:
+    """Return the manifest entry describing ``flow`` stored as ``filename``.
+
+    ``digest`` is the canonical content hash of ``flow``; it is computed when
+    the caller did not already do so.
+    """
+    stem = Path(filename).stem
+    nodes = flow.get("nodes")
+    edges = flow.get("edges")
+    return {
+        "id": str(flow.get("id") or stem),
+        "name": flow.get("name", stem),
+        "description": flow.get("description", ""),
+        "filename": filename,
+        "size": size,
+        "revision": revision,
+        "hash": digest or content_hash(flow),
+        "node_count": len(nodes) if isinstance(nodes, list) else 0,
+        "edge_count": len(edges) if isinstance(edges, list) else 0,
+    }
+
+
+def read_manifest(path: Path) -> Optional[Manifest]:
+    """Load the manifest at ``path`` or return ``None`` if it is unusable."""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+        return None
+    flows = data.get("flows")
+    return flows if isinstance(flows, dict) else None
+
+
+def write_manifest(path: Path, flows: Manifest) -> None:
+    ordered = {filename: flows[filename] for filename in sorted(flows)}
+    atomic_write_text(
+        path, json.dumps({"version": MANIFEST_VERSION, "flows": ordered}, indent=2, ensure_ascii=False)
+    )
+
+
+def scan_flows(flow_dir: Path, previous: Optional[Manifest] = None) -> Manifest:
+    """Rebuild manifest entries by parsing every flow file in ``flow_dir``.
+
+    Revisions from ``previous`` are kept for files whose content hash did not
+    change and bumped otherwise, so a rebuild never moves a revision backwards.
+    """
+    previous = previous or {}
+    flows: Manifest = {}
+    if not flow_dir.exists():
+        return flows
+    for path in sorted(flow_dir.glob("*.json")):
+        if not path.is_file():
+            continue
+        try:
+            flow = json.loads(path.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            continue
+        if not isinstance(flow, dict):
+            continue
+        digest = content_hash(flow)
+        known = previous.get(path.name) or {}
+        revision = int(known.get("revision") or 0)
+        if known.get("hash") != digest:
+            revision += 1
+        flows[path.name] = flow_summary(path.name, flow, path.stat().st_size, revision, digest)
+    return flows
+
+
+def is_stale(flow_dir: Path, flows: Manifest) -> bool:
+    """Return True when the flow files on disk no longer match ``flows``."""
+    on_disk = {}
+    if flow_dir.exists():
+        on_disk = {path.name: path.stat().st_size for path in flow_dir.glob("*.json") if path.is_file()}
+    recorded = {filename: entry.get("size") for filename, entry in flows.items()}
+    return on_disk != recorded
+
+
+def flow_entries(flows: Manifest) -> List[Dict]:
+    """Return one entry per flow id, preferring the canonical ``<id>.json`` file."""
+    entries: Dict[str, Dict] = {}
+    for filename in sorted(flows):
+        entry = flows[filename]
+        dedupe_key = entry["id"]
+
+        existing = entries.get(dedupe_key)
+        if existing is None:
+            entries[dedupe_key] = entry
+            continue
+
+        canonical_filename = f"{dedupe_key}.json"
+        if existing["filename"] != canonical_filename and filename == canonical_filename:
+            entries[dedupe_key] = entry
+
+    return list(entries.values())
+
+
+__all__ = [
+    "MANIFEST_FILENAME",
+    "Manifest",
+    "flow_entries",
+    "flow_summary",
+    "is_stale",
+    "read_manifest",
+    "scan_flows",
+    "write_manifest",
+]
@@ -1,16 +1,520 @@
-"""Helpers for building graph representations and computing decision paths."""
+"""Helpers for building graph representations and computing decision paths.
+
+:class:`FlowGraph` is the graph core used by validation and path listing; it
+needs nothing beyond the standard library. networkx is only imported by
+:func:`build_graph`, for callers that want a full ``nx.DiGraph`` with the
+node and edge attributes.
+"""
 
 from __future__ import annotations
 
-from typing import Dict, List
+from array import array
+from collections import deque
+from itertools import islice
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
 
-import networkx as nx
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    import networkx as nx
 
 FlowDict = Dict[str, object]
 
+# Typecode of the index buffers: C ints, i.e. up to 2**31 nodes and edges.
+INDEX_TYPE = "i"
+
+
+def _zeros(length: int) -> array:
+    return array(INDEX_TYPE, [0]) * length
+
+
+class FlowGraph:
+    """Compact directed graph of a flow with integer nodes and CSR adjacency.
+
+    Node ids are interned to indices ``0..n-1`` in the order :func:`build_graph`
+    gives them (declared nodes first, then unknown edge endpoints as they
+    appear). Edges are recorded as two index arrays and compressed on first
+    use into compressed sparse rows: the successors of node ``u`` are
+    ``targets[offsets[u]:offsets[u + 1]]``, in insertion order with parallel
+    edges collapsed. No attribute dictionaries are kept, and every result
+    matches the networkx helpers.
+    """
+
+    def __init__(self) -> None:
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self._sources = array(INDEX_TYPE)
+        self._targets = array(INDEX_TYPE)
+        self._csr: Optional[Tuple[array, array, array]] = None
+        self._reverse: Optional[Tuple[array, array]] = None
+
+    @classmethod
+    def from_flow(cls, flow_data: FlowDict) -> "FlowGraph":
+        graph = cls()
+        nodes = flow_data.get("nodes", []) if isinstance(flow_data, dict) else []
+        edges = flow_data.get("edges", []) if isinstance(flow_data, dict) else []
+        for node in nodes:
+            node_id = node.get("id") if isinstance(node, dict) else None
+            if node_id:
+                graph.add_node(node_id)
+        for edge in edges:
+            if not isinstance(edge, dict):
+                continue
+            source = edge.get("source")
+            target = edge.get("target")
+            if source and target:
+                graph.add_edge(source, target)
+        return graph
+
+    def add_node(self, node_id: str) -> int:
+        """Intern ``node_id`` and return its index."""
+        position = self.index.get(node_id)
+        if position is None:
+            position = self.index[node_id] = len(self.ids)
+            self.ids.append(node_id)
+            self._csr = self._reverse = None
+        return position
+
+    def add_edge(self, source: str, target: str) -> None:
+        self._sources.append(self.add_node(source))
+        self._targets.append(self.add_node(target))
+        self._csr = self._reverse = None
+
+    @property
+    def nodes(self) -> List[str]:
+        return self.ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, node_id: object) -> bool:
+        return node_id in self.index
+
+    def _compressed(self) -> Tuple[array, array, array]:
+        """Return ``(offsets, targets, in_degree)``, building them after any change."""
+        if self._csr is None:
+            self._csr = self._compress()
+        return self._csr
+
+    def _compress(self) -> Tuple[array, array, array]:
+        count = len(self.ids)
+        sources, targets = self._sources, self._targets
+        # Counting sort of the edge list by source keeps each row in insertion order.
+        cursor = [0] * (count + 1)
+        for source in sources:
+            cursor[source + 1] += 1
+        for node in range(count):
+            cursor[node + 1] += cursor[node]
+        rows = _zeros(len(sources))
+        for source, target in zip(sources, targets):
+            rows[cursor[source]] = target
+            cursor[source] += 1
+
+        offsets = _zeros(count + 1)
+        compact = array(INDEX_TYPE)
+        start = 0
+        for node in range(count):
+            end = cursor[node]
+            if end - start > 1:
+                row = rows[start:end]
+                # Parallel edges collapse onto their first occurrence.
+                compact.extend(dict.fromkeys(row) if len(set(row)) < len(row) else row)
+            elif end > start:
+                compact.append(rows[start])
+            offsets[node + 1] = len(compact)
+            start = end
+
+        in_degree = _zeros(count)
+        for target in compact:
+            in_degree[target] += 1
+        return offsets, compact, in_degree
+
+    def _reverse_compressed(self) -> Tuple[array, array]:
+        """Return the CSR rows of the predecessors, ``(offsets, sources)``."""
+        if self._reverse is None:
+            offsets, targets, in_degree = self._compressed()
+            count = len(self.ids)
+            cursor = [0] * (count + 1)
+            for node in range(count):
+                cursor[node + 1] = cursor[node] + in_degree[node]
+            reverse_offsets = array(INDEX_TYPE, cursor)
+            sources = _zeros(len(targets))
+            for node in range(count):
+                for child in targets[offsets[node] : offsets[node + 1]]:
+                    sources[cursor[child]] = node
+                    cursor[child] += 1
+            self._reverse = reverse_offsets, sources
+        return self._reverse
+
+    def reachable(self, sources: Iterable[str], reverse: bool = False) -> bytearray:
+        """Mark every node reachable from ``sources``; ``reverse`` follows edges backwards.
+
+        One O(V + E) pass over the CSR rows; works on cyclic graphs too. The
+        result holds one byte per node index, non-zero when reached.
+        """
+        if reverse:
+            offsets, targets = self._reverse_compressed()
+        else:
+            offsets, targets, _ = self._compressed()
+        marks = bytearray(len(self.ids))
+        stack = [self.index[node_id] for node_id in sources if node_id in self.index]
+        for node in stack:
+            marks[node] = 1
+        while stack:
+            node = stack.pop()
+            for child in targets[offsets[node] : offsets[node + 1]]:
+                if not marks[child]:
+                    marks[child] = 1
+                    stack.append(child)
+        return marks
+
+    def closure(self) -> Tuple[List[int], List[int]]:
+        """Return the descendant and ancestor sets of every node as integer bitsets.
+
+        Bit ``i`` of a set stands for node index ``i``. Each direction is one
+        pass over the topological order that ORs the sets of the successors
+        (predecessors), so the whole closure costs O(V + E) unions of
+        O(V / 64) machine words. Raises :class:`ValueError` if the graph has
+        a cycle.
+        """
+        order = self._order()
+        if order is None:
+            raise ValueError("cyclic graph")
+        offsets, targets, _ = self._compressed()
+        descendants = [0] * len(self.ids)
+        for node in reversed(order):
+            bits = 0
+            for child in targets[offsets[node] : offsets[node + 1]]:
+                bits |= descendants[child] | 1 << child
+            descendants[node] = bits
+        reverse_offsets, sources = self._reverse_compressed()
+        ancestors = [0] * len(self.ids)
+        for node in order:
+            bits = 0
+            for parent in sources[reverse_offsets[node] : reverse_offsets[node + 1]]:
+                bits |= ancestors[parent] | 1 << parent
+            ancestors[node] = bits
+        return descendants, ancestors
+
+    def successors(self, node_id: str) -> List[str]:
+        offsets, targets, _ = self._compressed()
+        node = self.index[node_id]
+        return [self.ids[child] for child in targets[offsets[node] : offsets[node + 1]]]
+
+    def roots(self) -> List[str]:
+        """Return nodes without predecessors."""
+        _, _, in_degree = self._compressed()
+        return [self.ids[node] for node in range(len(self.ids)) if not in_degree[node]]
+
+    def terminals(self) -> List[str]:
+        """Return nodes without outgoing edges."""
+        offsets, _, _ = self._compressed()
+        return [self.ids[node] for node in range(len(self.ids)) if offsets[node] == offsets[node + 1]]
+
+    def _order(self) -> Optional[List[int]]:
+        offsets, targets, in_degree = self._compressed()
+        remaining = in_degree.tolist()
+        queue = deque(node for node in range(len(remaining)) if not remaining[node])
+        order: List[int] = []
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for child in targets[offsets[node] : offsets[node + 1]]:
+                remaining[child] -= 1
+                if not remaining[child]:
+                    queue.append(child)
+        return order if len(order) == len(remaining) else None
+
+    def topological_order(self) -> Optional[List[str]]:
+        """Return the nodes in topological order (Kahn), or ``None`` if there is a cycle."""
+        order = self._order()
+        return None if order is None else [self.ids[node] for node in order]
+
+    def find_cycle(self) -> Optional[List[str]]:
+        """Return the first cycle a depth-first search meets as ``[v, ..., v]``.
+
+        The search visits nodes and successors in insertion order, so it
+        reports the same cycle as ``networkx.find_cycle``.
+        """
+        offsets, targets, _ = self._compressed()
+        state = bytearray(len(self.ids))  # 0 unseen, 1 on the current path, 2 finished
+        for start in range(len(self.ids)):
+            if state[start]:
+                continue
+            state[start] = 1
+            path = [start]
+            stack = [iter(targets[offsets[start] : offsets[start + 1]])]
+            while stack:
+                for child in stack[-1]:
+                    if state[child] == 1:
+                        return [self.ids[node] for node in path[path.index(child) :]] + [self.ids[child]]
+                    if not state[child]:
+                        state[child] = 1
+                        path.append(child)
+                        stack.append(iter(targets[offsets[child] : offsets[child + 1]]))
+                        break
+                else:
+                    state[path.pop()] = 2
+                    stack.pop()
+        return None
+
+    def path_counts(self) -> Optional[Dict[str, int]]:
+        """Return how many root → terminal paths end at each terminal, or ``None`` if cyclic.
+
+        Dynamic programming over the topological order: O(V + E) additions on
+        exact integers, however many paths there are.
+        """
+        order = self._order()
+        if order is None:
+            return None
+        offsets, targets, in_degree = self._compressed()
+        counts = [0] * len(self.ids)
+        for node in order:
+            if not in_degree[node]:
+                counts[node] = 1
+            for child in targets[offsets[node] : offsets[node + 1]]:
+                counts[child] += counts[node]
+        return {
+            self.ids[node]: counts[node] for node in range(len(self.ids)) if offsets[node] == offsets[node + 1]
+        }
+
+    def out_degrees(self) -> List[int]:
+        """Return the number of distinct successors of every node, by node index."""
+        offsets, _, _ = self._compressed()
+        return [offsets[node + 1] - offsets[node] for node in range(len(self.ids))]
+
+    def longest_path(self) -> Optional[List[str]]:
+        """Return a root → terminal path with the most edges, or ``None`` if the graph is cyclic.
+
+        Dynamic programming over the topological order, O(V + E); ties go to
+        the path found first.
+        """
+        order = self._order()
+        if order is None:
+            return None
+        if not order:
+            return []
+        offsets, targets, _ = self._compressed()
+        length = [0] * len(self.ids)
+        previous = [-1] * len(self.ids)
+        for node in order:
+            for child in targets[offsets[node] : offsets[node + 1]]:
+                if length[node] + 1 > length[child]:
+                    length[child] = length[node] + 1
+                    previous[child] = node
+        node = max(range(len(length)), key=length.__getitem__)
+        path = [node]
+        while previous[node] != -1:
+            node = previous[node]
+            path.append(node)
+        return [self.ids[node] for node in reversed(path)]
+
+    def _dominators(self, forward: bool) -> List[int]:
+        """Return the immediate dominator of every node index, ``-1`` for entries and unreachable nodes.
+
+        Cooper, Harvey and Kennedy's iterative algorithm over the reverse
+        postorder. ``forward`` analyses the paths from the roots; otherwise
+        the paths to the terminals, which gives the post-dominators. A
+        virtual node precedes every entry so that several roots (terminals)
+        still yield a single tree. On a DAG the reverse postorder is
+        topological and the second sweep only confirms the first.
+        """
+        offsets, targets, in_degree = self._compressed()
+        reverse_offsets, sources = self._reverse_compressed()
+        count = len(self.ids)
+        if forward:
+            succ_offsets, succ, pred_offsets, pred = offsets, targets, reverse_offsets, sources
+            entries = [node for node in range(count) if not in_degree[node]]
+        else:
+            succ_offsets, succ, pred_offsets, pred = reverse_offsets, sources, offsets, targets
+            entries = [node for node in range(count) if offsets[node] == offsets[node + 1]]
+
+        virtual = count
+        number = [-1] * (count + 1)  # postorder number
+        postorder: List[int] = []
+        visited = bytearray(count + 1)
+        visited[virtual] = 1
+        stack = [(virtual, iter(entries))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if not visited[child]:
+                    visited[child] = 1
+                    stack.append((child, iter(succ[succ_offsets[child] : succ_offsets[child + 1]])))
+                    break
+            else:
+                stack.pop()
+                number[node] = len(postorder)
+                postorder.append(node)
+
+        idom = [-1] * (count + 1)
+        idom[virtual] = virtual
+        is_entry = bytearray(count + 1)
+        for node in entries:
+            is_entry[node] = 1
+        changed = True
+        while changed:
+            changed = False
+            for node in reversed(postorder[:-1]):
+                new = virtual if is_entry[node] else -1
+                for parent in pred[pred_offsets[node] : pred_offsets[node + 1]]:
+                    if idom[parent] == -1:
+                        continue
+                    if new == -1:
+                        new = parent
+                        continue
+                    # Walk both fingers up the current tree until they meet.
+                    finger = parent
+                    while finger != new:
+                        while number[finger] < number[new]:
+                            finger = idom[finger]
+                        while number[new] < number[finger]:
+                            new = idom[new]
+                if idom[node] != new:
+                    idom[node] = new
+                    changed = True
+        return [-1 if parent == virtual else parent for parent in idom[:count]]
+
+    def immediate_dominators(self) -> Dict[str, Optional[str]]:
+        """Return the immediate dominator of every node on the paths from the roots.
+
+        Roots and nodes no root reaches map to ``None``.
+        """
+        return {self.ids[node]: (self.ids[parent] if parent != -1 else None) for node, parent in enumerate(self._dominators(True))}
+
+    def immediate_post_dominators(self) -> Dict[str, Optional[str]]:
+        """Return the immediate post-dominator of every node on the paths to the terminals.
+
+        Terminals and nodes that reach no terminal map to ``None``.
+        """
+        return {self.ids[node]: (self.ids[parent] if parent != -1 else None) for node, parent in enumerate(self._dominators(False))}
+
+    def _simple_paths(self, root: int) -> Iterator[List[str]]:
+        """Yield every simple path from ``root`` to a terminal, depth first."""
+        offsets, targets, _ = self._compressed()
+        ids = self.ids
+        path = [root]
+        on_path = {root}
+        stack = [iter(targets[offsets[root] : offsets[root + 1]])]
+        while stack:
+            child = next((node for node in stack[-1] if node not in on_path), None)
+            if child is None:
+                stack.pop()
+                on_path.discard(path.pop())
+                continue
+            if offsets[child] == offsets[child + 1]:
+                yield [ids[node] for node in path] + [ids[child]]
+                continue
+            path.append(child)
+            on_path.add(child)
+            stack.append(iter(targets[offsets[child] : offsets[child + 1]]))
+
+    def iter_paths(self) -> Iterator[List[str]]:
+        """Yield every simple root → terminal path, root by root in depth-first order.
+
+        On an acyclic graph every branch ends in a terminal, so producing the
+        first ``k`` paths costs O(k × depth) regardless of how many exist.
+        """
+        offsets, _, in_degree = self._compressed()
+        for start in range(len(self.ids)):
+            if in_degree[start]:
+                continue
+            if offsets[start] != offsets[start + 1]:
+                yield from self._simple_paths(start)
+            else:
+                yield [self.ids[start]]
+
+    def select_paths(
+        self, offset: int = 0, terminal: Optional[str] = None, through: Optional[str] = None
+    ) -> Tuple[int, Iterator[List[str]]]:
+        """Return how many paths match and a lazy iterator over them from ``offset``.
+
+        Matching paths end at ``terminal`` and/or visit ``through`` (``None``
+        means any) and come in :meth:`iter_paths` order. The number of
+        matching paths below every node is computed first (one O(V + E) pass
+        on exact integers), so the iterator skips whole subtrees: seeking to
+        any offset costs O(depth × degree) and memory stays O(depth).
+
+        Raises :class:`ValueError` if the graph has a cycle.
+        """
+        order = self._order()
+        if order is None:
+            raise ValueError("cyclic graph")
+        offsets, targets, in_degree = self._compressed()
+        # -1 never matches: an unknown terminal or waypoint selects no path.
+        end = -1 if terminal is None else self.index.get(terminal, -1)
+        via = None if through is None else self.index.get(through, -1)
+        below = [0] * len(self.ids)
+        for node in reversed(order):
+            if offsets[node] != offsets[node + 1]:
+                below[node] = sum(below[child] for child in targets[offsets[node] : offsets[node + 1]])
+            else:
+                below[node] = int(terminal is None or node == end)
+        # Paths that still have to visit ``through`` only count the ways through it.
+        pending = below
+        if via is not None:
+            pending = [0] * len(self.ids)
+            for node in reversed(order):
+                if node == via:
+                    pending[node] = below[node]
+                else:
+                    pending[node] = sum(pending[child] for child in targets[offsets[node] : offsets[node + 1]])
+
+        start_nodes = [node for node in range(len(self.ids)) if not in_degree[node]]
+        total = sum(pending[root] for root in start_nodes)
+        return total, self._walk_paths(start_nodes, below, pending, via, offset)
+
+    def _walk_paths(
+        self,
+        start_nodes: List[int],
+        below: List[int],
+        pending: List[int],
+        via: Optional[int],
+        offset: int,
+    ) -> Iterator[List[str]]:
+        offsets, targets, _ = self._compressed()
+        ids = self.ids
+        remaining = offset
+        for root in start_nodes:
+            weight = pending[root]
+            if weight <= remaining:
+                remaining -= weight
+                continue
+            if offsets[root] == offsets[root + 1]:
+                yield [ids[root]]
+                continue
+            path = [root]
+            passed = [via is None or root == via]
+            stack = [iter(targets[offsets[root] : offsets[root + 1]])]
+            while stack:
+                child = next(stack[-1], None)
+                if child is None:
+                    stack.pop()
+                    path.pop()
+                    passed.pop()
+                    continue
+                child_passed = passed[-1] or child == via
+                weight = below[child] if child_passed else pending[child]
+                if weight <= remaining:
+                    remaining -= weight
+                    continue
+                if offsets[child] == offsets[child + 1]:
+                    yield [ids[node] for node in path] + [ids[child]]
+                    continue
+                path.append(child)
+                passed.append(child_passed)
+                stack.append(iter(targets[offsets[child] : offsets[child + 1]]))
+
+    def paths(self, limit: Optional[int] = None) -> List[List[str]]:
+        """Return the simple root → terminal paths, at most ``limit`` of them."""
+        return list(islice(self.iter_paths(), limit))
+
+
+def build_graph(flow_data: FlowDict) -> "nx.DiGraph":
+    """Create a networkx directed graph, with node and edge attributes, from the JSON flow.
+
+    networkx is an optional dependency, imported on first use.
+    """
+    import networkx as nx
 
-def build_graph(flow_data: FlowDict) -> nx.DiGraph:
-    """Create a directed graph from the JSON flow description."""
     graph = nx.DiGraph()
     nodes = flow_data.get("nodes", []) if isinstance(flow_data, dict) else []
     edges = flow_data.get("edges", []) if isinstance(flow_data, dict) else []
@@ -31,32 +535,19 @@ def build_graph(flow_data: FlowDict) -> nx.DiGraph:
     return graph
 
 
-def roots(graph: nx.DiGraph) -> List[str]:
+def roots(graph: "nx.DiGraph") -> List[str]:
     """Return nodes without predecessors."""
     return [node for node, degree in graph.in_degree() if degree == 0]
 
 
-def terminals(graph: nx.DiGraph) -> List[str]:
+def terminals(graph: "nx.DiGraph") -> List[str]:
     """Return nodes without outgoing edges."""
     return [node for node, degree in graph.out_degree() if degree == 0]
 
 
-def enumerate_paths(flow_data: FlowDict) -> List[List[str]]:
-    """Enumerate all simple paths from roots to terminals."""
-    graph = build_graph(flow_data)
-    start_nodes = roots(graph)
-    end_nodes = terminals(graph)
-    paths: List[List[str]] = []
-
-    for start in start_nodes:
-        for end in end_nodes:
-            if start == end:
-                paths.append([start])
-                continue
-            for path in nx.all_simple_paths(graph, start, end):
-                if path not in paths:
-                    paths.append(path)
-    return paths
+def enumerate_paths(flow_data: FlowDict, limit: Optional[int] = None) -> List[List[str]]:
+    """Enumerate simple paths from roots to terminals, at most ``limit`` of them."""
+    return FlowGraph.from_flow(flow_data).paths(limit)
 
 
-__all__ = ["build_graph", "roots", "terminals", "enumerate_paths"]
+__all__ = ["FlowGraph", "build_graph", "roots", "terminals", "enumerate_paths"]
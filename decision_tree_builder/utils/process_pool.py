@@ -0,0 +1,18 @@
+"""Process pools that are safe to start from the threaded web server."""
+
+from __future__ import annotations
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# ``fork`` would copy the locks held by the background threads (YAML writer,
+# trash purger, compactors) into the workers, where nobody releases them.
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Return a process pool whose workers start from a clean interpreter, not a fork of this one."""
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(START_METHOD))
+
+
+__all__ = ["START_METHOD", "process_pool"]
@@ -0,0 +1,114 @@
+"""Streaming ZIP archives with every flow of a project."""
+
+from __future__ import annotations
+
+import io
+import json
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from .manifest import MANIFEST_FILENAME, MANIFEST_VERSION, Manifest
+from .paths import FlowDict
+from .yaml_export import flow_to_yaml
+
+FlowLoader = Callable[[str], Optional[FlowDict]]
+
+
+class _StreamSink(io.RawIOBase):
+    """Unseekable sink that keeps what :mod:`zipfile` wrote since the last drain."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _render(flow_id: str, load_flow: FlowLoader) -> Tuple[str, Optional[FlowDict], Optional[str]]:
+    flow = load_flow(flow_id)
+    if flow is None:
+        return flow_id, None, None
+    yaml_text, _ = flow_to_yaml(flow)
+    return flow_id, flow, yaml_text
+
+
+def iter_project_archive(
+    project_id: str,
+    manifest: Manifest,
+    load_flow: FlowLoader,
+    metadata: Optional[Dict] = None,
+    max_workers: int = 4,
+) -> Iterator[bytes]:
+    """Yield a ZIP archive of a project chunk by chunk.
+
+    Every flow listed in ``manifest`` contributes its JSON document and a
+    freshly generated YAML below ``<project_id>/flows/``. Flows are loaded and
+    rendered by a thread pool a bounded number of entries ahead of the
+    writer, so memory stays proportional to ``max_workers`` rather than to
+    the size of the project.
+    """
+    flow_ids = [Path(filename).stem for filename in sorted(manifest)]
+    sink = _StreamSink()
+    window = max(1, max_workers) * 2
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="zip-export") as pool:
+        pending: Deque[Future] = deque()
+        queued = iter(flow_ids)
+
+        def refill() -> None:
+            while len(pending) < window:
+                flow_id = next(queued, None)
+                if flow_id is None:
+                    return
+                pending.append(pool.submit(_render, flow_id, load_flow))
+
+        try:
+            with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                ordered = {filename: manifest[filename] for filename in sorted(manifest)}
+                archive.writestr(
+                    f"{project_id}/{MANIFEST_FILENAME}",
+                    json.dumps({"version": MANIFEST_VERSION, "flows": ordered}, indent=2, ensure_ascii=False),
+                )
+                if metadata is not None:
+                    archive.writestr(
+                        f"{project_id}/metadata.json", json.dumps(metadata, indent=2, ensure_ascii=False)
+                    )
+                yield sink.drain()
+
+                refill()
+                while pending:
+                    flow_id, flow, yaml_text = pending.popleft().result()
+                    refill()
+                    if flow is None:
+                        continue
+                    archive.writestr(
+                        f"{project_id}/flows/{flow_id}.json", json.dumps(flow, indent=2, ensure_ascii=False)
+                    )
+                    archive.writestr(f"{project_id}/flows/{flow_id}.yaml", yaml_text)
+                    yield sink.drain()
+        finally:
+            for future in pending:
+                future.cancel()
+    # Closing the archive wrote the central directory.
+    yield sink.drain()
+
+
+__all__ = ["iter_project_archive"]
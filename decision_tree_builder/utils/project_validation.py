@@ -0,0 +1,186 @@
+"""Validation status and complexity metrics of every flow of a project, cached per revision."""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .catalog import FileCatalog
+from .fileio import atomic_write_text, file_lock
+from .fingerprint import content_hash
+from .flow_metrics import flow_metrics
+from .paths import FlowDict
+from .process_pool import process_pool
+from .validation_rules import DEFAULT_RULES, RuleSet
+from .validator import validate_flow
+
+VALIDATION_FILENAME = "validation.json"
+
+# Loads the document described by a manifest entry.
+EntryLoader = Callable[[Dict], Optional[FlowDict]]
+
+
+def summarise_flow(flow_id: str, flow: FlowDict, rules: RuleSet = DEFAULT_RULES) -> Tuple[str, Dict]:
+    """Validate one flow and return ``(flow_id, summary)`` stamped with its content hash and rule set.
+
+    The summary also carries the :func:`~utils.flow_metrics.flow_metrics` of the flow.
+    """
+    result = validate_flow(flow, 0, cache=None, rules=rules)
+    return flow_id, {
+        "hash": content_hash(flow),
+        "rules": rules.fingerprint,
+        "valid": result["valid"],
+        "errors": result["errors"],
+        "warnings": result["warnings"],
+        "path_count": result["path_count"],
+        "metrics": flow_metrics(flow, cache=None),
+    }
+
+
+def validate_flows(
+    flows: Dict[str, FlowDict], max_workers: Optional[int] = None, rules: RuleSet = DEFAULT_RULES
+) -> Dict[str, Dict]:
+    """Validate ``flows`` in a process pool and return their summaries by flow id.
+
+    The pool is started with :func:`~utils.process_pool.process_pool`, so it
+    is safe to call from request handlers and the revalidator thread.
+    """
+    if len(flows) < 2 or max_workers == 1:
+        return dict(summarise_flow(flow_id, flow, rules) for flow_id, flow in flows.items())
+    workers = min(max_workers or os.cpu_count() or 1, len(flows))
+    chunksize = max(1, len(flows) // (workers * 4))
+    with process_pool(workers) as pool:
+        return dict(
+            pool.map(summarise_flow, list(flows), list(flows.values()), repeat(rules), chunksize=chunksize)
+        )
+
+
+class ProjectValidation:
+    """Summaries of the flows of one project, kept in ``validation.json``.
+
+    A summary belongs to the revision whose content hash it carries and to
+    the rule set it was checked against, so it stays valid until the flow or
+    the project rules change and only those flows are validated again. The
+    file is replaced atomically under a lock. With a ``catalog`` the parsed
+    file is kept in memory and only read again when its signature changes.
+    """
+
+    def __init__(
+        self,
+        project_dir: Path,
+        lock: Path,
+        rules: RuleSet = DEFAULT_RULES,
+        catalog: Optional[FileCatalog] = None,
+    ) -> None:
+        self.path = project_dir / VALIDATION_FILENAME
+        self.rules = rules
+        self.catalog = catalog
+        self._lock = lock
+
+    @staticmethod
+    def _read_summaries(path: Path) -> Dict[str, Dict]:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def read(self) -> Dict[str, Dict]:
+        """Return the stored summaries; the result is shared with the catalogue and must not be mutated."""
+        if self.catalog is None:
+            return self._read_summaries(self.path)
+        return self.catalog.get(self.path, self._read_summaries, {})
+
+    def current(self, summaries: Dict[str, Dict], entries: List[Dict]) -> Dict[str, Optional[Dict]]:
+        """Return the summary of every flow of ``entries``, or ``None`` where it is outdated."""
+        found: Dict[str, Optional[Dict]] = {}
+        for entry in entries:
+            summary = summaries.get(entry["id"])
+            fresh = (
+                summary
+                and summary.get("hash") == entry.get("hash")
+                and summary.get("rules", "") == self.rules.fingerprint
+                # Summaries written before metrics were added are refreshed.
+                and "metrics" in summary
+            )
+            found[entry["id"]] = summary if fresh else None
+        return found
+
+    def record(self, summaries: Dict[str, Dict], entries: List[Dict]) -> Dict[str, Dict]:
+        """Store ``summaries``, forget flows missing from ``entries`` and return the result."""
+        known = {entry["id"]: entry for entry in entries}
+        with file_lock(self._lock):
+            stored = {flow_id: summary for flow_id, summary in self.read().items() if flow_id in known}
+            for flow_id, summary in summaries.items():
+                entry = known.get(flow_id)
+                if entry is None:
+                    continue
+                if entry.get("hash") == summary["hash"]:
+                    summary = {**summary, "revision": entry.get("revision")}
+                stored[flow_id] = summary
+            if self.path.parent.exists():
+                atomic_write_text(self.path, json.dumps(stored, ensure_ascii=False))
+                if self.catalog is not None:
+                    self.catalog.put(self.path, stored)
+        return stored
+
+    def refresh(
+        self, entries: List[Dict], load_flow: EntryLoader, max_workers: Optional[int] = None
+    ) -> Dict[str, Optional[Dict]]:
+        """Validate the flows of ``entries`` whose summary is outdated and return all summaries."""
+        summaries = self.read()
+        flows = {}
+        current = self.current(summaries, entries)
+        for entry in entries:
+            if current[entry["id"]] is None:
+                flow = load_flow(entry)
+                if flow is not None:
+                    flows[entry["id"]] = flow
+        if flows:
+            summaries = self.record(validate_flows(flows, max_workers, self.rules), entries)
+        return self.current(summaries, entries)
+
+
+class ProjectRevalidator:
+    """Refresh project validation summaries on a background thread.
+
+    Requests for a project that is already queued are coalesced.
+    """
+
+    def __init__(self, refresh: Callable[[str], object]) -> None:
+        self._refresh = refresh
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="project-validation")
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def schedule(self, project_id: str) -> None:
+        with self._lock:
+            if project_id in self._pending:
+                return
+            self._pending.add(project_id)
+        self._executor.submit(self._run, project_id)
+
+    def _run(self, project_id: str) -> None:
+        with self._lock:
+            self._pending.discard(project_id)
+        try:
+            self._refresh(project_id)
+        except Exception:  # pragma: no cover - retried the next time the project is listed
+            pass
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+__all__ = [
+    "ProjectRevalidator",
+    "ProjectValidation",
+    "VALIDATION_FILENAME",
+    "summarise_flow",
+    "validate_flows",
+]
@@ -0,0 +1,651 @@
+"""Storage backends for projects and flows."""
+
+from __future__ import annotations
+
+import json
+import os
+from abc import ABC, abstractmethod
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .catalog import FileCatalog, file_signature
+from .fileio import atomic_write_text, file_lock, link_or_copy, lock_path, remove_tree
+from .fingerprint import content_hash
+from .history import (
+    COMPACT_THRESHOLD_BYTES,
+    HISTORY_DIRNAME,
+    HISTORY_SEGMENTS,
+    FlowHistory,
+    HistoryCompactor,
+    plan_record,
+)
+from .manifest import (
+    MANIFEST_FILENAME,
+    Manifest,
+    flow_summary,
+    is_stale,
+    read_manifest,
+    scan_flows,
+    write_manifest,
+)
+from .paths import FlowDict
+from .trash import TRASH_RETENTION_SECONDS, Trash, TrashError
+
+PROJECT_INDEX_FILENAME = "proyectos.json"
+PROJECT_METADATA_FILENAME = "metadata.json"
+
+
+@dataclass
+class _PendingFlow:
+    """A flow write in progress together with the history state it depends on."""
+
+    flow_id: str
+    data: FlowDict
+    digest: str
+    revision: Optional[int] = None
+    patch: Optional[List[Dict]] = None
+    size: int = 0
+    history: Optional[FlowHistory] = None
+    head: Optional[Dict] = None
+    previous: Optional[Tuple[int, str]] = None
+    base: Optional[FlowDict] = None
+    base_saved_at: str = ""
+
+
+class FlowRepository(ABC):
+    """Persistence interface shared by every storage backend.
+
+    Flow listings are returned as manifests: dictionaries keyed by
+    ``<flow_id>.json`` whose values follow :func:`utils.manifest.flow_summary`.
+    Every saved revision is also recorded in a history of snapshots and patch
+    journals: saves that come with their JSON Patch append it to the journal,
+    full saves are recorded as snapshots rather than diffed against the stored
+    document, and the current document itself is always rewritten whole.
+    A save whose content is already stored keeps its revision and writes
+    nothing. Journals longer than ``compact_threshold`` bytes are folded into
+    a new snapshot in the background, and only the newest
+    ``history_segments`` snapshots (with their journals) are kept. Deleted
+    projects and flows are moved to a :class:`Trash` from which they can be
+    restored for ``trash_retention`` seconds.
+    """
+
+    def __init__(
+        self,
+        data_dir: Path,
+        compact_threshold: int = COMPACT_THRESHOLD_BYTES,
+        trash_retention: float = TRASH_RETENTION_SECONDS,
+        history_segments: int = HISTORY_SEGMENTS,
+    ) -> None:
+        self.data_dir = data_dir
+        self.compact_threshold = compact_threshold
+        self.history_segments = history_segments
+        self.compactor = HistoryCompactor(self.compact_flow_history)
+        self.trash = Trash(data_dir, trash_retention)
+
+    @contextmanager
+    def flow_lock(self, project_id: str, flow_id: str) -> Iterator[None]:
+        """Serialise writes to one flow across threads and worker processes."""
+        with file_lock(lock_path(self.data_dir, project_id, "flows", flow_id)):
+            yield
+
+    @abstractmethod
+    def ensure_storage(self) -> None:
+        """Create the underlying storage if it does not exist yet."""
+
+    @abstractmethod
+    def load_projects(self) -> List[Dict]:
+        """Return the ordered project index."""
+
+    @abstractmethod
+    def save_projects(self, projects: List[Dict]) -> None:
+        """Replace the project index."""
+
+    @abstractmethod
+    def update_projects(self, updater: Callable[[List[Dict]], None]) -> List[Dict]:
+        """Apply ``updater`` to the project index atomically and return the result."""
+
+    @abstractmethod
+    def load_project_metadata(self, project_id: str) -> Optional[Dict]:
+        """Return the stored metadata of a project or ``None``."""
+
+    @abstractmethod
+    def save_project_metadata(self, project_id: str, metadata: Dict) -> None:
+        """Store the metadata of a project."""
+
+    @abstractmethod
+    def delete_project(self, project_id: str) -> str:
+        """Move a project's metadata and flows to the trash and return the entry id.
+
+        The project index is updated separately.
+        """
+
+    @abstractmethod
+    def duplicate_project(self, source_id: str, target_id: str) -> Manifest:
+        """Give ``target_id`` the flows and history of ``source_id`` and return its manifest.
+
+        Metadata and the project index are written separately.
+        """
+
+    @abstractmethod
+    def flow_index(self, project_id: str) -> Manifest:
+        """Return the manifest of every flow stored for a project."""
+
+    @abstractmethod
+    def flow_index_is_stale(self, project_id: str) -> bool:
+        """Return True when the flow index no longer matches the stored flows."""
+
+    @abstractmethod
+    def rebuild_flow_index(self, project_id: str) -> Manifest:
+        """Regenerate the flow index of a project from the stored flows."""
+
+    @abstractmethod
+    def flow_entry(self, project_id: str, flow_id: str) -> Optional[Dict]:
+        """Return the manifest entry of a stored flow or ``None``."""
+
+    @abstractmethod
+    def load_flow(self, project_id: str, flow_id: str) -> Optional[FlowDict]:
+        """Return a stored flow document or ``None`` if missing or unreadable."""
+
+    @abstractmethod
+    def save_flow(
+        self,
+        project_id: str,
+        flow_id: str,
+        data: FlowDict,
+        digest: Optional[str] = None,
+        revision: Optional[int] = None,
+        patch: Optional[List[Dict]] = None,
+    ) -> Dict:
+        """Store a flow and return its new manifest entry.
+
+        The revision is bumped unless an explicit ``revision`` is given.
+        ``patch`` may carry the JSON Patch from the stored document to ``data``;
+        it is recorded as the revision's delta, otherwise the revision is
+        recorded as a snapshot.
+        """
+
+    @abstractmethod
+    def save_flows(self, project_id: str, flows: Dict[str, FlowDict]) -> Dict[str, Dict]:
+        """Store several flows with a single index update and return their entries."""
+
+    @abstractmethod
+    def rename_flow(self, project_id: str, old_flow_id: str, new_flow_id: str) -> None:
+        """Move a stored flow to a new identifier."""
+
+    @abstractmethod
+    def delete_flow(self, project_id: str, flow_id: str) -> str:
+        """Move a stored flow to the trash and return the entry id."""
+
+    @abstractmethod
+    def flow_revisions(self, project_id: str, flow_id: str) -> List[Dict]:
+        """Return the recorded revisions of a flow in ascending order."""
+
+    @abstractmethod
+    def load_flow_revision(self, project_id: str, flow_id: str, revision: int) -> Optional[FlowDict]:
+        """Return a flow as it was at ``revision`` or ``None`` if it was not recorded."""
+
+    @abstractmethod
+    def compact_flow_history(self, project_id: str, flow_id: str) -> bool:
+        """Fold the journal into a snapshot of the newest revision and drop the segments beyond
+        ``history_segments``; return False if there was nothing to do."""
+
+    def trash_entries(self) -> List[Dict]:
+        """Return the deleted projects and flows that can still be restored."""
+        return self.trash.entries()
+
+    def restore_trash_entry(self, entry_id: str) -> Dict:
+        """Put a deleted project or flow back and return the entry description.
+
+        Raises :class:`TrashError` when the entry expired or its place is taken.
+        """
+        with self.trash.restore(entry_id) as (info, payload, dump):
+            self._restore_entry(info, payload, dump)
+        return info
+
+    @abstractmethod
+    def _restore_entry(self, info: Dict, payload: Path, dump: Optional[Dict]) -> None:
+        """Restore the storage of a claimed trash entry."""
+
+
+class FileSystemRepository(FlowRepository):
+    """Store projects and flows as JSON files below ``data_dir``.
+
+    Reads go through a :class:`FileCatalog`, so unchanged files are served
+    from memory, and flow listings come from each project's manifest. Every
+    write is an atomic replace and read-modify-write sequences hold advisory
+    file locks, so several worker processes can share ``data_dir``; reads
+    never lock.
+    """
+
+    def __init__(
+        self,
+        data_dir: Path,
+        compact_threshold: int = COMPACT_THRESHOLD_BYTES,
+        trash_retention: float = TRASH_RETENTION_SECONDS,
+        history_segments: int = HISTORY_SEGMENTS,
+    ) -> None:
+        super().__init__(data_dir, compact_threshold, trash_retention, history_segments)
+        self.index_file = data_dir / PROJECT_INDEX_FILENAME
+        self.catalog = FileCatalog()
+
+    # -- layout -------------------------------------------------------------
+
+    def project_dir(self, project_id: str) -> Path:
+        return self.data_dir / project_id
+
+    def flow_dir(self, project_id: str) -> Path:
+        return self.project_dir(project_id) / "flows"
+
+    def flow_path(self, project_id: str, flow_id: str) -> Path:
+        return self.flow_dir(project_id) / f"{flow_id}.json"
+
+    def yaml_path(self, project_id: str, flow_id: str) -> Path:
+        return self.flow_dir(project_id) / f"{flow_id}.yaml"
+
+    def manifest_path(self, project_id: str) -> Path:
+        return self.project_dir(project_id) / MANIFEST_FILENAME
+
+    def history(self, project_id: str, flow_id: str) -> FlowHistory:
+        return FlowHistory(self.project_dir(project_id) / HISTORY_DIRNAME / flow_id)
+
+    def _index_lock(self):
+        return file_lock(lock_path(self.data_dir, "projects"))
+
+    def _manifest_lock(self, project_id: str):
+        return file_lock(lock_path(self.data_dir, project_id, "manifest"))
+
+    # -- projects -----------------------------------------------------------
+
+    def ensure_storage(self) -> None:
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        if self.index_file.exists():
+            return
+        with self._index_lock():
+            if not self.index_file.exists():
+                self._write_project_index([])
+
+    @staticmethod
+    def _read_project_index(path: Path) -> List[Dict]:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return data.get("projects", [])
+
+    @staticmethod
+    def _read_json_file(path: Path) -> Dict:
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def _write_project_index(self, projects: List[Dict]) -> None:
+        atomic_write_text(self.index_file, json.dumps({"projects": projects}, indent=2, ensure_ascii=False))
+        self.catalog.put(self.index_file, [dict(project) for project in projects])
+
+    def load_projects(self) -> List[Dict]:
+        self.ensure_storage()
+        projects = self.catalog.get(self.index_file, self._read_project_index, [])
+        return [dict(project) for project in projects]
+
+    def save_projects(self, projects: List[Dict]) -> None:
+        self.ensure_storage()
+        with self._index_lock():
+            self._write_project_index(projects)
+
+    def update_projects(self, updater: Callable[[List[Dict]], None]) -> List[Dict]:
+        self.ensure_storage()
+        with self._index_lock():
+            projects = self.load_projects()
+            updater(projects)
+            self._write_project_index(projects)
+            return projects
+
+    def load_project_metadata(self, project_id: str) -> Optional[Dict]:
+        metadata_path = self.project_dir(project_id) / PROJECT_METADATA_FILENAME
+        metadata = self.catalog.get(metadata_path, self._read_json_file)
+        return dict(metadata) if metadata is not None else None
+
+    def save_project_metadata(self, project_id: str, metadata: Dict) -> None:
+        metadata_path = self.project_dir(project_id) / PROJECT_METADATA_FILENAME
+        atomic_write_text(metadata_path, json.dumps(metadata, indent=2, ensure_ascii=False))
+        self.catalog.put(metadata_path, dict(metadata))
+
+    def delete_project(self, project_id: str) -> str:
+        project_dir = self.project_dir(project_id)
+        metadata = self.load_project_metadata(project_id) or {"id": project_id, "name": project_id}
+        info = {"kind": "project", "project_id": project_id, "name": metadata.get("name"), "metadata": metadata}
+        entry_id = self.trash.put(info, {"project": project_dir})
+        self.catalog.discard_tree(project_dir)
+        return entry_id
+
+    def duplicate_project(self, source_id: str, target_id: str) -> Manifest:
+        """Hardlink the flow files, YAML exports and history of ``source_id``.
+
+        Writes always replace files atomically, so a linked file gets its own
+        copy the first time it is saved in either project; until then the
+        duplicate costs no extra space.
+        """
+        flows: Manifest = {}
+        complete = True
+        for source_path in sorted(self.flow_dir(source_id).glob("*.json")):
+            flow_id = source_path.stem
+            with self.flow_lock(source_id, flow_id):
+                entry = self.flow_entry(source_id, flow_id)
+                if not source_path.exists():
+                    continue
+                link_or_copy(source_path, self.flow_path(target_id, flow_id))
+                yaml_path = self.yaml_path(source_id, flow_id)
+                if yaml_path.exists():
+                    link_or_copy(yaml_path, self.yaml_path(target_id, flow_id))
+                self.history(source_id, flow_id).copy_to(self.history(target_id, flow_id).directory)
+            if entry is None:
+                complete = False
+            else:
+                flows[source_path.name] = entry
+        self.flow_dir(target_id).mkdir(parents=True, exist_ok=True)
+        if not complete:
+            return self.rebuild_flow_index(target_id)
+        with self._manifest_lock(target_id):
+            manifest_path = self.manifest_path(target_id)
+            write_manifest(manifest_path, flows)
+            self.catalog.put(manifest_path, flows)
+        return flows
+
+    # -- flow index ---------------------------------------------------------
+
+    def _sync_flow_dir(self, flow_dir: Path) -> List[str]:
+        """Rebuild the manifest when flow files were added or removed behind our back."""
+        filenames = sorted(path.name for path in flow_dir.glob("*.json") if path.is_file())
+        project_id = flow_dir.parent.name
+        flows = self.catalog.get(self.manifest_path(project_id), read_manifest)
+        if flows is None or set(flows) != set(filenames):
+            self.rebuild_flow_index(project_id)
+        return filenames
+
+    def rebuild_flow_index(self, project_id: str) -> Manifest:
+        with self._manifest_lock(project_id):
+            manifest_path = self.manifest_path(project_id)
+            flows = scan_flows(self.flow_dir(project_id), read_manifest(manifest_path))
+            write_manifest(manifest_path, flows)
+            self.catalog.put(manifest_path, flows)
+            return flows
+
+    def flow_index(self, project_id: str) -> Manifest:
+        flow_dir = self.flow_dir(project_id)
+        self.catalog.get(flow_dir, self._sync_flow_dir)
+        flows = self.catalog.get(self.manifest_path(project_id), read_manifest)
+        if flows is None:
+            return self.rebuild_flow_index(project_id) if flow_dir.exists() else {}
+        return flows
+
+    def flow_index_is_stale(self, project_id: str) -> bool:
+        flows = read_manifest(self.manifest_path(project_id))
+        return flows is None or is_stale(self.flow_dir(project_id), flows)
+
+    def _update_manifest(self, project_id: str, updater: Callable[[Manifest], None]) -> None:
+        """Apply ``updater`` to a copy of the manifest and persist the result."""
+        with self._manifest_lock(project_id):
+            manifest_path = self.manifest_path(project_id)
+            current = self.catalog.get(manifest_path, read_manifest)
+            flows = dict(current if current is not None else self.rebuild_flow_index(project_id))
+            updater(flows)
+            write_manifest(manifest_path, flows)
+            self.catalog.put(manifest_path, flows)
+            self.catalog.update(self.flow_dir(project_id), lambda _: sorted(flows))
+
+    # -- flows --------------------------------------------------------------
+
+    def flow_entry(self, project_id: str, flow_id: str) -> Optional[Dict]:
+        """Return the manifest entry of a flow if it still describes the file on disk."""
+        path = self.flow_path(project_id, flow_id)
+        entry = self.flow_index(project_id).get(path.name)
+        signature = file_signature(path)
+        if entry is None or signature is None or signature[1] != entry.get("size"):
+            return None
+        return entry
+
+    def load_flow(self, project_id: str, flow_id: str) -> Optional[FlowDict]:
+        path = self.flow_path(project_id, flow_id)
+        if not path.exists():
+            return None
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            return None
+
+    def _store_flows(self, project_id: str, pending: List[_PendingFlow]) -> Dict[str, Dict]:
+        """Write flows whose locks are held, then update the manifest once.
+
+        Flows whose content is already stored are left untouched.
+        """
+        saved_at = datetime.utcnow().isoformat()
+        if self.catalog.get(self.manifest_path(project_id), read_manifest) is None:
+            # Index the project before the new files exist, or a rebuild would count them as stored.
+            self.rebuild_flow_index(project_id)
+        entries: Dict[str, Dict] = {}
+        changed = []
+        for item in pending:
+            stored = self.flow_entry(project_id, item.flow_id)
+            item.previous = (int(stored["revision"]), stored["hash"]) if stored else None
+            if stored is not None and stored["hash"] == item.digest and item.revision in (None, item.previous[0]):
+                entries[item.flow_id] = stored
+                continue
+            changed.append(item)
+            item.history = self.history(project_id, item.flow_id)
+            item.head = item.history.head()
+            if item.head is None and item.previous is not None:
+                # The stored revision predates the history: it becomes the base snapshot.
+                item.base = self.load_flow(project_id, item.flow_id)
+                modified = file_signature(self.flow_path(project_id, item.flow_id))
+                if modified is not None:
+                    item.base_saved_at = datetime.utcfromtimestamp(modified[0] / 1e9).isoformat()
+        pending = changed
+        if not pending:
+            return entries
+        # Only write once every stored entry was read: new files would make the index look stale.
+        for item in pending:
+            path = self.flow_path(project_id, item.flow_id)
+            atomic_write_text(path, json.dumps(item.data, indent=2, ensure_ascii=False))
+            item.size = path.stat().st_size
+
+        def record(flows: Manifest) -> None:
+            for item in pending:
+                filename = f"{item.flow_id}.json"
+                revision = item.revision
+                if revision is None:
+                    revision = int((flows.get(filename) or {}).get("revision") or 0) + 1
+                entries[item.flow_id] = flows[filename] = flow_summary(
+                    filename, item.data, item.size, revision, item.digest
+                )
+
+        self._update_manifest(project_id, record)
+
+        for item in pending:
+            if item.head is None and item.base is not None:
+                item.history.write_snapshot(
+                    item.previous[0], content_hash(item.base), item.base, item.base_saved_at
+                )
+                item.head = item.history.head()
+            revision = entries[item.flow_id]["revision"]
+            kind = plan_record(item.head, item.previous, revision, item.digest)
+            if kind == "delta" and item.patch is not None:
+                item.history.append(revision, item.digest, item.patch, saved_at)
+                if item.history.journal_size() > self.compact_threshold:
+                    self.compactor.schedule(project_id, item.flow_id)
+            elif kind is not None:
+                item.history.write_snapshot(revision, item.digest, item.data, saved_at)
+                if len(item.history.snapshots()) > self.history_segments:
+                    self.compactor.schedule(project_id, item.flow_id)
+        return entries
+
+    def save_flow(
+        self,
+        project_id: str,
+        flow_id: str,
+        data: FlowDict,
+        digest: Optional[str] = None,
+        revision: Optional[int] = None,
+        patch: Optional[List[Dict]] = None,
+    ) -> Dict:
+        pending = _PendingFlow(flow_id, data, digest or content_hash(data), revision, patch)
+        with self.flow_lock(project_id, flow_id):
+            return self._store_flows(project_id, [pending])[flow_id]
+
+    def save_flows(self, project_id: str, flows: Dict[str, FlowDict]) -> Dict[str, Dict]:
+        pending = [_PendingFlow(flow_id, data, content_hash(data)) for flow_id, data in sorted(flows.items())]
+        with ExitStack() as stack:
+            for item in pending:
+                stack.enter_context(self.flow_lock(project_id, item.flow_id))
+            return self._store_flows(project_id, pending)
+
+    def rename_flow(self, project_id: str, old_flow_id: str, new_flow_id: str) -> None:
+        old_path = self.flow_path(project_id, old_flow_id)
+        new_path = self.flow_path(project_id, new_flow_id)
+
+        def move(flows: Manifest) -> None:
+            entry = flows.pop(old_path.name, None)
+            if entry is not None:
+                flows[new_path.name] = {**entry, "filename": new_path.name}
+
+        with ExitStack() as stack:
+            for flow_id in sorted({old_flow_id, new_flow_id}):
+                stack.enter_context(self.flow_lock(project_id, flow_id))
+            if not old_path.exists():
+                return
+            os.replace(old_path, new_path)
+            self._update_manifest(project_id, move)
+            old_history = self.history(project_id, old_flow_id).directory
+            new_history = self.history(project_id, new_flow_id).directory
+            remove_tree(new_history)
+            if old_history.exists():
+                os.replace(old_history, new_history)
+
+    def delete_flow(self, project_id: str, flow_id: str) -> str:
+        path = self.flow_path(project_id, flow_id)
+        with self.flow_lock(project_id, flow_id):
+            entry = self.flow_entry(project_id, flow_id)
+            info = {
+                "kind": "flow",
+                "project_id": project_id,
+                "flow_id": flow_id,
+                "name": (entry or {}).get("name") or flow_id,
+                "entry": entry,
+            }
+            paths = {
+                "flow.json": path,
+                "flow.yaml": self.yaml_path(project_id, flow_id),
+                "history": self.history(project_id, flow_id).directory,
+            }
+            entry_id = self.trash.put(info, paths)
+            self._update_manifest(project_id, lambda flows: flows.pop(path.name, None))
+            return entry_id
+
+    def _restore_entry(self, info: Dict, payload: Path, dump: Optional[Dict]) -> None:
+        project_id = info["project_id"]
+        if info["kind"] == "project":
+            project_dir = self.project_dir(project_id)
+            if project_dir.exists():
+                raise TrashError(f"Ya existe un proyecto con el identificador '{project_id}'.")
+            os.replace(payload / "project", project_dir)
+            self.catalog.discard_tree(project_dir)
+            return
+
+        flow_id = info["flow_id"]
+        if not self.project_dir(project_id).exists():
+            raise TrashError("El proyecto de este flujo ya no existe.")
+        path = self.flow_path(project_id, flow_id)
+        with self.flow_lock(project_id, flow_id):
+            if path.exists():
+                raise TrashError(f"Ya existe un flujo con el identificador '{flow_id}'.")
+            history_dir = self.history(project_id, flow_id).directory
+            remove_tree(history_dir)
+            if (payload / "history").exists():
+                history_dir.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(payload / "history", history_dir)
+            if (payload / "flow.yaml").exists():
+                os.replace(payload / "flow.yaml", self.yaml_path(project_id, flow_id))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(payload / "flow.json", path)
+            entry = info.get("entry")
+            if entry is None:
+                self.rebuild_flow_index(project_id)
+                return
+
+            def add(flows: Manifest) -> None:
+                flows[path.name] = entry
+
+            self._update_manifest(project_id, add)
+
+    # -- history ------------------------------------------------------------
+
+    def flow_revisions(self, project_id: str, flow_id: str) -> List[Dict]:
+        return self.history(project_id, flow_id).revisions()
+
+    def load_flow_revision(self, project_id: str, flow_id: str, revision: int) -> Optional[FlowDict]:
+        return self.history(project_id, flow_id).load(revision)
+
+    def compact_flow_history(self, project_id: str, flow_id: str) -> bool:
+        with self.flow_lock(project_id, flow_id):
+            history = self.history(project_id, flow_id)
+            head = history.head()
+            snapshots = history.snapshots()
+            folded = False
+            if head is not None and snapshots and int(head["revision"]) > snapshots[-1]:
+                document = history.load(int(head["revision"]))
+                if document is not None:
+                    history.write_snapshot(int(head["revision"]), head["hash"], document, head.get("saved_at", ""))
+                    folded = True
+            return history.prune(self.history_segments) > 0 or folded
+
+
+def copy_repository(source: FlowRepository, target: FlowRepository) -> Dict[str, int]:
+    """Copy every project and flow from ``source`` into ``target``.
+
+    Revisions are preserved so entity tags computed from either backend stay
+    comparable. Returns the number of copied projects and flows.
+    """
+    target.ensure_storage()
+    projects = source.load_projects()
+    copied = {"projects": 0, "flows": 0}
+    for project in projects:
+        project_id = project["id"]
+        metadata = source.load_project_metadata(project_id)
+        if metadata is not None:
+            target.save_project_metadata(project_id, metadata)
+        for filename, entry in source.flow_index(project_id).items():
+            flow_id = Path(filename).stem
+            data = source.load_flow(project_id, flow_id)
+            if data is None:
+                continue
+            target.save_flow(project_id, flow_id, data, revision=int(entry.get("revision") or 1))
+            copied["flows"] += 1
+        copied["projects"] += 1
+    target.save_projects(projects)
+    return copied
+
+
+def create_repository(
+    backend: str,
+    data_dir: Path,
+    database: Optional[Path] = None,
+    compact_threshold: int = COMPACT_THRESHOLD_BYTES,
+    trash_retention: float = TRASH_RETENTION_SECONDS,
+    history_segments: int = HISTORY_SEGMENTS,
+) -> FlowRepository:
+    """Instantiate the storage backend named ``backend``."""
+    if backend == "filesystem":
+        return FileSystemRepository(data_dir, compact_threshold, trash_retention, history_segments)
+    if backend == "sqlite":
+        from .sqlite_repository import SQLiteRepository
+
+        return SQLiteRepository(
+            database or data_dir / "flows.sqlite3", data_dir, compact_threshold, trash_retention, history_segments
+        )
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+__all__ = [
+    "FileSystemRepository",
+    "FlowRepository",
+    "copy_repository",
+    "create_repository",
+    "remove_tree",
+]
@@ -0,0 +1,734 @@
+"""Embedded SQLite storage backend for projects and flows."""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .fileio import link_or_copy
+from .fingerprint import canonical_json, content_hash
+from .history import COMPACT_THRESHOLD_BYTES, HISTORY_SEGMENTS, plan_record, revision_info
+from .json_patch import JsonPatchError, apply_patch
+from .manifest import Manifest, flow_summary
+from .paths import FlowDict
+from .repository import FlowRepository
+from .trash import TRASH_RETENTION_SECONDS, TrashError
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    entry TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS project_metadata (
+    project_id TEXT PRIMARY KEY,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS flows (
+    project_id TEXT NOT NULL,
+    flow_id TEXT NOT NULL,
+    revision INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    node_count INTEGER NOT NULL,
+    edge_count INTEGER NOT NULL,
+    summary TEXT NOT NULL,
+    document TEXT NOT NULL,
+    nodes_in_table INTEGER NOT NULL,
+    edges_in_table INTEGER NOT NULL,
+    PRIMARY KEY (project_id, flow_id)
+);
+CREATE TABLE IF NOT EXISTS nodes (
+    project_id TEXT NOT NULL,
+    flow_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    node_id TEXT,
+    type TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (project_id, flow_id, position),
+    FOREIGN KEY (project_id, flow_id) REFERENCES flows (project_id, flow_id)
+        ON DELETE CASCADE ON UPDATE CASCADE
+);
+CREATE INDEX IF NOT EXISTS nodes_by_id ON nodes (project_id, flow_id, node_id);
+CREATE TABLE IF NOT EXISTS edges (
+    project_id TEXT NOT NULL,
+    flow_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    edge_id TEXT,
+    source TEXT,
+    target TEXT,
+    label TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (project_id, flow_id, position),
+    FOREIGN KEY (project_id, flow_id) REFERENCES flows (project_id, flow_id)
+        ON DELETE CASCADE ON UPDATE CASCADE
+);
+CREATE INDEX IF NOT EXISTS edges_by_source ON edges (project_id, flow_id, source);
+CREATE INDEX IF NOT EXISTS edges_by_target ON edges (project_id, flow_id, target);
+CREATE TABLE IF NOT EXISTS flow_history (
+    project_id TEXT NOT NULL,
+    flow_id TEXT NOT NULL,
+    revision INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    saved_at TEXT NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (project_id, flow_id, revision, kind),
+    FOREIGN KEY (project_id, flow_id) REFERENCES flows (project_id, flow_id)
+        ON DELETE CASCADE ON UPDATE CASCADE
+);
+"""
+
+
+def _text_or_none(value) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def _node_row(project_id: str, flow_id: str, position: int, node) -> tuple:
+    fields = node if isinstance(node, dict) else {}
+    return (
+        project_id,
+        flow_id,
+        position,
+        _text_or_none(fields.get("id")),
+        _text_or_none(fields.get("type")),
+        json.dumps(node, ensure_ascii=False),
+    )
+
+
+def _edge_row(project_id: str, flow_id: str, position: int, edge) -> tuple:
+    fields = edge if isinstance(edge, dict) else {}
+    return (
+        project_id,
+        flow_id,
+        position,
+        _text_or_none(fields.get("id")),
+        _text_or_none(fields.get("source")),
+        _text_or_none(fields.get("target")),
+        _text_or_none(fields.get("label")),
+        json.dumps(edge, ensure_ascii=False),
+    )
+
+
+class SQLiteRepository(FlowRepository):
+    """Store projects and flows in a single SQLite database in WAL mode.
+
+    Nodes and edges live in their own indexed tables; the remaining top-level
+    keys of a flow are kept as a JSON document. YAML exports keep being
+    written below ``data_dir`` by the application, so deleting a project also
+    moves its export directory to the trash, next to a JSON dump of the
+    deleted rows. Revision history rows (snapshots and JSON Patch deltas)
+    cascade with their flow.
+    """
+
+    def __init__(
+        self,
+        database: Path,
+        data_dir: Path,
+        compact_threshold: int = COMPACT_THRESHOLD_BYTES,
+        trash_retention: float = TRASH_RETENTION_SECONDS,
+        history_segments: int = HISTORY_SEGMENTS,
+    ) -> None:
+        super().__init__(data_dir, compact_threshold, trash_retention, history_segments)
+        self.database = database
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.database.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.database), timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            self._local.connection = connection
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    connection.executescript(SCHEMA)
+                    self._schema_ready = True
+        return connection
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run a write transaction that takes the database write lock up front.
+
+        ``BEGIN IMMEDIATE`` makes read-modify-write sequences (revision bumps,
+        index updates) atomic across worker processes.
+        """
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            yield connection
+
+    # -- projects -----------------------------------------------------------
+
+    def ensure_storage(self) -> None:
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self._connection()
+
+    def load_projects(self) -> List[Dict]:
+        rows = self._connection().execute("SELECT entry FROM projects ORDER BY position")
+        return [json.loads(row["entry"]) for row in rows]
+
+    @staticmethod
+    def _replace_projects(connection: sqlite3.Connection, projects: List[Dict]) -> None:
+        connection.execute("DELETE FROM projects")
+        connection.executemany(
+            "INSERT INTO projects (id, position, entry) VALUES (?, ?, ?)",
+            [
+                (project["id"], position, json.dumps(project, ensure_ascii=False))
+                for position, project in enumerate(projects)
+            ],
+        )
+
+    def save_projects(self, projects: List[Dict]) -> None:
+        with self._transaction() as connection:
+            self._replace_projects(connection, projects)
+
+    def update_projects(self, updater: Callable[[List[Dict]], None]) -> List[Dict]:
+        with self._transaction() as connection:
+            rows = connection.execute("SELECT entry FROM projects ORDER BY position")
+            projects = [json.loads(row["entry"]) for row in rows]
+            updater(projects)
+            self._replace_projects(connection, projects)
+            return projects
+
+    def load_project_metadata(self, project_id: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT metadata FROM project_metadata WHERE project_id = ?", (project_id,)
+        ).fetchone()
+        return json.loads(row["metadata"]) if row else None
+
+    def save_project_metadata(self, project_id: str, metadata: Dict) -> None:
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO project_metadata (project_id, metadata) VALUES (?, ?)",
+                (project_id, json.dumps(metadata, ensure_ascii=False)),
+            )
+
+    def delete_project(self, project_id: str) -> str:
+        with self._transaction() as connection:
+            metadata = self.load_project_metadata(project_id)
+            dump = {"metadata": metadata, "flows": self._dump_flows(connection, project_id)}
+            listed = metadata or {"id": project_id, "name": project_id}
+            info = {"kind": "project", "project_id": project_id, "name": listed.get("name"), "metadata": listed}
+            connection.execute("DELETE FROM flows WHERE project_id = ?", (project_id,))
+            connection.execute("DELETE FROM project_metadata WHERE project_id = ?", (project_id,))
+            # Inside the transaction: if the move fails the rows are kept.
+            return self.trash.put(info, {"project": self.data_dir / project_id}, dump)
+
+    def duplicate_project(self, source_id: str, target_id: str) -> Manifest:
+        """Copy the rows of ``source_id`` inside the database and hardlink its YAML exports."""
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM flows WHERE project_id = ?", (target_id,))
+            connection.execute(
+                """
+                INSERT INTO flows (
+                    project_id, flow_id, revision, hash, node_count, edge_count,
+                    summary, document, nodes_in_table, edges_in_table
+                )
+                SELECT ?, flow_id, revision, hash, node_count, edge_count,
+                    summary, document, nodes_in_table, edges_in_table
+                FROM flows WHERE project_id = ?
+                """,
+                (target_id, source_id),
+            )
+            connection.execute(
+                """
+                INSERT INTO nodes (project_id, flow_id, position, node_id, type, data)
+                SELECT ?, flow_id, position, node_id, type, data FROM nodes WHERE project_id = ?
+                """,
+                (target_id, source_id),
+            )
+            connection.execute(
+                """
+                INSERT INTO edges (project_id, flow_id, position, edge_id, source, target, label, data)
+                SELECT ?, flow_id, position, edge_id, source, target, label, data FROM edges WHERE project_id = ?
+                """,
+                (target_id, source_id),
+            )
+            connection.execute(
+                """
+                INSERT INTO flow_history (project_id, flow_id, revision, kind, hash, saved_at, body)
+                SELECT ?, flow_id, revision, kind, hash, saved_at, body FROM flow_history WHERE project_id = ?
+                """,
+                (target_id, source_id),
+            )
+        target_flows = self.data_dir / target_id / "flows"
+        target_flows.mkdir(parents=True, exist_ok=True)
+        for yaml_path in sorted((self.data_dir / source_id / "flows").glob("*.yaml")):
+            link_or_copy(yaml_path, target_flows / yaml_path.name)
+        return self.flow_index(target_id)
+
+    # -- flow index ---------------------------------------------------------
+
+    def flow_index(self, project_id: str) -> Manifest:
+        rows = self._connection().execute(
+            "SELECT flow_id, summary FROM flows WHERE project_id = ? ORDER BY flow_id", (project_id,)
+        )
+        return {f"{row['flow_id']}.json": json.loads(row["summary"]) for row in rows}
+
+    def flow_index_is_stale(self, project_id: str) -> bool:
+        row = self._connection().execute(
+            """
+            SELECT COUNT(*) AS stale FROM flows AS f
+            WHERE f.project_id = ? AND (
+                (f.nodes_in_table AND f.node_count != (
+                    SELECT COUNT(*) FROM nodes AS n
+                    WHERE n.project_id = f.project_id AND n.flow_id = f.flow_id))
+                OR (f.edges_in_table AND f.edge_count != (
+                    SELECT COUNT(*) FROM edges AS e
+                    WHERE e.project_id = f.project_id AND e.flow_id = f.flow_id))
+            )
+            """,
+            (project_id,),
+        ).fetchone()
+        return bool(row["stale"])
+
+    def rebuild_flow_index(self, project_id: str) -> Manifest:
+        flow_ids = [
+            row["flow_id"]
+            for row in self._connection().execute(
+                "SELECT flow_id FROM flows WHERE project_id = ?", (project_id,)
+            )
+        ]
+        for flow_id in flow_ids:
+            data = self.load_flow(project_id, flow_id)
+            entry = self.flow_entry(project_id, flow_id) or {}
+            if data is None:
+                continue
+            digest = content_hash(data)
+            # Only rows whose stored hash no longer matches their content are rewritten.
+            if entry.get("hash") != digest:
+                self.save_flow(project_id, flow_id, data, digest, int(entry.get("revision") or 0) + 1)
+        return self.flow_index(project_id)
+
+    # -- flows --------------------------------------------------------------
+
+    def flow_entry(self, project_id: str, flow_id: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT summary FROM flows WHERE project_id = ? AND flow_id = ?", (project_id, flow_id)
+        ).fetchone()
+        return json.loads(row["summary"]) if row else None
+
+    def load_flow(self, project_id: str, flow_id: str) -> Optional[FlowDict]:
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT document, nodes_in_table, edges_in_table FROM flows WHERE project_id = ? AND flow_id = ?",
+            (project_id, flow_id),
+        ).fetchone()
+        if row is None:
+            return None
+        document = json.loads(row["document"])
+        if row["nodes_in_table"]:
+            document["nodes"] = [
+                json.loads(node["data"])
+                for node in connection.execute(
+                    "SELECT data FROM nodes WHERE project_id = ? AND flow_id = ? ORDER BY position",
+                    (project_id, flow_id),
+                )
+            ]
+        if row["edges_in_table"]:
+            document["edges"] = [
+                json.loads(edge["data"])
+                for edge in connection.execute(
+                    "SELECT data FROM edges WHERE project_id = ? AND flow_id = ? ORDER BY position",
+                    (project_id, flow_id),
+                )
+            ]
+        return document
+
+    def _store_flow(
+        self,
+        connection: sqlite3.Connection,
+        project_id: str,
+        flow_id: str,
+        data: FlowDict,
+        digest: str,
+        saved_at: str,
+        revision: Optional[int] = None,
+        patch: Optional[List[Dict]] = None,
+    ) -> Tuple[Dict, Optional[str]]:
+        """Write a flow, its nodes/edges and its history row inside ``connection``'s transaction.
+
+        Returns the new entry and how the revision was recorded; content that
+        is already stored is left untouched and returns the stored entry.
+        """
+        nodes = data.get("nodes")
+        edges = data.get("edges")
+        nodes_in_table = isinstance(nodes, list)
+        edges_in_table = isinstance(edges, list)
+        # List-valued nodes/edges move to their tables; placeholders keep the key order.
+        document = {
+            key: None if (key == "nodes" and nodes_in_table) or (key == "edges" and edges_in_table) else value
+            for key, value in data.items()
+        }
+        filename = f"{flow_id}.json"
+
+        row = connection.execute(
+            "SELECT revision, hash, summary FROM flows WHERE project_id = ? AND flow_id = ?", (project_id, flow_id)
+        ).fetchone()
+        previous = (row["revision"], row["hash"]) if row else None
+        if row and row["hash"] == digest and revision in (None, row["revision"]):
+            return json.loads(row["summary"]), None
+        head = self._history_head(connection, project_id, flow_id)
+        if head is None and previous is not None:
+            # A flow stored before its history was kept: record that revision first.
+            base = self.load_flow(project_id, flow_id)
+            if base is not None:
+                self._record(
+                    connection, project_id, flow_id, previous[0], "snapshot", content_hash(base), saved_at, base
+                )
+                head = self._history_head(connection, project_id, flow_id)
+        if revision is None:
+            revision = (previous[0] if previous else 0) + 1
+        size = len(canonical_json(data).encode("utf-8"))
+        entry = flow_summary(filename, data, size, revision, digest)
+        connection.execute(
+            """
+            INSERT INTO flows (
+                project_id, flow_id, revision, hash, node_count, edge_count,
+                summary, document, nodes_in_table, edges_in_table
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (project_id, flow_id) DO UPDATE SET
+                revision = excluded.revision,
+                hash = excluded.hash,
+                node_count = excluded.node_count,
+                edge_count = excluded.edge_count,
+                summary = excluded.summary,
+                document = excluded.document,
+                nodes_in_table = excluded.nodes_in_table,
+                edges_in_table = excluded.edges_in_table
+            """,
+            (
+                project_id,
+                flow_id,
+                revision,
+                digest,
+                entry["node_count"],
+                entry["edge_count"],
+                json.dumps(entry, ensure_ascii=False),
+                json.dumps(document, ensure_ascii=False),
+                int(nodes_in_table),
+                int(edges_in_table),
+            ),
+        )
+        connection.execute("DELETE FROM nodes WHERE project_id = ? AND flow_id = ?", (project_id, flow_id))
+        connection.execute("DELETE FROM edges WHERE project_id = ? AND flow_id = ?", (project_id, flow_id))
+        if nodes_in_table:
+            connection.executemany(
+                "INSERT INTO nodes (project_id, flow_id, position, node_id, type, data) VALUES (?, ?, ?, ?, ?, ?)",
+                [_node_row(project_id, flow_id, position, node) for position, node in enumerate(nodes)],
+            )
+        if edges_in_table:
+            connection.executemany(
+                """
+                INSERT INTO edges (project_id, flow_id, position, edge_id, source, target, label, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [_edge_row(project_id, flow_id, position, edge) for position, edge in enumerate(edges)],
+            )
+
+        kind = plan_record(head, previous, revision, digest)
+        if kind == "delta" and patch is None:
+            kind = "snapshot"
+        if kind == "delta":
+            self._record(connection, project_id, flow_id, revision, "delta", digest, saved_at, patch)
+        elif kind is not None:
+            self._record(connection, project_id, flow_id, revision, "snapshot", digest, saved_at, data)
+        return entry, kind
+
+    def save_flow(
+        self,
+        project_id: str,
+        flow_id: str,
+        data: FlowDict,
+        digest: Optional[str] = None,
+        revision: Optional[int] = None,
+        patch: Optional[List[Dict]] = None,
+    ) -> Dict:
+        digest = digest or content_hash(data)
+        saved_at = datetime.utcnow().isoformat()
+        with self._transaction() as connection:
+            entry, kind = self._store_flow(connection, project_id, flow_id, data, digest, saved_at, revision, patch)
+        if self._needs_compaction(project_id, flow_id, kind):
+            self.compactor.schedule(project_id, flow_id)
+        return entry
+
+    def save_flows(self, project_id: str, flows: Dict[str, FlowDict]) -> Dict[str, Dict]:
+        saved_at = datetime.utcnow().isoformat()
+        entries: Dict[str, Dict] = {}
+        kinds: Dict[str, Optional[str]] = {}
+        with self._transaction() as connection:
+            for flow_id, data in sorted(flows.items()):
+                entries[flow_id], kinds[flow_id] = self._store_flow(
+                    connection, project_id, flow_id, data, content_hash(data), saved_at
+                )
+        for flow_id, kind in kinds.items():
+            if self._needs_compaction(project_id, flow_id, kind):
+                self.compactor.schedule(project_id, flow_id)
+        return entries
+
+    def rename_flow(self, project_id: str, old_flow_id: str, new_flow_id: str) -> None:
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT summary FROM flows WHERE project_id = ? AND flow_id = ?", (project_id, old_flow_id)
+            ).fetchone()
+            if row is None:
+                return
+            connection.execute(
+                "DELETE FROM flows WHERE project_id = ? AND flow_id = ?", (project_id, new_flow_id)
+            )
+            summary = {**json.loads(row["summary"]), "filename": f"{new_flow_id}.json"}
+            connection.execute(
+                "UPDATE flows SET flow_id = ?, summary = ? WHERE project_id = ? AND flow_id = ?",
+                (new_flow_id, json.dumps(summary, ensure_ascii=False), project_id, old_flow_id),
+            )
+
+    def delete_flow(self, project_id: str, flow_id: str) -> str:
+        with self._transaction() as connection:
+            dumped = self._dump_flows(connection, project_id, flow_id)
+            entry = dumped[0]["entry"] if dumped else None
+            info = {
+                "kind": "flow",
+                "project_id": project_id,
+                "flow_id": flow_id,
+                "name": (entry or {}).get("name") or flow_id,
+                "entry": entry,
+            }
+            connection.execute("DELETE FROM flows WHERE project_id = ? AND flow_id = ?", (project_id, flow_id))
+            yaml_path = self.data_dir / project_id / "flows" / f"{flow_id}.yaml"
+            return self.trash.put(info, {"flow.yaml": yaml_path}, {"flows": dumped})
+
+    # -- trash --------------------------------------------------------------
+
+    def _dump_flows(
+        self, connection: sqlite3.Connection, project_id: str, flow_id: Optional[str] = None
+    ) -> List[Dict]:
+        """Return the flows of a project (or one of them) with their history rows."""
+        query = "SELECT flow_id, summary FROM flows WHERE project_id = ?"
+        parameters: Tuple = (project_id,)
+        if flow_id is not None:
+            query += " AND flow_id = ?"
+            parameters += (flow_id,)
+        dumped = []
+        for row in connection.execute(query + " ORDER BY flow_id", parameters).fetchall():
+            history = connection.execute(
+                """
+                SELECT revision, kind, hash, saved_at, body FROM flow_history
+                WHERE project_id = ? AND flow_id = ? ORDER BY revision, kind
+                """,
+                (project_id, row["flow_id"]),
+            )
+            dumped.append(
+                {
+                    "flow_id": row["flow_id"],
+                    "entry": json.loads(row["summary"]),
+                    "data": self.load_flow(project_id, row["flow_id"]),
+                    "history": [dict(record) for record in history],
+                }
+            )
+        return dumped
+
+    def _restore_entry(self, info: Dict, payload: Path, dump: Optional[Dict]) -> None:
+        project_id = info["project_id"]
+        dump = dump or {}
+        saved_at = datetime.utcnow().isoformat()
+        with self._transaction() as connection:
+            project_known = connection.execute(
+                "SELECT 1 FROM project_metadata WHERE project_id = ?", (project_id,)
+            ).fetchone()
+            if info["kind"] == "project":
+                if project_known or (self.data_dir / project_id).exists():
+                    raise TrashError(f"Ya existe un proyecto con el identificador '{project_id}'.")
+                if dump.get("metadata") is not None:
+                    connection.execute(
+                        "INSERT INTO project_metadata (project_id, metadata) VALUES (?, ?)",
+                        (project_id, json.dumps(dump["metadata"], ensure_ascii=False)),
+                    )
+            else:
+                if not project_known:
+                    raise TrashError("El proyecto de este flujo ya no existe.")
+                if self.flow_entry(project_id, info["flow_id"]) is not None:
+                    raise TrashError(f"Ya existe un flujo con el identificador '{info['flow_id']}'.")
+
+            for flow in dump.get("flows", []):
+                data = flow["data"]
+                revision = int(flow["entry"].get("revision") or 1)
+                self._store_flow(connection, project_id, flow["flow_id"], data, content_hash(data), saved_at, revision)
+                connection.execute(
+                    "DELETE FROM flow_history WHERE project_id = ? AND flow_id = ?", (project_id, flow["flow_id"])
+                )
+                connection.executemany(
+                    """
+                    INSERT INTO flow_history (project_id, flow_id, revision, kind, hash, saved_at, body)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    [
+                        (
+                            project_id,
+                            flow["flow_id"],
+                            record["revision"],
+                            record["kind"],
+                            record["hash"],
+                            record["saved_at"],
+                            record["body"],
+                        )
+                        for record in flow["history"]
+                    ],
+                )
+
+            if info["kind"] == "project" and (payload / "project").exists():
+                os.replace(payload / "project", self.data_dir / project_id)
+            elif info["kind"] == "flow" and (payload / "flow.yaml").exists():
+                flow_dir = self.data_dir / project_id / "flows"
+                flow_dir.mkdir(parents=True, exist_ok=True)
+                os.replace(payload / "flow.yaml", flow_dir / f"{info['flow_id']}.yaml")
+
+    # -- history ------------------------------------------------------------
+
+    @staticmethod
+    def _history_head(connection: sqlite3.Connection, project_id: str, flow_id: str) -> Optional[Dict]:
+        row = connection.execute(
+            """
+            SELECT revision, hash, saved_at FROM flow_history
+            WHERE project_id = ? AND flow_id = ? ORDER BY revision DESC LIMIT 1
+            """,
+            (project_id, flow_id),
+        ).fetchone()
+        return dict(row) if row else None
+
+    @staticmethod
+    def _record(
+        connection: sqlite3.Connection,
+        project_id: str,
+        flow_id: str,
+        revision: int,
+        kind: str,
+        digest: str,
+        saved_at: str,
+        body,
+    ) -> None:
+        connection.execute(
+            """
+            INSERT OR REPLACE INTO flow_history (project_id, flow_id, revision, kind, hash, saved_at, body)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (project_id, flow_id, revision, kind, digest, saved_at, json.dumps(body, ensure_ascii=False)),
+        )
+
+    def _journal_size(self, project_id: str, flow_id: str) -> int:
+        row = self._connection().execute(
+            """
+            SELECT COALESCE(SUM(LENGTH(body)), 0) AS size FROM flow_history
+            WHERE project_id = ? AND flow_id = ? AND kind = 'delta' AND revision > (
+                SELECT COALESCE(MAX(revision), 0) FROM flow_history
+                WHERE project_id = ? AND flow_id = ? AND kind = 'snapshot')
+            """,
+            (project_id, flow_id, project_id, flow_id),
+        ).fetchone()
+        return int(row["size"])
+
+    def _snapshots(self, connection: sqlite3.Connection, project_id: str, flow_id: str) -> List[int]:
+        rows = connection.execute(
+            """
+            SELECT revision FROM flow_history
+            WHERE project_id = ? AND flow_id = ? AND kind = 'snapshot' ORDER BY revision
+            """,
+            (project_id, flow_id),
+        )
+        return [row["revision"] for row in rows]
+
+    def _needs_compaction(self, project_id: str, flow_id: str, kind: Optional[str]) -> bool:
+        if kind == "delta":
+            return self._journal_size(project_id, flow_id) > self.compact_threshold
+        if kind == "snapshot":
+            return len(self._snapshots(self._connection(), project_id, flow_id)) > self.history_segments
+        return False
+
+    def flow_revisions(self, project_id: str, flow_id: str) -> List[Dict]:
+        rows = self._connection().execute(
+            """
+            SELECT revision, hash, saved_at, kind FROM flow_history
+            WHERE project_id = ? AND flow_id = ? ORDER BY revision, kind
+            """,
+            (project_id, flow_id),
+        )
+        found: Dict[int, Dict] = {}
+        for row in rows:
+            # 'snapshot' sorts after 'delta', so a compacted revision is reported as a snapshot.
+            found[row["revision"]] = revision_info(row["revision"], row["hash"], row["saved_at"], row["kind"])
+        return list(found.values())
+
+    def load_flow_revision(self, project_id: str, flow_id: str, revision: int) -> Optional[FlowDict]:
+        connection = self._connection()
+        snapshot = connection.execute(
+            """
+            SELECT revision, body FROM flow_history
+            WHERE project_id = ? AND flow_id = ? AND kind = 'snapshot' AND revision <= ?
+            ORDER BY revision DESC LIMIT 1
+            """,
+            (project_id, flow_id, revision),
+        ).fetchone()
+        if snapshot is None:
+            return None
+        document = json.loads(snapshot["body"])
+        expected = snapshot["revision"]
+        if expected == revision:
+            return document
+        rows = connection.execute(
+            """
+            SELECT revision, body FROM flow_history
+            WHERE project_id = ? AND flow_id = ? AND kind = 'delta' AND revision > ? AND revision <= ?
+            ORDER BY revision
+            """,
+            (project_id, flow_id, expected, revision),
+        )
+        for row in rows:
+            expected += 1
+            if row["revision"] != expected:
+                return None
+            try:
+                apply_patch(document, json.loads(row["body"]))
+            except JsonPatchError:
+                return None
+            if expected == revision:
+                return document
+        return None
+
+    def compact_flow_history(self, project_id: str, flow_id: str) -> bool:
+        with self.flow_lock(project_id, flow_id):
+            connection = self._connection()
+            head = self._history_head(connection, project_id, flow_id)
+            if head is None:
+                return False
+            snapshots = self._snapshots(connection, project_id, flow_id)
+            document = None
+            if head["revision"] not in snapshots:
+                document = self.load_flow_revision(project_id, flow_id, head["revision"])
+            with self._transaction() as connection:
+                if document is not None:
+                    self._record(
+                        connection, project_id, flow_id, head["revision"], "snapshot", head["hash"], head["saved_at"], document
+                    )
+                    snapshots.append(head["revision"])
+                pruned = 0
+                if len(snapshots) > self.history_segments:
+                    # Everything older than the oldest snapshot kept goes, deltas included.
+                    pruned = connection.execute(
+                        "DELETE FROM flow_history WHERE project_id = ? AND flow_id = ? AND revision < ?",
+                        (project_id, flow_id, snapshots[-self.history_segments]),
+                    ).rowcount
+            return document is not None or pruned > 0
+
+
+__all__ = ["SQLiteRepository"]
@@ -0,0 +1,170 @@
+"""Deferred deletion: storage is renamed into a trash area and purged later."""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .fileio import atomic_write_text, remove_tree
+
+TRASH_DIRNAME = ".trash"
+TRASH_RETENTION_SECONDS = 15 * 60
+INFO_FILENAME = "entry.json"
+PAYLOAD_DIRNAME = "payload"
+DUMP_FILENAME = "dump.json"
+
+
+class TrashError(ValueError):
+    """Error raised when a trash entry cannot be restored."""
+
+
+class Trash:
+    """Trash area below ``data_dir`` holding recently deleted projects and flows.
+
+    Deleting only renames files into ``.trash/<entry>/payload`` on the same
+    filesystem, so it is atomic and independent of the size of the tree.
+    Entries can be restored for ``retention`` seconds. Restoring and purging
+    first claim an entry by renaming it, so several worker processes never
+    act on the same entry twice.
+    """
+
+    def __init__(self, data_dir: Path, retention: float = TRASH_RETENTION_SECONDS) -> None:
+        self.directory = data_dir / TRASH_DIRNAME
+        self.retention = retention
+
+    def put(self, info: Dict, paths: Dict[str, Path], dump: Optional[Dict] = None) -> str:
+        """Move every existing path of ``paths`` into a new entry and return its id.
+
+        ``info`` describes the entry for listings; ``dump`` is an optional
+        document (e.g. database rows) needed to restore it.
+        """
+        entry_id = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+        entry_dir = self.directory / entry_id
+        payload = entry_dir / PAYLOAD_DIRNAME
+        payload.mkdir(parents=True)
+        deleted_at = time.time()
+        record = {**info, "id": entry_id, "deleted_at": deleted_at, "expires_at": deleted_at + self.retention}
+        atomic_write_text(entry_dir / INFO_FILENAME, json.dumps(record, ensure_ascii=False))
+        if dump is not None:
+            atomic_write_text(entry_dir / DUMP_FILENAME, json.dumps(dump, ensure_ascii=False))
+        for name, path in paths.items():
+            if path.exists():
+                os.replace(path, payload / name)
+        return entry_id
+
+    @staticmethod
+    def _read_info(entry_dir: Path) -> Optional[Dict]:
+        try:
+            info = json.loads((entry_dir / INFO_FILENAME).read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        return info if isinstance(info, dict) else None
+
+    def entries(self) -> List[Dict]:
+        """Return the restorable entries, newest first."""
+        if not self.directory.exists():
+            return []
+        now = time.time()
+        found = []
+        for entry_dir in self.directory.iterdir():
+            if entry_dir.name.startswith("."):
+                continue
+            info = self._read_info(entry_dir)
+            if info is not None and info.get("expires_at", 0) > now:
+                found.append(info)
+        return sorted(found, key=lambda info: info["deleted_at"], reverse=True)
+
+    def _claim(self, entry_id: str, purpose: str) -> Optional[Path]:
+        """Atomically take ownership of an entry; return None if someone else did."""
+        if not entry_id or "/" in entry_id or entry_id.startswith("."):
+            return None
+        claimed = self.directory / f".{purpose}-{entry_id}"
+        try:
+            # Fails when the entry is gone, i.e. another worker claimed it first.
+            os.rename(self.directory / entry_id, claimed)
+        except OSError:
+            return None
+        return claimed
+
+    @contextmanager
+    def restore(self, entry_id: str) -> Iterator[Tuple[Dict, Path, Optional[Dict]]]:
+        """Claim an entry for restoring and yield ``(info, payload_dir, dump)``.
+
+        The entry is removed when the block succeeds and put back otherwise.
+        """
+        claimed = self._claim(entry_id, "restoring")
+        if claimed is None:
+            raise TrashError("El elemento ya no está en la papelera.")
+        info = self._read_info(claimed)
+        if info is None or info.get("expires_at", 0) <= time.time():
+            remove_tree(claimed)
+            raise TrashError("El plazo para restaurar este elemento ha expirado.")
+        dump = None
+        if (claimed / DUMP_FILENAME).exists():
+            dump = json.loads((claimed / DUMP_FILENAME).read_text(encoding="utf-8"))
+        try:
+            yield info, claimed / PAYLOAD_DIRNAME, dump
+        except BaseException:
+            os.replace(claimed, self.directory / entry_id)
+            raise
+        remove_tree(claimed)
+
+    def purge(self, now: Optional[float] = None) -> int:
+        """Delete expired entries (and leftovers of interrupted purges); return how many."""
+        if not self.directory.exists():
+            return 0
+        now = time.time() if now is None else now
+        purged = 0
+        for entry_dir in list(self.directory.iterdir()):
+            if entry_dir.name.startswith(".purging-"):
+                remove_tree(entry_dir)
+                continue
+            if entry_dir.name.startswith("."):
+                continue
+            info = self._read_info(entry_dir)
+            if info is not None and info.get("expires_at", 0) > now:
+                continue
+            if info is None and entry_dir.stat().st_mtime + self.retention > now:
+                continue
+            claimed = self._claim(entry_dir.name, "purging")
+            if claimed is not None:
+                remove_tree(claimed)
+                purged += 1
+        return purged
+
+
+class TrashPurger:
+    """Daemon thread that purges expired trash entries every ``interval`` seconds."""
+
+    def __init__(self, trash: Trash, interval: float = 60.0) -> None:
+        self._trash = trash
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="trash-purger", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            try:
+                self._trash.purge()
+            except OSError:  # pragma: no cover - retried on the next round
+                pass
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+__all__ = ["TRASH_DIRNAME", "TRASH_RETENTION_SECONDS", "Trash", "TrashError", "TrashPurger"]
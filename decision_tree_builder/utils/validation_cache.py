@@ -0,0 +1,110 @@
+"""Content-addressed LRU cache of validation results."""
+
+from __future__ import annotations
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from .fingerprint import content_hash
+
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+CacheKey = Tuple[str, Optional[int], str]
+
+
+def validation_key(flow_data: Dict, path_limit: Optional[int], rules: str = "") -> Optional[CacheKey]:
+    """Return the cache key of a validation, or ``None`` if the flow cannot be hashed.
+
+    Only ``nodes`` and ``edges`` take part: renaming a flow or editing its
+    description does not change its diagnostics. ``rules`` is the
+    fingerprint of the rule set the flow is checked against.
+    """
+    if not isinstance(flow_data, dict):
+        return None
+    try:
+        digest = content_hash([flow_data.get("nodes", []), flow_data.get("edges", [])])
+    except (TypeError, ValueError):
+        return None
+    return digest, path_limit, rules
+
+
+class ValidationCache:
+    """LRU cache of validation results bounded by entry count and total size.
+
+    Results are stored serialised, which gives every hit its own copy and
+    an exact size to account against ``max_bytes``. Results larger than
+    ``max_bytes`` are not cached. Safe to share between threads.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[CacheKey, bytes]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: CacheKey) -> Optional[Dict[str, object]]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return json.loads(data)
+
+    def put(self, key: CacheKey, result: Dict[str, object]) -> None:
+        try:
+            # Not canonical: hits must keep the key order of the original result.
+            data = json.dumps(result, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            if len(data) > self.max_bytes or self.max_entries <= 0:
+                return
+            self._entries[key] = data
+            self._bytes += len(data)
+            self._shrink()
+
+    def configure(self, max_entries: int, max_bytes: int) -> None:
+        """Change the bounds, evicting entries that no longer fit."""
+        with self._lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self._shrink()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _shrink(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, data = self._entries.popitem(last=False)
+            self._bytes -= len(data)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return the counters and the current size of the cache."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
+
+
+__all__ = ["CACHE_MAX_BYTES", "CACHE_MAX_ENTRIES", "ValidationCache", "validation_key"]
@@ -0,0 +1,579 @@
+"""Validation rules and the engine that runs them in one shared traversal.
+
+Each check is a :class:`Rule` that overrides only the visitors it needs.
+A :class:`RuleSet` visits every node and edge once for all of its rules, so
+adding a rule adds work per item but no extra pass over the flow. The
+built-in rules reproduce the checks of :func:`utils.validator.validate_flow`;
+projects can add the optional rules registered in :data:`RULES` through the
+``validation_rules`` entry of their metadata.
+"""
+
+from __future__ import annotations
+
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+from .fingerprint import content_hash
+from .paths import FlowDict, FlowGraph
+
+SEVERITIES = ("error", "warning")
+
+
+def _extract_expected_labels(expected) -> List[str]:
+    labels: List[str] = []
+    if not isinstance(expected, list):
+        return labels
+    for item in expected:
+        if isinstance(item, dict):
+            if any(key in item for key in ("value", "label", "answer")):
+                raw = item.get("value") or item.get("label") or item.get("answer")
+                if raw is None:
+                    continue
+                text = str(raw).strip()
+                if text:
+                    labels.append(text)
+                continue
+            if len(item) == 1:
+                key, _ = next(iter(item.items()))
+                text = str(key).strip()
+                if text:
+                    labels.append(text)
+                continue
+        elif item is not None:
+            text = str(item).strip()
+            if text:
+                labels.append(text)
+    return labels
+
+
+def _answer(edge: Dict) -> str:
+    """Return the answer part of an edge label (``"Sí: detalle"`` → ``"Sí"``)."""
+    return (edge.get("label") or "").split(":", 1)[0].strip()
+
+
+class ValidationContext:
+    """State shared by the rules while a flow is validated.
+
+    The engine fills ``node_ids``, ``start_nodes`` and the graph during the
+    node pass, ``known_ids`` after it, and the ``outgoing``/``incoming``
+    edges of every endpoint during the edge pass. ``phase`` names the
+    visitor being run.
+    """
+
+    def __init__(self, flow_data: FlowDict) -> None:
+        self.nodes = flow_data.get("nodes", []) if isinstance(flow_data, dict) else []
+        self.edges = flow_data.get("edges", []) if isinstance(flow_data, dict) else []
+        self.node_ids: List[str] = []
+        self.known_ids: set = set()
+        self.start_nodes: List[Dict] = []
+        self.graph = FlowGraph()
+        self.outgoing: Dict[str, List[Dict]] = {}
+        self.incoming: Dict[str, List[Dict]] = {}
+        self.errors: List[str] = []
+        self.warnings: List[str] = []
+        self.diagnostics: List[Dict[str, str]] = []
+        self.halted = False
+        self.phase = ""
+
+    @property
+    def start_id(self) -> Optional[str]:
+        return self.start_nodes[0].get("id") if self.start_nodes else None
+
+    def report(self, rule_id: str, severity: str, message: str) -> None:
+        (self.errors if severity == "error" else self.warnings).append(message)
+        self.diagnostics.append({"rule": rule_id, "severity": severity, "message": message})
+
+    def halt(self) -> None:
+        """Skip the remaining visitors: the flow is too broken for them to say anything useful."""
+        self.halted = True
+
+
+class Rule:
+    """A validation check run by a :class:`RuleSet`.
+
+    Subclasses set ``id`` and override the visitors they need; only those
+    are called. The engine runs them in this order:
+
+    * ``node(node, context)`` for every node (not necessarily a dict),
+    * ``after_nodes(context)``,
+    * ``edge(edge, context)`` for every edge (not necessarily a dict),
+    * ``after_edges(context)``, once the graph is complete,
+    * ``branch(node, outgoing, context)`` for every node dict and its outgoing edges,
+    * ``finish(context)``.
+
+    Every validation uses fresh instances, so rules may keep state on
+    ``self``. Options from the project configuration are passed to
+    ``__init__`` as keyword arguments.
+
+    A rule that only defines ``node``, ``edge`` and ``branch`` is *local*:
+    it must judge each item on its own (an edge may look at
+    ``context.known_ids``), because live validation sessions keep one
+    instance and call it again for every item an edit touches.
+    """
+
+    id = ""
+
+    def node(self, node: object, context: ValidationContext) -> None:
+        pass
+
+    def after_nodes(self, context: ValidationContext) -> None:
+        pass
+
+    def edge(self, edge: object, context: ValidationContext) -> None:
+        pass
+
+    def after_edges(self, context: ValidationContext) -> None:
+        pass
+
+    def branch(self, node: Dict, outgoing: List[Dict], context: ValidationContext) -> None:
+        pass
+
+    def finish(self, context: ValidationContext) -> None:
+        pass
+
+    def error(self, context: ValidationContext, message: str) -> None:
+        context.report(self.id, "error", message)
+
+    def warning(self, context: ValidationContext, message: str) -> None:
+        context.report(self.id, "warning", message)
+
+
+VISITORS = ("node", "after_nodes", "edge", "after_edges", "branch", "finish")
+GLOBAL_VISITORS = ("after_nodes", "after_edges", "finish")
+
+
+def defines(rule: Type[Rule], visitor: str) -> bool:
+    """Return True when ``rule`` overrides ``visitor``."""
+    return getattr(rule, visitor) is not getattr(Rule, visitor)
+
+
+def is_local(rule: Type[Rule]) -> bool:
+    return not any(defines(rule, visitor) for visitor in GLOBAL_VISITORS)
+
+
+# -- built-in rules ----------------------------------------------------------
+
+
+class NodeIdsRule(Rule):
+    id = "node-ids"
+
+    def __init__(self) -> None:
+        self.missing = False
+
+    def node(self, node: object, context: ValidationContext) -> None:
+        if not (node.get("id") if isinstance(node, dict) else None):
+            self.missing = True
+
+    def after_nodes(self, context: ValidationContext) -> None:
+        duplicates = {node_id for node_id, count in Counter(context.node_ids).items() if count > 1}
+        self.check(context, self.missing, duplicates)
+
+    def check(self, context: ValidationContext, missing: bool, duplicates: Iterable[str]) -> None:
+        if missing:
+            self.error(context, "Hay nodos sin identificador definido.")
+        duplicates = sorted(duplicates)
+        if duplicates:
+            self.error(context, f"IDs duplicados detectados: {', '.join(duplicates)}.")
+
+
+class ConnectionsRule(Rule):
+    id = "connections"
+
+    def edge(self, edge: object, context: ValidationContext) -> None:
+        if not isinstance(edge, dict):
+            self.warning(context, "Se ignoró una arista con formato inválido.")
+            return
+        source = edge.get("source")
+        target = edge.get("target")
+        if not source or not target:
+            self.error(context, "Una conexión carece de origen o destino.")
+            return
+        if source not in context.known_ids:
+            self.error(context, f"La conexión hace referencia a un nodo inexistente: {source}.")
+        if target not in context.known_ids:
+            self.error(context, f"La conexión hace referencia a un nodo inexistente: {target}.")
+        if not edge.get("label"):
+            self.warning(context, f"La conexión {source} → {target} no tiene etiqueta definida.")
+
+
+class StartRule(Rule):
+    id = "start"
+
+    def after_edges(self, context: ValidationContext) -> None:
+        start_id = context.start_id
+        self.check(
+            context,
+            len(context.start_nodes),
+            start_id,
+            len(context.incoming.get(start_id or "", [])),
+            len(context.outgoing.get(start_id or "", [])),
+        )
+
+    def check(
+        self, context: ValidationContext, starts: int, start_id: Optional[str], incoming: int, outgoing: int
+    ) -> None:
+        """Report on the ``starts`` start nodes, the first being ``start_id`` with the given degrees."""
+        if not starts:
+            self.error(context, "Debe existir un nodo de inicio (Start).")
+            return
+        if starts > 1:
+            self.error(context, "Solo puede existir un nodo de inicio (Start).")
+        if not start_id:
+            self.error(context, "El nodo de inicio debe tener un identificador definido.")
+        elif str(start_id).lower() != "start":
+            self.error(context, "El identificador del nodo de inicio debe ser 'start'.")
+        if incoming:
+            self.error(context, "El nodo de inicio no puede tener conexiones entrantes.")
+        if outgoing > 1:
+            self.error(context, "El nodo de inicio solo puede tener una conexión saliente.")
+        if not outgoing:
+            self.warning(context, "El nodo de inicio no tiene conexiones salientes.")
+
+
+class StructureRule(Rule):
+    """Roots, terminals and cycles; an empty graph halts the validation."""
+
+    id = "structure"
+
+    def after_edges(self, context: ValidationContext) -> None:
+        graph = context.graph
+        if not graph.nodes:
+            self.empty(context)
+            return
+        cycle = graph.find_cycle() if graph.topological_order() is None else None
+        self.check(context, graph.roots(), bool(graph.terminals()), context.start_id, cycle)
+
+    def empty(self, context: ValidationContext) -> None:
+        self.error(context, "El flujo no contiene nodos.")
+        context.halt()
+
+    def check(
+        self,
+        context: ValidationContext,
+        roots: Iterable[str],
+        has_terminals: bool,
+        start_id: Optional[str],
+        cycle: Optional[List[str]],
+    ) -> None:
+        """Report on a non-empty graph given its roots, whether it has terminals and a cycle, if any."""
+        roots = list(roots)
+        if not roots:
+            self.error(context, "No se encontraron nodos raíz (sin entradas).")
+        elif start_id:
+            remaining = [node for node in roots if node != start_id]
+            if remaining:
+                self.error(
+                    context,
+                    "Todos los nodos raíz deben estar conectados desde Start. Sin entradas: "
+                    + ", ".join(sorted(remaining))
+                    + ".",
+                )
+        if not has_terminals:
+            self.error(context, "No se encontraron nodos terminales.")
+        if cycle:
+            self.error(context, f"Se detectó un ciclo en el flujo: {' → '.join(cycle)}.")
+
+
+class MessageExitsRule(Rule):
+    id = "message-exits"
+
+    def branch(self, node: Dict, outgoing: List[Dict], context: ValidationContext) -> None:
+        if node.get("type") == "message" and outgoing:
+            self.error(context, f"El nodo terminal '{node.get('id')}' no debe tener conexiones salientes.")
+
+
+class ExpectedAnswersRule(Rule):
+    id = "expected-answers"
+
+    def branch(self, node: Dict, outgoing: List[Dict], context: ValidationContext) -> None:
+        if node.get("type") != "question":
+            return
+        expected_labels = _extract_expected_labels(node.get("expected_answers"))
+        if not expected_labels:
+            return
+        node_id = node.get("id")
+        expected_set = set(expected_labels)
+        answers = [_answer(edge) for edge in outgoing]
+        for label in answers:
+            if label and label not in expected_set:
+                self.error(context, f"La etiqueta '{label}' desde '{node_id}' no coincide con expected_answers.")
+        missing_labels = expected_set.difference(answers)
+        if missing_labels:
+            self.warning(
+                context,
+                f"La pregunta '{node_id}' tiene respuestas esperadas sin conexión: {', '.join(sorted(missing_labels))}.",
+            )
+
+
+class ReachabilityRule(Rule):
+    """Forward reachability from Start and backward reachability from the messages."""
+
+    id = "reachability"
+
+    def __init__(self) -> None:
+        self.messages: List[str] = []
+
+    def node(self, node: object, context: ValidationContext) -> None:
+        if isinstance(node, dict) and node.get("type") == "message" and node.get("id"):
+            self.messages.append(node["id"])
+
+    def finish(self, context: ValidationContext) -> None:
+        graph, start_id = context.graph, context.start_id
+        unreachable: List[str] = []
+        if start_id and start_id in graph:
+            reached = graph.reachable([start_id])
+            unreachable = [node_id for node_id in context.known_ids if not reached[graph.index[node_id]]]
+        live = graph.reachable(self.messages, reverse=True)
+        dead = [node_id for node_id in context.known_ids if not live[graph.index[node_id]]]
+        self.check(context, unreachable, dead)
+
+    def check(self, context: ValidationContext, unreachable: Iterable[str], dead: Iterable[str]) -> None:
+        """Report the nodes unreachable from Start and those that cannot reach a message."""
+        unreachable = sorted(unreachable)
+        if unreachable:
+            self.warning(context, f"Nodos inalcanzables desde el inicio: {', '.join(unreachable)}.")
+        dead = sorted(dead)
+        if dead:
+            self.warning(context, f"Nodos desde los que no se llega a ningún mensaje final: {', '.join(dead)}.")
+
+
+class ConfigurationErrorRule(Rule):
+    """Reports an invalid entry of a project rule configuration."""
+
+    id = "configuration"
+
+    def __init__(self, message: str) -> None:
+        self.message = message
+
+    def after_nodes(self, context: ValidationContext) -> None:
+        self.error(context, self.message)
+
+
+BUILTIN_RULES: Tuple[Type[Rule], ...] = (
+    NodeIdsRule,
+    ConnectionsRule,
+    StartRule,
+    StructureRule,
+    MessageExitsRule,
+    ExpectedAnswersRule,
+    ReachabilityRule,
+)
+
+
+# -- optional rules ----------------------------------------------------------
+
+RULES: Dict[str, Type[Rule]] = {}
+
+
+def register_rule(rule: Type[Rule]) -> Type[Rule]:
+    """Make ``rule`` available to project configurations under its ``id``."""
+    RULES[rule.id] = rule
+    return rule
+
+
+def _severity(value: str) -> str:
+    if value not in SEVERITIES:
+        raise ValueError(f"unknown severity: {value}")
+    return value
+
+
+def _strings(value: object, name: str) -> List[str]:
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"{name} must be a list of strings")
+    return value
+
+
+@register_rule
+class MessageSeverityRule(Rule):
+    """Messages must define a ``severity``, optionally one of ``allowed``."""
+
+    id = "message-severity"
+
+    def __init__(self, severity: str = "warning", allowed: Optional[List[str]] = None) -> None:
+        self.severity = _severity(severity)
+        self.allowed = None if allowed is None else set(_strings(allowed, "allowed"))
+
+    def node(self, node: object, context: ValidationContext) -> None:
+        if not isinstance(node, dict) or node.get("type") != "message":
+            return
+        value = str(node.get("severity") or "").strip()
+        if not value:
+            context.report(self.id, self.severity, f"El mensaje '{node.get('id')}' no tiene severidad definida.")
+        elif self.allowed is not None and value not in self.allowed:
+            context.report(
+                self.id, self.severity, f"El mensaje '{node.get('id')}' tiene una severidad no permitida: {value}."
+            )
+
+
+@register_rule
+class RequiredMetadataRule(Rule):
+    """Nodes (optionally only some ``types``) must fill the given ``metadata`` keys."""
+
+    id = "required-metadata"
+
+    def __init__(self, keys: List[str], types: Optional[List[str]] = None, severity: str = "warning") -> None:
+        self.keys = _strings(keys, "keys")
+        self.types = None if types is None else set(_strings(types, "types"))
+        self.severity = _severity(severity)
+
+    def node(self, node: object, context: ValidationContext) -> None:
+        if not isinstance(node, dict) or (self.types is not None and node.get("type") not in self.types):
+            return
+        metadata = node.get("metadata") if isinstance(node.get("metadata"), dict) else {}
+        missing = [key for key in self.keys if metadata.get(key) in (None, "", [], {})]
+        if missing:
+            context.report(self.id, self.severity, f"Al nodo '{node.get('id')}' le faltan metadatos: {', '.join(missing)}.")
+
+
+def _normalise_answer(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold().strip()
+
+
+@register_rule
+class AnswerSpellingRule(Rule):
+    """Flags answer labels that match an expected answer except for accents or case (``Si``/``Sí``)."""
+
+    id = "answer-spelling"
+
+    def __init__(self, severity: str = "warning") -> None:
+        self.severity = _severity(severity)
+
+    def branch(self, node: Dict, outgoing: List[Dict], context: ValidationContext) -> None:
+        if node.get("type") != "question" or not outgoing:
+            return
+        expected = {_normalise_answer(label): label for label in _extract_expected_labels(node.get("expected_answers"))}
+        for edge in outgoing:
+            label = _answer(edge)
+            spelling = expected.get(_normalise_answer(label)) if label else None
+            if spelling is not None and spelling != label:
+                context.report(
+                    self.id,
+                    self.severity,
+                    f"La etiqueta '{label}' desde '{node.get('id')}' debería escribirse '{spelling}'.",
+                )
+
+
+# -- engine ------------------------------------------------------------------
+
+RuleSpec = Tuple[Type[Rule], Dict]
+
+
+class RuleSet:
+    """Rules to run on a flow, with the fingerprint of the configuration they come from.
+
+    :meth:`run` visits the nodes, then the edges, then the nodes again with
+    their outgoing edges, each time calling every rule that defines the
+    visitor.
+    """
+
+    def __init__(self, specs: Sequence[RuleSpec], fingerprint: str = "") -> None:
+        self.specs = list(specs)
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def from_config(cls, config: object) -> "RuleSet":
+        """Return the built-in rules followed by the optional rules listed in ``config``.
+
+        Entries are rule ids or ``{"rule": id, **options}``. An entry that
+        names no registered rule or has invalid options becomes an error of
+        every validation, so the mistake is visible where it matters.
+        """
+        if not config:
+            return DEFAULT_RULES
+        specs: List[RuleSpec] = [(rule, {}) for rule in BUILTIN_RULES]
+        if not isinstance(config, list):
+            config = [config]
+        for entry in config:
+            if isinstance(entry, str):
+                name, options = entry, {}
+            elif isinstance(entry, dict):
+                name, options = entry.get("rule"), {key: value for key, value in entry.items() if key != "rule"}
+            else:
+                name, options = None, {}
+            rule = RULES.get(name) if isinstance(name, str) else None
+            if rule is None:
+                message = f"La regla de validación '{name}' configurada en el proyecto no existe."
+                specs.append((ConfigurationErrorRule, {"message": message}))
+                continue
+            try:
+                rule(**options)
+            except (TypeError, ValueError):
+                message = f"Las opciones de la regla de validación '{name}' del proyecto no son válidas."
+                specs.append((ConfigurationErrorRule, {"message": message}))
+                continue
+            specs.append((rule, options))
+        return cls(specs, content_hash(config))
+
+    def instantiate(self) -> List[Rule]:
+        """Return fresh instances of the rules, in order."""
+        return [rule(**options) for rule, options in self.specs]
+
+    def run(self, flow_data: FlowDict, context: Optional[ValidationContext] = None) -> ValidationContext:
+        """Validate ``flow_data``, reporting into ``context`` (a new one by default)."""
+        context = context if context is not None else ValidationContext(flow_data)
+        rules = self.instantiate()
+        visitors: Dict[str, List] = {
+            name: [getattr(rule, name) for rule in rules if defines(type(rule), name)] for name in VISITORS
+        }
+
+        graph = context.graph
+        context.phase = "node"
+        for node in context.nodes:
+            node_id = node.get("id") if isinstance(node, dict) else None
+            if node_id:
+                context.node_ids.append(node_id)
+                graph.add_node(node_id)
+            if isinstance(node, dict) and node.get("type") == "start":
+                context.start_nodes.append(node)
+            for visit in visitors["node"]:
+                visit(node, context)
+        context.known_ids = set(context.node_ids)
+        context.phase = "after_nodes"
+        for visit in visitors["after_nodes"]:
+            visit(context)
+
+        context.phase = "edge"
+        for edge in context.edges:
+            if isinstance(edge, dict) and edge.get("source") and edge.get("target"):
+                graph.add_edge(edge["source"], edge["target"])
+                context.outgoing.setdefault(edge["source"], []).append(edge)
+                context.incoming.setdefault(edge["target"], []).append(edge)
+            for visit in visitors["edge"]:
+                visit(edge, context)
+        context.phase = "after_edges"
+        for visit in visitors["after_edges"]:
+            visit(context)
+            if context.halted:
+                return context
+
+        context.phase = "branch"
+        if visitors["branch"]:
+            for node in context.nodes:
+                if not isinstance(node, dict):
+                    continue
+                outgoing = context.outgoing.get(node.get("id"), [])
+                for visit in visitors["branch"]:
+                    visit(node, outgoing, context)
+        context.phase = "finish"
+        for visit in visitors["finish"]:
+            visit(context)
+        return context
+
+
+DEFAULT_RULES = RuleSet([(rule, {}) for rule in BUILTIN_RULES])
+
+
+__all__ = [
+    "BUILTIN_RULES",
+    "DEFAULT_RULES",
+    "RULES",
+    "VISITORS",
+    "Rule",
+    "RuleSet",
+    "ValidationContext",
+    "defines",
+    "is_local",
+    "register_rule",
+]
@@ -0,0 +1,593 @@
+"""Incremental validation of a flow that is being edited.
+
+A :class:`ValidationSession` keeps the graph of an open flow together with
+the diagnostics of every node and edge, and applies node and edge edits one
+by one. The checks are the rules of a :class:`~utils.validation_rules.RuleSet`.
+Local rules (only ``node``, ``edge`` and ``branch`` visitors) are called
+again for the items an edit touches: the node itself, the edges pointing at
+a node id that appeared or disappeared, and the source nodes of a changed
+edge. The built-in rules that need the whole flow are fed from state kept
+up to date by the edits: duplicated ids, the start nodes, the root/terminal
+status of the edge endpoints, a cycle search limited to what a new edge
+reaches, and reachability from Start and towards the messages, recomputed
+in one pass only after edits that change node ids, node types or edge
+endpoints. Any other rule that needs the whole flow (e.g. a configuration
+error of the project) is run on the whole flow at every report. The report
+lists the same errors and warnings, in the same order, as
+:func:`utils.validator.validate_flow` with the same rules (without the path
+listing); messages of such whole-flow project rules follow those of the
+built-in rules of the same phase.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from bisect import insort
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .paths import FlowDict, FlowGraph
+from .validation_rules import (
+    DEFAULT_RULES,
+    VISITORS,
+    NodeIdsRule,
+    ReachabilityRule,
+    Rule,
+    RuleSet,
+    StartRule,
+    StructureRule,
+    ValidationContext,
+    defines,
+    is_local,
+)
+
+SESSION_LIMIT = 64
+SESSION_IDLE_SECONDS = 30 * 60
+
+Diagnostics = Tuple[List[str], List[str]]
+
+# Whole-flow rules whose inputs the session maintains itself.
+INCREMENTAL_RULES = (NodeIdsRule, StartRule, StructureRule, ReachabilityRule)
+
+
+class ValidationSessionError(ValueError):
+    """Error raised when an edit cannot be applied to a session."""
+
+
+class _PhaseContext(ValidationContext):
+    """Context that keeps the errors and warnings of every engine phase apart."""
+
+    def __init__(self, flow_data: FlowDict) -> None:
+        super().__init__(flow_data)
+        self.phases: Dict[str, Diagnostics] = {name: ([], []) for name in VISITORS}
+
+    def report(self, rule_id: str, severity: str, message: str) -> None:
+        errors, warnings = self.phases[self.phase]
+        (errors if severity == "error" else warnings).append(message)
+
+
+class ValidationSession:
+    """Graph and per-item diagnostics of one flow, updated edit by edit.
+
+    Nodes and edges are stored under increasing integer keys, so the order
+    of the flow (which decides the order of the messages) survives edits:
+    updated items keep their position and added items go last. Nodes and
+    edges are addressed by their ``id``; with duplicated ids the first
+    occurrence is edited.
+    """
+
+    def __init__(self, flow_data: FlowDict, rules: RuleSet = DEFAULT_RULES) -> None:
+        self.rules = rules
+        instances = rules.instantiate()
+        local = [rule for rule in instances if is_local(type(rule))]
+        self._visitors: Dict[str, List] = {
+            name: [getattr(rule, name) for rule in local if defines(type(rule), name)]
+            for name in ("node", "edge", "branch")
+        }
+        self._node_ids_rule = self._instance(instances, NodeIdsRule)
+        self._start_rule = self._instance(instances, StartRule)
+        self._structure_rule = self._instance(instances, StructureRule)
+        self._reachability_rule = self._instance(instances, ReachabilityRule)
+        whole_flow = [
+            (rule, options)
+            for rule, options in rules.specs
+            if not is_local(rule) and rule not in INCREMENTAL_RULES
+        ]
+        self._whole_flow_rules = RuleSet(whole_flow) if whole_flow else None
+        # Local rules report into this context, one item at a time.
+        self._item_context = ValidationContext({})
+
+        self.revision = 0
+        self._next_key = 0
+        self._nodes: Dict[int, object] = {}
+        self._node_keys: Dict[str, List[int]] = {}
+        self._missing: Set[int] = set()
+        self._duplicates: Set[str] = set()
+        self._starts: List[int] = []
+        self._node_diagnostics: Dict[int, Diagnostics] = {}
+        self._branch_diagnostics: Dict[int, Diagnostics] = {}
+
+        self._edges: Dict[int, object] = {}
+        self._edge_keys: Dict[str, List[int]] = {}
+        self._edge_diagnostics: Dict[int, Diagnostics] = {}
+        # Edges with both endpoints, by endpoint; they are the edges of the graph.
+        self._outgoing: Dict[str, List[int]] = {}
+        self._incoming: Dict[str, List[int]] = {}
+        self._pairs: Counter = Counter()
+
+        # Every node id and edge endpoint is a graph node while referenced.
+        self._references: Counter = Counter()
+        self._roots: Set[str] = set()
+        self._terminals: Set[str] = set()
+        self._cycle: Optional[List[str]] = None
+        self._reachability: Optional[Tuple[List[str], List[str]]] = None
+        self._loading = True
+        self._item_context.known_ids = self._node_keys
+
+        nodes = flow_data.get("nodes", []) if isinstance(flow_data, dict) else []
+        edges = flow_data.get("edges", []) if isinstance(flow_data, dict) else []
+        for node in nodes if isinstance(nodes, list) else []:
+            self._insert_node(self._take_key(), node)
+        for edge in edges if isinstance(edges, list) else []:
+            self._insert_edge(self._take_key(), edge)
+        self._loading = False
+        self._roots = {node_id for node_id in self._references if node_id not in self._incoming}
+        self._terminals = {node_id for node_id in self._references if node_id not in self._outgoing}
+        for key in self._nodes:
+            self._check_node(key)
+        for key in self._edges:
+            self._check_edge(key)
+        self._cycle = self._full_cycle_search()
+
+    # -- edits -------------------------------------------------------------
+
+    def apply(self, edits: Iterable[Dict]) -> None:
+        """Apply a batch of edits; raise :class:`ValidationSessionError` on a bad one.
+
+        Supported operations: ``add_node``/``add_edge`` (with ``node``/``edge``),
+        ``update_node``/``update_edge`` (``id`` plus the full new item) and
+        ``remove_node``/``remove_edge`` (``id``). Edits before a failing one
+        stay applied.
+        """
+        for edit in edits:
+            if not isinstance(edit, dict):
+                raise ValidationSessionError("Operación de validación inválida.")
+            operation = edit.get("op")
+            if operation == "add_node":
+                self.add_node(edit.get("node"))
+            elif operation == "update_node":
+                self.update_node(edit.get("id"), edit.get("node"))
+            elif operation == "remove_node":
+                self.remove_node(edit.get("id"))
+            elif operation == "add_edge":
+                self.add_edge(edit.get("edge"))
+            elif operation == "update_edge":
+                self.update_edge(edit.get("id"), edit.get("edge"))
+            elif operation == "remove_edge":
+                self.remove_edge(edit.get("id"))
+            else:
+                raise ValidationSessionError(f"Operación de validación desconocida: {operation}.")
+
+    def add_node(self, node: object) -> None:
+        key = self._take_key()
+        touched = self._insert_node(key, node)
+        self._reachability = None
+        self._after_node_change(touched, {key})
+
+    def update_node(self, node_id: object, node: object) -> None:
+        key = self._find(self._node_keys, node_id, "ningún nodo")
+        previous = self._nodes[key]
+        touched = self._delete_node(key) | self._insert_node(key, node)
+        if self._shape(previous) != self._shape(node):
+            self._reachability = None
+        self._after_node_change(touched, {key})
+
+    def remove_node(self, node_id: object) -> None:
+        key = self._find(self._node_keys, node_id, "ningún nodo")
+        touched = self._delete_node(key)
+        self._reachability = None
+        self._after_node_change(touched, set())
+
+    def add_edge(self, edge: object) -> None:
+        key = self._take_key()
+        self._insert_edge(key, edge)
+        self._after_edge_change(key, None, edge)
+
+    def update_edge(self, edge_id: object, edge: object) -> None:
+        key = self._find(self._edge_keys, edge_id, "ninguna conexión")
+        previous = self._delete_edge(key)
+        self._insert_edge(key, edge)
+        self._after_edge_change(key, previous, edge)
+
+    def remove_edge(self, edge_id: object) -> None:
+        key = self._find(self._edge_keys, edge_id, "ninguna conexión")
+        previous = self._delete_edge(key)
+        self._after_edge_change(None, previous, None)
+
+    @staticmethod
+    def _instance(instances: List[Rule], rule: type) -> Optional[Rule]:
+        return next((instance for instance in instances if type(instance) is rule), None)
+
+    @staticmethod
+    def _shape(node: object) -> Optional[Tuple[object, object]]:
+        """Return what reachability depends on in a node: its id and type."""
+        return (node.get("id"), node.get("type")) if isinstance(node, dict) else None
+
+    # -- bookkeeping -------------------------------------------------------
+
+    def _take_key(self) -> int:
+        self._next_key += 1
+        return self._next_key
+
+    @staticmethod
+    def _find(index: Dict[str, List[int]], item_id: object, kind: str) -> int:
+        keys = index.get(item_id) if isinstance(item_id, str) else None
+        if not keys:
+            raise ValidationSessionError(f"No existe {kind} con id '{item_id}'.")
+        return keys[0]
+
+    def _insert_node(self, key: int, node: object) -> Set[str]:
+        """Store ``node`` under ``key`` and return the ids whose existence may have changed."""
+        self._nodes[key] = node
+        node_id = node.get("id") if isinstance(node, dict) else None
+        if isinstance(node, dict) and node.get("type") == "start":
+            insort(self._starts, key)
+        if not node_id:
+            self._missing.add(key)
+            return set()
+        keys = self._node_keys.setdefault(node_id, [])
+        insort(keys, key)
+        if len(keys) > 1:
+            self._duplicates.add(node_id)
+        self._reference(node_id, 1)
+        return {node_id}
+
+    def _delete_node(self, key: int) -> Set[str]:
+        node = self._nodes.pop(key)
+        self._node_diagnostics.pop(key, None)
+        self._branch_diagnostics.pop(key, None)
+        self._missing.discard(key)
+        if key in self._starts:
+            self._starts.remove(key)
+        node_id = node.get("id") if isinstance(node, dict) else None
+        if not node_id:
+            return set()
+        keys = self._node_keys[node_id]
+        keys.remove(key)
+        if len(keys) < 2:
+            self._duplicates.discard(node_id)
+        if not keys:
+            del self._node_keys[node_id]
+        self._reference(node_id, -1)
+        return {node_id}
+
+    def _insert_edge(self, key: int, edge: object) -> None:
+        self._edges[key] = edge
+        if not isinstance(edge, dict):
+            return
+        edge_id = edge.get("id")
+        if isinstance(edge_id, str) and edge_id:
+            insort(self._edge_keys.setdefault(edge_id, []), key)
+        source, target = edge.get("source"), edge.get("target")
+        if not source or not target:
+            return
+        insort(self._outgoing.setdefault(source, []), key)
+        insort(self._incoming.setdefault(target, []), key)
+        self._pairs[(source, target)] += 1
+        self._reference(source, 1)
+        self._reference(target, 1)
+
+    def _delete_edge(self, key: int) -> object:
+        edge = self._edges.pop(key)
+        self._edge_diagnostics.pop(key, None)
+        if not isinstance(edge, dict):
+            return edge
+        edge_id = edge.get("id")
+        if isinstance(edge_id, str) and edge_id:
+            keys = self._edge_keys[edge_id]
+            keys.remove(key)
+            if not keys:
+                del self._edge_keys[edge_id]
+        source, target = edge.get("source"), edge.get("target")
+        if not source or not target:
+            return edge
+        for index, endpoint in ((self._outgoing, source), (self._incoming, target)):
+            keys = index[endpoint]
+            keys.remove(key)
+            if not keys:
+                del index[endpoint]
+        self._pairs[(source, target)] -= 1
+        if not self._pairs[(source, target)]:
+            del self._pairs[(source, target)]
+        self._reference(source, -1)
+        self._reference(target, -1)
+        return edge
+
+    def _reference(self, node_id: str, delta: int) -> None:
+        self._references[node_id] += delta
+        if not self._references[node_id]:
+            del self._references[node_id]
+        if not self._loading:
+            self._refresh_endpoint(node_id)
+
+    def _refresh_endpoint(self, node_id: str) -> None:
+        """Recompute whether ``node_id`` is a root and/or a terminal of the graph."""
+        present = node_id in self._references
+        for found, status in ((node_id in self._incoming, self._roots), (node_id in self._outgoing, self._terminals)):
+            if present and not found:
+                status.add(node_id)
+            else:
+                status.discard(node_id)
+
+    def _after_node_change(self, touched: Set[str], keys: Set[int]) -> None:
+        for node_id in touched:
+            # Edges pointing at an id that appeared or disappeared change their errors.
+            for edge_key in self._outgoing.get(node_id, []) + self._incoming.get(node_id, []):
+                self._check_edge(edge_key)
+        for key in keys:
+            self._check_node(key)
+        self.revision += 1
+
+    def _after_edge_change(self, key: Optional[int], previous: object, current: object) -> None:
+        if key is not None:
+            self._check_edge(key)
+        sources = set()
+        for edge in (previous, current):
+            if isinstance(edge, dict) and edge.get("source") and edge.get("target"):
+                sources.add(edge["source"])
+        for source in sources:
+            for node_key in self._node_keys.get(source, []):
+                self._check_branch(node_key)
+        removed, added = self._pair(previous), self._pair(current)
+        if removed != added:
+            self._reachability = None
+        if removed not in (None, added) and self._cycle is not None and not self._cycle_intact():
+            self._cycle = self._full_cycle_search()
+        # Only an added edge can close a cycle, and only through its own endpoints.
+        if added not in (None, removed) and self._cycle is None:
+            self._cycle = self._cycle_through(*added)
+        self.revision += 1
+
+    @staticmethod
+    def _pair(edge: object) -> Optional[Tuple[str, str]]:
+        if isinstance(edge, dict) and edge.get("source") and edge.get("target"):
+            return edge["source"], edge["target"]
+        return None
+
+    # -- checks ------------------------------------------------------------
+
+    def _run_local(self, visitor: str, *item: object) -> Diagnostics:
+        """Call the local rules defining ``visitor`` on one item and return what they reported."""
+        context = self._item_context
+        context.errors, context.warnings, context.diagnostics = [], [], []
+        for visit in self._visitors[visitor]:
+            visit(*item, context)
+        return context.errors, context.warnings
+
+    def _check_edge(self, key: int) -> None:
+        self._store(self._edge_diagnostics, key, *self._run_local("edge", self._edges[key]))
+
+    def _check_node(self, key: int) -> None:
+        self._store(self._node_diagnostics, key, *self._run_local("node", self._nodes[key]))
+        self._check_branch(key)
+
+    def _check_branch(self, key: int) -> None:
+        node = self._nodes[key]
+        if not isinstance(node, dict):
+            return
+        node_id = node.get("id")
+        outgoing = [self._edges[edge_key] for edge_key in self._outgoing.get(node_id, [])] if node_id else []
+        self._store(self._branch_diagnostics, key, *self._run_local("branch", node, outgoing))
+
+    @staticmethod
+    def _store(diagnostics: Dict[int, Diagnostics], key: int, errors: List[str], warnings: List[str]) -> None:
+        if errors or warnings:
+            diagnostics[key] = (errors, warnings)
+        else:
+            diagnostics.pop(key, None)
+
+    def _successors(self, node_id: str) -> Iterable[str]:
+        return (self._edges[key]["target"] for key in self._outgoing.get(node_id, []))
+
+    def _cycle_through(self, source: str, target: str) -> Optional[List[str]]:
+        """Return a cycle closed by the edge ``source → target``, searching only from ``target``."""
+        parents: Dict[str, Optional[str]] = {target: None}
+        stack = [target]
+        while stack:
+            node = stack.pop()
+            if node == source:
+                path = [node]
+                while parents[path[-1]] is not None:
+                    path.append(parents[path[-1]])
+                return [source] + path[::-1]
+            for child in self._successors(node):
+                if child not in parents:
+                    parents[child] = node
+                    stack.append(child)
+        return None
+
+    def _cycle_intact(self) -> bool:
+        cycle = self._cycle or []
+        return all(self._pairs.get(pair) for pair in zip(cycle, cycle[1:]))
+
+    def _graph(self) -> FlowGraph:
+        graph = FlowGraph()
+        for node_id in sorted(self._node_keys, key=lambda node_id: self._node_keys[node_id][0]):
+            graph.add_node(node_id)
+        for key in sorted(key for keys in self._outgoing.values() for key in keys):
+            edge = self._edges[key]
+            graph.add_edge(edge["source"], edge["target"])
+        return graph
+
+    def _reach(self, sources: Iterable[str], index: Dict[str, List[int]], endpoint: str) -> Set[str]:
+        """Return the nodes reached from ``sources`` following ``index`` (outgoing or incoming edges)."""
+        reached = set(sources)
+        stack = list(reached)
+        while stack:
+            for key in index.get(stack.pop(), []):
+                node_id = self._edges[key][endpoint]
+                if node_id not in reached:
+                    reached.add(node_id)
+                    stack.append(node_id)
+        return reached
+
+    def _unreached(self) -> Tuple[List[str], List[str]]:
+        """Return the nodes unreachable from Start and those from which no message is reached."""
+        if self._reachability is None:
+            start_id = self._start_id()
+            unreachable: List[str] = []
+            if start_id and start_id in self._references:
+                reached = self._reach([start_id], self._outgoing, "target")
+                unreachable = [node_id for node_id in self._node_keys if node_id not in reached]
+            messages = {
+                node_id
+                for node_id, keys in self._node_keys.items()
+                if any(self._nodes[key].get("type") == "message" for key in keys)
+            }
+            live = self._reach(messages, self._incoming, "source")
+            dead = [node_id for node_id in self._node_keys if node_id not in live]
+            self._reachability = (unreachable, dead)
+        return self._reachability
+
+    def _full_cycle_search(self) -> Optional[List[str]]:
+        graph = self._graph()
+        return graph.find_cycle() if graph.topological_order() is None else None
+
+    # -- report ------------------------------------------------------------
+
+    def flow_data(self) -> FlowDict:
+        """Return the nodes and edges of the session in flow order."""
+        return {
+            "nodes": [self._nodes[key] for key in sorted(self._nodes)],
+            "edges": [self._edges[key] for key in sorted(self._edges)],
+        }
+
+    def report(self) -> Dict[str, object]:
+        """Return ``valid``, ``errors``, ``warnings`` and ``revision`` for the current flow.
+
+        The cycle named in the errors is the one found when it appeared, so
+        it may differ from the one a full validation would name first.
+        """
+        context = ValidationContext({})
+        whole_flow: Dict[str, Diagnostics] = {}
+        if self._whole_flow_rules is not None:
+            flow_data = self.flow_data()
+            whole_flow = self._whole_flow_rules.run(flow_data, _PhaseContext(flow_data)).phases
+
+        def finish_phase(phase: str) -> None:
+            errors, warnings = whole_flow.get(phase, ([], []))
+            context.errors.extend(errors)
+            context.warnings.extend(warnings)
+
+        self._collect(self._node_diagnostics, context)
+        finish_phase("node")
+        if self._node_ids_rule is not None:
+            self._node_ids_rule.check(context, bool(self._missing), self._duplicates)
+        finish_phase("after_nodes")
+        self._collect(self._edge_diagnostics, context)
+        finish_phase("edge")
+
+        start_id = self._start_id()
+        if self._start_rule is not None:
+            start_edges = (len(self._incoming.get(start_id or "", [])), len(self._outgoing.get(start_id or "", [])))
+            self._start_rule.check(context, len(self._starts), start_id, *start_edges)
+        if self._structure_rule is not None:
+            if not self._references:
+                self._structure_rule.empty(context)
+            else:
+                self._structure_rule.check(context, self._roots, bool(self._terminals), start_id, self._cycle)
+        if not context.halted:
+            finish_phase("after_edges")
+            self._collect(self._branch_diagnostics, context)
+            finish_phase("branch")
+            if self._reachability_rule is not None:
+                self._reachability_rule.check(context, *self._unreached())
+            finish_phase("finish")
+        return {
+            "valid": not context.errors,
+            "errors": context.errors,
+            "warnings": context.warnings,
+            "revision": self.revision,
+        }
+
+    @staticmethod
+    def _collect(diagnostics: Dict[int, Diagnostics], context: ValidationContext) -> None:
+        for key in sorted(diagnostics):
+            errors, warnings = diagnostics[key]
+            context.errors.extend(errors)
+            context.warnings.extend(warnings)
+
+    def _start_id(self) -> Optional[str]:
+        return self._nodes[self._starts[0]].get("id") if self._starts else None
+
+
+class ValidationSessions:
+    """Thread-safe registry of open sessions, evicting the least recently used.
+
+    At most ``limit`` sessions are kept and sessions idle for ``idle_timeout``
+    seconds are dropped; clients reopen a session when theirs is gone.
+    Sessions live in this process only: with several server processes a
+    client must be routed to the one that opened its session.
+    """
+
+    def __init__(self, limit: int = SESSION_LIMIT, idle_timeout: float = SESSION_IDLE_SECONDS) -> None:
+        self.limit = limit
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Tuple[float, ValidationSession, threading.Lock]]" = OrderedDict()
+
+    def open(self, flow_data: FlowDict, rules: RuleSet = DEFAULT_RULES) -> Tuple[str, Dict[str, object]]:
+        """Start a session checking ``flow_data`` with ``rules`` and return its id and first report."""
+        session = ValidationSession(flow_data, rules)
+        report = session.report()
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._expire(time.monotonic())
+            self._sessions[session_id] = (time.monotonic(), session, threading.Lock())
+            while len(self._sessions) > self.limit:
+                self._sessions.popitem(last=False)
+        return session_id, report
+
+    def apply(self, session_id: str, edits: List[Dict]) -> Optional[Dict[str, object]]:
+        """Apply ``edits`` to a session and return its report, or ``None`` if it is gone.
+
+        A rejected batch closes the session and re-raises the error.
+        """
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            _, session, session_lock = entry
+            self._sessions[session_id] = (time.monotonic(), session, session_lock)
+            self._sessions.move_to_end(session_id)
+        with session_lock:
+            try:
+                session.apply(edits)
+            except ValidationSessionError:
+                # The client no longer knows which edits were applied: make it start over.
+                self.close(session_id)
+                raise
+            return session.report()
+
+    def close(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _expire(self, now: float) -> None:
+        while self._sessions:
+            session_id, (used, _, _) = next(iter(self._sessions.items()))
+            if now - used < self.idle_timeout:
+                return
+            del self._sessions[session_id]
+
+
+__all__ = [
+    "SESSION_IDLE_SECONDS",
+    "SESSION_LIMIT",
+    "ValidationSession",
+    "ValidationSessionError",
+    "ValidationSessions",
+]
@@ -9,6 +9,7 @@ from typing import Any, Dict, List, Set, Tuple
 
 import yaml
 
+from .fileio import atomic_write_text
 from .paths import FlowDict
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -326,7 +327,7 @@ def write_yaml_file(project_id: str, flow_id: str, content: str) -> Path:
     project_dir = DATA_DIR / project_id / "flows"
     project_dir.mkdir(parents=True, exist_ok=True)
     path = project_dir / f"{flow_id}.yaml"
-    path.write_text(content, encoding="utf-8")
+    atomic_write_text(path, content)
     return path
 
 
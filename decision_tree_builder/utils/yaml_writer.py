@@ -0,0 +1,145 @@
+"""Background write-behind queue that regenerates flow YAML files."""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from .fingerprint import content_hash
+from .paths import FlowDict
+from .yaml_export import flow_to_yaml, write_yaml_file
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from .repository import FlowRepository
+
+FlowKey = Tuple[str, str]
+
+
+@dataclass
+class _ExportJob:
+    submitted: int = 0
+    written: int = 0
+    running: bool = False
+    pending: Optional[Tuple[int, FlowDict]] = None
+    error: Optional[str] = None
+
+
+class YamlWriteBehind:
+    """Regenerate YAML exports on a thread pool, coalescing repeated saves.
+
+    Every flow has at most one export running at a time. Saves submitted
+    while an export is running replace each other, so a burst of saves of
+    the same flow produces a single extra export with the latest data.
+    Callers must not mutate a flow dictionary after submitting it. A flow
+    is only tracked while its exports run or while its last export failed,
+    so sequence numbers start again once it is idle.
+
+    With a ``repository`` every export holds the flow lock and is skipped
+    when the stored flow no longer has the submitted content, so a worker
+    process holding an older flow never overwrites the YAML of a newer
+    revision saved by another process.
+    """
+
+    def __init__(self, repository: Optional["FlowRepository"] = None, max_workers: int = 2) -> None:
+        self._repository = repository
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="yaml-export")
+        self._condition = threading.Condition()
+        self._jobs: Dict[FlowKey, _ExportJob] = {}
+
+    def submit(self, project_id: str, flow_id: str, flow_data: FlowDict) -> int:
+        """Schedule the YAML export of ``flow_data`` and return its sequence number."""
+        key = (project_id, flow_id)
+        with self._condition:
+            job = self._jobs.setdefault(key, _ExportJob())
+            job.submitted += 1
+            job.pending = (job.submitted, flow_data)
+            if not job.running:
+                job.running = True
+                self._executor.submit(self._run, key)
+            return job.submitted
+
+    def _run(self, key: FlowKey) -> None:
+        project_id, flow_id = key
+        while True:
+            with self._condition:
+                job = self._jobs[key]
+                if job.pending is None:
+                    job.running = False
+                    if job.error is None:
+                        # Nothing left to report: forget the flow so the table only holds active flows.
+                        del self._jobs[key]
+                    self._condition.notify_all()
+                    return
+                sequence, flow_data = job.pending
+                job.pending = None
+            error = None
+            try:
+                self._export(project_id, flow_id, flow_data)
+            except Exception as exc:  # pragma: no cover - surfaced through status()
+                error = str(exc) or exc.__class__.__name__
+            with self._condition:
+                job.written = sequence
+                job.error = error
+                self._condition.notify_all()
+
+    def _export(self, project_id: str, flow_id: str, flow_data: FlowDict) -> None:
+        repository = self._repository
+        with repository.flow_lock(project_id, flow_id) if repository else nullcontext():
+            if repository is not None:
+                stored = repository.flow_entry(project_id, flow_id)
+                if stored is None or stored.get("hash") != content_hash(flow_data):
+                    return
+            yaml_content, _ = flow_to_yaml(flow_data)
+            write_yaml_file(project_id, flow_id, yaml_content)
+
+    def status(self, project_id: str, flow_id: str) -> Dict[str, object]:
+        """Return the export state of a flow: ``idle``, ``pending`` or ``error``."""
+        with self._condition:
+            job = self._jobs.get((project_id, flow_id))
+            if job is None:
+                return {"state": "idle", "submitted": 0, "written": 0, "error": None}
+            if job.running:
+                state = "pending"
+            else:
+                state = "error" if job.error else "idle"
+            return {"state": state, "submitted": job.submitted, "written": job.written, "error": job.error}
+
+    def wait(self, project_id: str, flow_id: str, timeout: Optional[float] = None) -> bool:
+        """Block until every export submitted so far for the flow is on disk."""
+        with self._condition:
+            job = self._jobs.get((project_id, flow_id))
+            if job is None:
+                return True
+            return self._condition.wait_for(lambda: not job.running, timeout=timeout)
+
+    def discard(self, project_id: str, flow_id: Optional[str] = None) -> None:
+        """Drop pending exports of a flow (or a whole project) and wait for running ones."""
+        with self._condition:
+            keys = [
+                key
+                for key in self._jobs
+                if key[0] == project_id and (flow_id is None or key[1] == flow_id)
+            ]
+            jobs = [self._jobs[key] for key in keys]
+            for job in jobs:
+                job.pending = None
+            self._condition.wait_for(lambda: not any(job.running for job in jobs))
+            for key in keys:
+                self._jobs.pop(key, None)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until no export is pending for any flow."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not any(job.running for job in self._jobs.values()), timeout=timeout
+            )
+
+    def shutdown(self) -> None:
+        self.flush()
+        self._executor.shutdown(wait=True)
+
+
+__all__ = ["YamlWriteBehind"]